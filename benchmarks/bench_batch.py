@@ -0,0 +1,51 @@
+#measures VHS.process_many throughput (images per second) for 1 to N workers
+#usage: python benchmarks/bench_batch.py [--images N] [--max-workers N] [--size WxH]
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from PIL import Image
+from retrofy import VHS
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=48)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--size", default="705x405")
+    parser.add_argument("--engine", default="fused")
+    args = parser.parse_args()
+
+    w, h = [int(value) for value in args.size.split("x")]
+    rs = np.random.RandomState(0)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        in_dir = os.path.join(tmp_dir, "in")
+        os.makedirs(in_dir)
+        for i in range(args.images):
+            Image.fromarray(rs.randint(0, 256, (h, w, 3), dtype=np.uint8)).save(os.path.join(in_dir, "{}.jpg".format(i)), quality=90)
+
+        workers_list = sorted(set([1, 2, 4, 8, 16, 32, 64, args.max_workers]))
+        workers_list = [workers for workers in workers_list if workers <= args.max_workers]
+
+        print("{:>8} {:>10} {:>10} {:>10}".format("workers", "seconds", "images/s", "scaling"))
+        single_rate = None
+        for workers in workers_list:
+            out_dir = os.path.join(tmp_dir, "out_{}".format(workers))
+            start = time.perf_counter()
+            results = list(VHS.process_many(in_dir, out_dir, effects=[("all_effects", {"engine": args.engine})], workers=workers, seed=0))
+            elapsed = time.perf_counter() - start
+
+            errors = [result for result in results if result.error != None]
+            if len(errors) > 0:
+                raise RuntimeError("{} images failed, first error: {!r}".format(len(errors), errors[0].error))
+
+            rate = len(results) / elapsed
+            if single_rate == None:
+                single_rate = rate
+            print("{:>8} {:>10.2f} {:>10.1f} {:>9.2f}x".format(workers, elapsed, rate, rate / single_rate))
+
+
+if __name__ == "__main__":
+    main()
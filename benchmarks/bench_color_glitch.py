@@ -0,0 +1,95 @@
+#compares the array backed VHS.apply_color_glitch against the legacy Pillow channel split implementation.
+#reports time per call and the peak memory growth of a call (measured on a fresh process, Pillow buffers are not seen by tracemalloc)
+#usage: python benchmarks/bench_color_glitch.py [--repeat N]
+import argparse
+import json
+import subprocess
+import sys
+import time
+import numpy as np
+from PIL import Image, ImageChops, ImageOps
+from retrofy import VHS
+from retrofy.configs import VHS_Configs
+from common import synthetic_img, get_peak_rss
+
+CONFIGS = VHS_Configs()
+
+SIZES = [(705, 405), (1920, 1080)]
+IMPLEMENTATIONS = ["legacy", "array"]
+
+
+def legacy_color_glitch(img, intensity=CONFIGS.DEFAULTS["color_glitch"]["intensity"], crop=True):
+    #apply_color_glitch before the array backed implementation
+    def single_channel_img(channel):
+        r, g, b = img.split()[:3]
+        if channel == "r":
+            g = g.point(lambda x: x-x)
+            b = b.point(lambda x: x-x)
+        elif channel == "g":
+            r = r.point(lambda x: x-x)
+            b = b.point(lambda x: x-x)
+        else:
+            r = r.point(lambda x: x-x)
+            g = g.point(lambda x: x-x)
+        return Image.merge("RGB", (r, g, b))
+
+    offset = VHS.get_color_glitch_offset(img.size[1], intensity)
+    red_img = ImageChops.offset(single_channel_img("r").convert("RGBA"), offset, -offset)
+    green_img = single_channel_img("g").convert("RGBA")
+    blue_img = ImageChops.offset(single_channel_img("b").convert("RGBA"), -offset, offset)
+
+    resulted_img = ImageChops.add(green_img, red_img, 1)
+    resulted_img = ImageChops.add(resulted_img, blue_img, 1)
+    if crop == True:
+        resulted_img = ImageOps.crop(resulted_img, offset)
+    return resulted_img
+
+
+def color_glitch(impl, img, crop=True):
+    if impl == "legacy":
+        return legacy_color_glitch(img, crop=crop)
+    return VHS(img, history=False).apply_color_glitch(crop=crop, inplace=False)
+
+
+def peak_memory(impl, size):
+    #peak RSS growth of a single call on a fresh process, in MB
+    code = """
+import json, sys
+sys.path.insert(0, {path!r})
+from bench_color_glitch import synthetic_img, color_glitch, get_peak_rss
+img = synthetic_img({size})
+color_glitch({impl!r}, synthetic_img((64, 64))) #imports and warm up
+before = get_peak_rss()
+color_glitch({impl!r}, img)
+print(json.dumps(get_peak_rss() - before))
+""".format(path=sys.path[0], size=size, impl=impl)
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, check=True, text=True).stdout
+    return json.loads(output) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print("{:>10} {:>8} {:>10} {:>10} {:>8} {:>10}".format("size", "impl", "mean ms", "min ms", "speedup", "peak MB"))
+    for size in SIZES:
+        img = synthetic_img(size)
+        for crop in [True, False]:
+            if np.array_equal(np.asarray(color_glitch("legacy", img, crop)), np.asarray(color_glitch("array", img, crop))) == False:
+                raise AssertionError("array implementation output differs from legacy output (crop={})".format(crop))
+
+        means = {}
+        for impl in IMPLEMENTATIONS:
+            times = []
+            for i in range(args.repeat):
+                start = time.perf_counter()
+                color_glitch(impl, img)
+                times.append(time.perf_counter() - start)
+            means[impl] = np.mean(times)
+            print("{:>10} {:>8} {:>10.2f} {:>10.2f} {:>7.2f}x {:>10.1f}".format("{}x{}".format(*size), impl, means[impl]*1000, min(times)*1000,
+                                                                            means["legacy"] / means[impl], peak_memory(impl, size)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#compares decoding large sources fully before thumbnailing them (the old loading) against reduce on decode loading.
+#reports latency and the peak RSS growth of a single load (measured on a fresh process)
+#usage: python benchmarks/bench_decode.py [--repeat N]
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from PIL import Image
+from retrofy.filters.filter import Filter
+from retrofy.loader import decode_image
+from common import synthetic_photo, get_peak_rss
+
+SOURCE_SIZE = (6000, 4000) #24 megapixels
+FORMATS = ["jpg", "png"]
+
+
+def old_load(path):
+    img = Image.open(path).convert("RGB")
+    img.thumbnail(Filter.MAX_SIZE)
+    return img
+
+
+def new_load(path):
+    return decode_image(path, Filter.MAX_SIZE)
+
+
+def peak_memory(loader_name, path):
+    #peak RSS growth of a single load on a fresh process, in MB
+    code = """
+import json, sys
+sys.path.insert(0, {bench_path!r})
+import bench_decode
+before = bench_decode.get_peak_rss()
+bench_decode.{loader_name}({path!r})
+print(json.dumps(bench_decode.get_peak_rss() - before))
+""".format(bench_path=sys.path[0], loader_name=loader_name, path=path)
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, check=True, text=True).stdout
+    return json.loads(output) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    img = synthetic_photo(SOURCE_SIZE)
+    with tempfile.TemporaryDirectory() as folder:
+        print("{}x{} sources, fitted in {}x{}".format(*SOURCE_SIZE, *Filter.MAX_SIZE))
+        print("{:>6} {:>6} {:>10} {:>10} {:>8} {:>10} {:>10}".format("format", "loader", "mean ms", "min ms", "speedup", "peak MB", "mean diff"))
+        for format in FORMATS:
+            path = os.path.join(folder, "source." + format)
+            img.save(path, quality=90) if format == "jpg" else img.save(path, compress_level=1)
+
+            old_arr = np.asarray(old_load(path)).astype(np.float32)
+            means = {}
+            for name, load in [("old", old_load), ("new", new_load)]:
+                resulted_arr = np.asarray(load(path)).astype(np.float32)
+                if resulted_arr.shape != old_arr.shape:
+                    raise AssertionError("loaders returned different sizes: {} and {}".format(old_arr.shape, resulted_arr.shape))
+                times = []
+                for i in range(args.repeat):
+                    start = time.perf_counter()
+                    load(path)
+                    times.append(time.perf_counter() - start)
+                means[name] = np.mean(times)
+                print("{:>6} {:>6} {:>10.1f} {:>10.1f} {:>7.2f}x {:>10.1f} {:>10.2f}".format(format, name, means[name]*1000, min(times)*1000, means["old"] / means[name],
+                                                                                      peak_memory(name + "_load", path), np.abs(resulted_arr - old_arr).mean()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+#compares VHS.apply_all_effects with engine="steps" against engine="fused"
+#usage: python benchmarks/bench_fused_engine.py [--repeat N]
+import argparse
+import time
+import numpy as np
+from retrofy import VHS
+from common import synthetic_img
+
+SIZES = [(705, 405), (1920, 1080)]
+ENGINES = ["steps", "fused"]
+
+
+def run(img, engine, seed):
+    start = time.perf_counter()
+    resulted_img = VHS(img, seed=seed).apply_all_effects(inplace=False, engine=engine)
+    return time.perf_counter() - start, resulted_img
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print("{:>10} {:>8} {:>10} {:>10} {:>8}".format("size", "engine", "mean ms", "min ms", "speedup"))
+    for size in SIZES:
+        img = synthetic_img(size)
+        timings = {}
+        results = {}
+        for engine in ENGINES:
+            run(img, engine, 0) #warm up
+            times = []
+            for i in range(args.repeat):
+                elapsed, results[engine] = run(img, engine, i)
+                times.append(elapsed)
+            timings[engine] = times
+
+        for engine in ENGINES:
+            times = timings[engine]
+            speedup = np.mean(timings["steps"]) / np.mean(times)
+            print("{:>10} {:>8} {:>10.1f} {:>10.1f} {:>7.2f}x".format("{}x{}".format(*size), engine, np.mean(times)*1000, np.min(times)*1000, speedup))
+
+        #same seed on both engines gives the same masks, so the outputs can be compared pixel by pixel
+        steps_arr = np.asarray(results["steps"].convert("RGB")).astype(int)
+        fused_arr = np.asarray(results["fused"].convert("RGB")).astype(int)
+        diff = np.abs(steps_arr - fused_arr)
+        print("{:>10} max abs diff: {}, identical pixels: {:.4f}%".format("", diff.max(), (diff == 0).mean()*100))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#compares loading and retrofying URL sources one connection per image (the old loader), on the pooled loader and with
+#prefetching, against a local HTTP server that stands in for the network with a fixed latency per request
+#usage: python benchmarks/bench_loader.py [--images N] [--latency SECONDS] [--workers N]
+import argparse
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import requests
+from PIL import Image
+from retrofy import VHS
+from retrofy.loader import Loader
+from common import synthetic_jpeg
+
+
+def start_server(body, latency):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1" #keeps connections alive
+
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def retrofy(img, process):
+    if process == True:
+        VHS(img, history=False).apply_all_effects(engine="fused")
+
+
+def old_loader(urls, process):
+    for url in urls:
+        retrofy(Image.open(requests.get(url, stream=True).raw).convert("RGB"), process)
+
+
+def pooled_loader(urls, process):
+    loader = Loader()
+    for url in urls:
+        retrofy(loader.open_image(url), process)
+    loader.close()
+
+
+def prefetch_loader(urls, process, workers):
+    loader = Loader()
+    for result in loader.prefetch(urls, workers=workers):
+        retrofy(result.img, process)
+    loader.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    server = start_server(synthetic_jpeg(), args.latency)
+    urls = ["http://127.0.0.1:{}/{}.jpg".format(server.server_address[1], i) for i in range(args.images)]
+
+    modes = [("old", old_loader), ("pooled", pooled_loader), ("prefetch", lambda urls, process: prefetch_loader(urls, process, args.workers))]
+    print("{} images, {:.0f} ms latency per request".format(args.images, args.latency*1000))
+    print("{:>10} {:>10} {:>10} {:>10} {:>8}".format("work", "loader", "total s", "images/s", "speedup"))
+    for process in [False, True]:
+        baseline = None
+        for name, run in modes:
+            start = time.perf_counter()
+            run(urls, process)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            work = "retrofy" if process == True else "download"
+            print("{:>10} {:>10} {:>10.2f} {:>10.1f} {:>7.2f}x".format(work, name, elapsed, args.images / elapsed, baseline / elapsed))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+#measures frames per second of VHSStream against one VHS object per frame (fused engine)
+#usage: python benchmarks/bench_stream.py [--frames N] [--play-text]
+import argparse
+import time
+import numpy as np
+from PIL import Image
+from retrofy import VHS, VHSStream
+
+SIZES = [(705, 405), (1280, 720), (1920, 1080)]
+
+
+def synthetic_frames(size, n_frames, seed=0):
+    rs = np.random.RandomState(seed)
+    base = rs.randint(0, 256, (size[1], size[0], 3), dtype=np.uint8)
+    #slowly moving frames, closer to a real video than pure noise
+    return [np.roll(base, i, axis=1) for i in range(n_frames)]
+
+
+def per_frame(frames, play_text):
+    for i, frame in enumerate(frames):
+        yield np.asarray(VHS(Image.fromarray(frame), seed=i).apply_all_effects(inplace=False, play_text=play_text, engine="fused"))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--play-text", action="store_true")
+    args = parser.parse_args()
+
+    print("{:>10} {:>10} {:>8} {:>8}".format("size", "mode", "fps", "speedup"))
+    for size in SIZES:
+        frames = synthetic_frames(size, args.frames)
+
+        start = time.perf_counter()
+        for frame in per_frame(frames, args.play_text):
+            pass
+        per_frame_fps = args.frames / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for frame in VHSStream(play_text=args.play_text, seed=0).process(frames):
+            pass
+        stream_fps = args.frames / (time.perf_counter() - start)
+
+        label = "{}x{}".format(*size)
+        print("{:>10} {:>10} {:>8.1f} {:>7.2f}x".format(label, "per frame", per_frame_fps, 1))
+        print("{:>10} {:>10} {:>8.1f} {:>7.2f}x".format(label, "stream", stream_fps, stream_fps / per_frame_fps))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#compares apply_all_effects on the fused engine (a float32 buffer of the whole image) against the strips engine on large images.
+#reports time per call and the peak memory growth of a call (measured on a fresh process, Pillow buffers are not seen by tracemalloc)
+#usage: python benchmarks/bench_strips.py [--repeat N] [--strip-height N]
+import argparse
+import json
+import subprocess
+import sys
+import time
+import numpy as np
+from retrofy import VHS
+from retrofy.configs import VHS_Configs
+from common import synthetic_img, get_peak_rss
+
+CONFIGS = VHS_Configs()
+
+SIZES = [(1920, 1080), (3840, 2160), (7680, 4320)]
+ENGINES = ["fused", "strips"]
+
+
+def all_effects(engine, img, strip_height=CONFIGS.DEFAULTS["strips"]["height"], seed=0):
+    vhs = VHS(img, seed=seed, history=False, max_size=None)
+    if engine == "strips":
+        return vhs.render_strips(graph=VHS.get_all_effects_graph(wave_warp=True), strip_height=strip_height)
+    return np.asarray(vhs.apply_graph(VHS.get_all_effects_graph(wave_warp=True), inplace=False))
+
+
+def peak_memory(engine, size, strip_height):
+    #peak RSS growth of a single call on a fresh process, in MB
+    code = """
+import json, sys
+sys.path.insert(0, {path!r})
+from bench_strips import synthetic_img, all_effects, get_peak_rss
+img = synthetic_img({size})
+all_effects({engine!r}, synthetic_img((64, 64)), {strip_height}) #imports and warm up
+before = get_peak_rss()
+all_effects({engine!r}, img, {strip_height})
+print(json.dumps(get_peak_rss() - before))
+""".format(path=sys.path[0], size=size, engine=engine, strip_height=strip_height)
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, check=True, text=True).stdout
+    return json.loads(output) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--strip-height", type=int, default=CONFIGS.DEFAULTS["strips"]["height"])
+    args = parser.parse_args()
+
+    print("{:>10} {:>8} {:>10} {:>10} {:>8} {:>10}".format("size", "engine", "mean ms", "min ms", "speedup", "peak MB"))
+    for size in SIZES:
+        img = synthetic_img(size)
+        if np.array_equal(all_effects("fused", img), all_effects("strips", img, args.strip_height)) == False:
+            raise AssertionError("strips engine output differs from fused engine output")
+
+        means = {}
+        for engine in ENGINES:
+            times = []
+            for i in range(args.repeat):
+                start = time.perf_counter()
+                all_effects(engine, img, args.strip_height)
+                times.append(time.perf_counter() - start)
+            means[engine] = np.mean(times)
+            print("{:>10} {:>8} {:>10.1f} {:>10.1f} {:>7.2f}x {:>10.1f}".format("{}x{}".format(*size), engine, means[engine]*1000, min(times)*1000,
+                                                                            means["fused"] / means[engine], peak_memory(engine, size, args.strip_height)))
+
+
+if __name__ == "__main__":
+    main()
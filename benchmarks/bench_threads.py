@@ -0,0 +1,49 @@
+#scaling of apply_all_effects with the threads of the filter, from 1 to N threads. every run must give the same image
+#as the single threaded run with the same seed
+#usage: python benchmarks/bench_threads.py [--repeat N] [--max-threads N]
+import argparse
+import os
+import time
+import numpy as np
+from retrofy import VHS
+from common import synthetic_img
+
+SIZES = [(1920, 1080), (3840, 2160)]
+ENGINES = ["fused", "steps"]
+
+
+def all_effects(img, engine, threads, seed=0):
+    vhs = VHS(img, seed=seed, history=False, max_size=None, threads=threads)
+    return vhs.apply_all_effects(inplace=False, engine=engine, wave_warp=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-threads", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    thread_counts = sorted(set([1] + [2**i for i in range(1, args.max_threads.bit_length())] + [args.max_threads]))
+    print("{} CPUs".format(os.cpu_count()))
+    print("{:>10} {:>8} {:>8} {:>10} {:>10} {:>8}".format("size", "engine", "threads", "mean ms", "min ms", "speedup"))
+    for size in SIZES:
+        img = synthetic_img(size)
+        for engine in ENGINES:
+            expected_arr = np.asarray(all_effects(img, engine, 1))
+            baseline = None
+            for threads in thread_counts:
+                if np.array_equal(np.asarray(all_effects(img, engine, threads)), expected_arr) == False:
+                    raise AssertionError("{} threads output differs from single threaded output ({} engine)".format(threads, engine))
+
+                times = []
+                for i in range(args.repeat):
+                    start = time.perf_counter()
+                    all_effects(img, engine, threads)
+                    times.append(time.perf_counter() - start)
+                baseline = baseline or np.mean(times)
+                print("{:>10} {:>8} {:>8} {:>10.1f} {:>10.1f} {:>7.2f}x".format("{}x{}".format(*size), engine, threads, np.mean(times)*1000, min(times)*1000,
+                                                                                baseline / np.mean(times)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+#helpers shared by the benchmarks: synthetic images and the peak RSS of the process
+import io
+import resource
+import numpy as np
+from PIL import Image
+
+
+def synthetic_img(size, seed=0):
+    #random noise. draws uint8 straight away, so building the image does not raise the peak memory
+    rng = np.random.default_rng(seed)
+    return Image.fromarray(rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8), "RGB")
+
+
+def synthetic_photo(size, seed=0):
+    #smooth gradients with some noise, closer to a photo than pure noise (so encoded files have realistic sizes)
+    rng = np.random.default_rng(seed)
+    w, h = size
+    x = np.linspace(0, 1, w, dtype=np.float32)[None, :]
+    y = np.linspace(0, 1, h, dtype=np.float32)[:, None]
+    arr = np.empty((h, w, 3), dtype=np.uint8)
+    for channel, (fx, fy) in enumerate([(3, 2), (5, 1), (1, 4)]):
+        plane = 127 + 100 * np.sin(fx * np.pi * x) * np.cos(fy * np.pi * y)
+        plane += rng.normal(0, 8, (h, w)).astype(np.float32)
+        arr[:, :, channel] = np.clip(plane, 0, 255)
+    return Image.fromarray(arr, "RGB")
+
+
+def synthetic_jpeg(size=(1280, 720), seed=0):
+    data = io.BytesIO()
+    synthetic_img(size, seed).save(data, "JPEG", quality=90)
+    return data.getvalue()
+
+
+def get_peak_rss():
+    #peak RSS in KB. ru_maxrss is inherited from the forked parent on Linux, VmHWM starts again on exec
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
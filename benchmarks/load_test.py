@@ -0,0 +1,98 @@
+#throughput and latency of the rendering service (retrofy serve) on localhost, with concurrent keep alive clients.
+#starts its own server unless --url is given. requests answered with 503 (queue full) are counted apart
+#usage: python benchmarks/load_test.py [--url http://127.0.0.1:8765] [--workers N] [--max-queue N] [--requests N] [--concurrency N ...]
+#                                      [--size WIDTHxHEIGHT] [--effects JSON] [--format png]
+import argparse
+import http.client
+import threading
+import time
+from urllib.parse import urlsplit, urlencode
+import numpy as np
+from retrofy.server import RenderServer
+from common import synthetic_jpeg
+
+
+def run_clients(host, port, path, body, n_requests, concurrency):
+    #every client sends requests on its own connection until 'n_requests' were sent. returns latencies by status
+    lock = threading.Lock()
+    counter = [0]
+    latencies = {}
+
+    def client():
+        connection = http.client.HTTPConnection(host, port, timeout=300)
+        while True:
+            with lock:
+                if counter[0] >= n_requests:
+                    break
+                counter[0] += 1
+            start = time.perf_counter()
+            try:
+                connection.request("POST", path, body=body, headers={"Content-Type": "application/octet-stream"})
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection(host, port, timeout=300)
+                status = "error"
+            with lock:
+                latencies.setdefault(status, []).append(time.perf_counter() - start)
+        connection.close()
+
+    threads = [threading.Thread(target=client) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=None, help="server to test, a new one is started by default")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-queue", type=int, default=None)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--size", default="1280x720")
+    parser.add_argument("--effects", default=None, help="effects JSON, as '[[\"all_effects\", {\"engine\": \"fused\"}]]'")
+    parser.add_argument("--format", default="jpeg")
+    args = parser.parse_args()
+
+    server = None
+    if args.url == None:
+        server = RenderServer(port=0, workers=args.workers, max_queue=args.max_queue)
+        start = time.perf_counter()
+        server.start()
+        print("started {} warm workers in {:.2f} s (queue of {})".format(server.workers, time.perf_counter() - start, server.max_queue))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.address
+    else:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+
+    query = {"format": args.format, "seed": 0}
+    if args.effects != None:
+        query["effects"] = args.effects
+    path = "/render?" + urlencode(query)
+    body = synthetic_jpeg(tuple(int(v) for v in args.size.split("x")))
+
+    print("{} requests of a {} image".format(args.requests, args.size))
+    print("{:>11} {:>10} {:>10} {:>10} {:>10} {:>10} {:>6} {:>6}".format("concurrency", "req/s", "p50 ms", "p90 ms", "p99 ms", "max ms", "503", "errors"))
+    try:
+        for concurrency in args.concurrency:
+            elapsed, latencies = run_clients(host, port, path, body, args.requests, concurrency)
+            ok = np.array(latencies.get(200, [np.nan])) * 1000
+            rejected = len(latencies.get(503, []))
+            errors = sum(len(values) for status, values in latencies.items() if status not in [200, 503])
+            print("{:>11} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f} {:>6} {:>6}".format(concurrency, len(latencies.get(200, [])) / elapsed,
+                  *np.percentile(ok, [50, 90, 99]), ok.max(), rejected, errors))
+    finally:
+        if server != None:
+            print("server stats: {}".format(server.stats))
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+#benchmark suite of every VHS effect, noise lines generation, filter loading and encoding and the full pipeline, on synthetic images,
+#and of the import time of the package (on fresh interpreters, once for all sizes).
+#for every case and size it reports the wall time of a call, the peak of memory allocated by Python and numpy
+#(tracemalloc, Pillow buffers are not seen by it) and the peak RSS growth (on a fresh process, Pillow buffers included).
+#results can be saved as a named baseline and later runs compared against it, showing regressions. baselines are saved on
+#benchmarks/baselines/NAME.json and only make sense on the machine that ran them, so none is committed: save one from the
+#main branch (--save main) before a change and compare the change against it (--compare main)
+#usage: python benchmarks/suite.py [--cases PATTERN ...] [--sizes 405p ...] [--repeat N] [--no-memory] [--save NAME] [--compare NAME] [--threshold RATIO]
+import argparse
+import fnmatch
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+import numpy as np
+from PIL import Image
+import retrofy
+from retrofy import VHS
+from common import synthetic_photo, get_peak_rss
+
+SIZES = {
+    "405p": (705, 405),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4K": (3840, 2160)
+}
+BASELINES_FOLDER = Path(__file__).parent / "baselines"
+
+
+def vhs(img):
+    return VHS(img, seed=0, history=False, max_size=None)
+
+
+
+#every case is a function of the image that does the setup (not timed) and returns the call to time
+def load_file(img):
+    path = Path(tempfile.gettempdir()) / "retrofy_suite_{}x{}.png".format(*img.size)
+    if path.exists() == False:
+        img.save(path, compress_level=1)
+    return lambda: VHS(str(path), history=False, max_size=None)
+
+def load_bytes(img):
+    data = io.BytesIO()
+    img.save(data, "JPEG", quality=90)
+    data = data.getvalue()
+    return lambda: VHS.from_bytes(data, history=False, max_size=None)
+
+def to_bytes_png(img):
+    return lambda vhs=vhs(img): vhs.to_bytes("png")
+
+def to_bytes_jpeg(img):
+    return lambda vhs=vhs(img): vhs.to_bytes("jpeg")
+
+def to_bytes_webp(img):
+    return lambda vhs=vhs(img): vhs.to_bytes("webp")
+
+def generate_noise_lines(img):
+    rng = np.random.default_rng(0)
+    return lambda: VHS.generate_noise_lines(img.size, rng=rng)
+
+def apply_noise_lines(img):
+    return lambda vhs=vhs(img): vhs.apply_noise_lines(inplace=False)
+
+def apply_color_glitch(img):
+    return lambda vhs=vhs(img): vhs.apply_color_glitch(inplace=False)
+
+def apply_horizontal_lines(img):
+    return lambda vhs=vhs(img): vhs.apply_horizontal_lines(inplace=False)
+
+def apply_film_grain(img):
+    return lambda vhs=vhs(img): vhs.apply_film_grain(inplace=False)
+
+def apply_play_text(img):
+    return lambda vhs=vhs(img): vhs.apply_play_text(hour=12, inplace=False)
+
+def apply_wave_warp(img):
+    return lambda vhs=vhs(img): vhs.apply_wave_warp(inplace=False)
+
+def apply_wave_warp_bands(img):
+    return lambda vhs=vhs(img): vhs.apply_wave_warp(mode="bands", zones=4, inplace=False)
+
+def apply_all_effects_steps(img):
+    return lambda vhs=vhs(img): vhs.apply_all_effects(inplace=False, engine="steps")
+
+def apply_all_effects_fused(img):
+    return lambda vhs=vhs(img): vhs.apply_all_effects(inplace=False, engine="fused")
+
+def apply_all_effects_strips(img):
+    return lambda vhs=vhs(img): vhs.apply_all_effects(inplace=False, engine="strips")
+
+def array_all_effects_fused(img):
+    #an array in and an array out, as callers holding numpy frames (e.g. OpenCV) use it, with no Pillow image in between
+    arr = np.asarray(img)
+    def run():
+        vhs = VHS(arr, seed=0, history=False, max_size=None)
+        vhs.apply_all_effects(engine="fused")
+        return vhs.array
+    return run
+
+#import cases: statements timed on a fresh interpreter, without its startup
+IMPORTS = {
+    "import_retrofy": "import retrofy",
+    "import_loader": "import retrofy.loader",
+    "import_vhs": "from retrofy import VHS",
+    "import_server": "import retrofy.server"
+}
+
+CASES = {case.__name__: case for case in [load_file, load_bytes, to_bytes_png, to_bytes_jpeg, to_bytes_webp, generate_noise_lines, apply_noise_lines, apply_color_glitch, apply_horizontal_lines,
+                                          apply_film_grain, apply_play_text, apply_wave_warp, apply_wave_warp_bands, apply_all_effects_steps, apply_all_effects_fused,
+                                          apply_all_effects_strips, array_all_effects_fused]}
+
+
+
+def time_case(case, img, repeat):
+    run = CASES[case](img)
+    run() #warm up (caches, fonts, grain pool)
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return {"mean_ms": np.mean(times)*1000, "min_ms": min(times)*1000}
+
+
+def time_import(case, repeat):
+    code = "import time\nstart = time.perf_counter()\n{}\nprint(time.perf_counter() - start)".format(IMPORTS[case])
+    times = [float(subprocess.run([sys.executable, "-c", code], capture_output=True, check=True, text=True).stdout) for i in range(repeat)]
+    return {"mean_ms": np.mean(times)*1000, "min_ms": min(times)*1000}
+
+
+def measure_memory(case, size):
+    #runs on a fresh process: peak RSS growth and tracemalloc peak of a single call, in MB
+    img = synthetic_photo(size)
+    run = CASES[case](img)
+    CASES[case](synthetic_photo((64, 64)))() #imports and warm up, without raising the peak
+    before = get_peak_rss()
+    tracemalloc.start()
+    run()
+    traced_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"traced_mb": traced_peak / 2**20, "peak_rss_mb": (get_peak_rss() - before) / 1024}
+
+
+def memory_case(case, size):
+    code = """
+import json, sys
+sys.path.insert(0, {path!r})
+import suite
+print(json.dumps(suite.measure_memory({case!r}, {size})))
+""".format(path=str(Path(__file__).parent), case=case, size=size)
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, check=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+
+def get_machine():
+    return {"python": platform.python_version(), "numpy": np.__version__, "pillow": Image.__version__, "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(), "cpus": os.cpu_count()}
+
+
+def save_baseline(name, results):
+    BASELINES_FOLDER.mkdir(exist_ok=True)
+    path = BASELINES_FOLDER / (name + ".json")
+    with open(path, "w") as baseline_file:
+        json.dump({"machine": get_machine(), "results": results}, baseline_file, indent=2, sort_keys=True)
+    return path
+
+
+def load_baseline(name):
+    path = BASELINES_FOLDER / (name + ".json")
+    if path.exists() == False:
+        raise SystemExit("No baseline named '{}' on {}.".format(name, BASELINES_FOLDER))
+    with open(path) as baseline_file:
+        return json.load(baseline_file)
+
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cases", nargs="+", default=["*"], help="case names or patterns, as 'apply_*'")
+    parser.add_argument("--sizes", nargs="+", default=list(SIZES), choices=list(SIZES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--no-memory", action="store_true", help="skip the memory measures, which run every case on a fresh process")
+    parser.add_argument("--save", metavar="NAME", help="saves the results as baseline NAME")
+    parser.add_argument("--compare", metavar="NAME", help="compares the results against baseline NAME")
+    parser.add_argument("--threshold", type=float, default=1.2, help="time or memory ratio over the baseline reported as a regression")
+    args = parser.parse_args()
+
+    selected = lambda case: any(fnmatch.fnmatch(case, pattern) for pattern in args.cases)
+    jobs = [(case, "-") for case in IMPORTS if selected(case)]
+    jobs += [(case, size_name) for size_name in args.sizes for case in CASES if selected(case)]
+    baseline = load_baseline(args.compare)["results"] if args.compare != None else {}
+
+    print("retrofy {}, {}".format(getattr(retrofy, "__version__", "dev"), ", ".join("{} {}".format(k, v) for k, v in get_machine().items())))
+    print("{:>26} {:>6} {:>10} {:>10} {:>10} {:>10} {:>10}".format("case", "size", "mean ms", "min ms", "traced MB", "peak MB", "vs base"))
+    results = {}
+    regressions = []
+    img = None
+    for case, size_name in jobs:
+        key = "{}[{}]".format(case, size_name)
+        try:
+            if case in IMPORTS:
+                result = time_import(case, args.repeat)
+            else:
+                if img == None or img.size != SIZES[size_name]:
+                    img = synthetic_photo(SIZES[size_name])
+                result = time_case(case, img, args.repeat)
+                if args.no_memory == False:
+                    result.update(memory_case(case, SIZES[size_name]))
+        except Exception as e: #a failing case is reported, the others still run
+            print("{:>26} {:>6} {}: {}".format(case, size_name, type(e).__name__, e))
+            continue
+        results[key] = result
+
+        comparison = ""
+        if key in baseline:
+            ratio = result["mean_ms"] / baseline[key]["mean_ms"]
+            comparison = "{:.2f}x".format(ratio)
+            for measure in ["mean_ms", "traced_mb", "peak_rss_mb"]:
+                if measure in result and measure in baseline[key] and result[measure] > baseline[key][measure] * args.threshold and result[measure] - baseline[key][measure] > 1:
+                    regressions.append("{} {}: {:.1f} -> {:.1f}".format(key, measure, baseline[key][measure], result[measure]))
+                    comparison += " !"
+        print("{:>26} {:>6} {:>10.1f} {:>10.1f} {:>10} {:>10} {:>10}".format(case, size_name, result["mean_ms"], result["min_ms"],
+                                                                      "{:.1f}".format(result["traced_mb"]) if "traced_mb" in result else "-",
+                                                                      "{:.1f}".format(result["peak_rss_mb"]) if "peak_rss_mb" in result else "-", comparison))
+
+    if args.save != None:
+        print("saved baseline on {}".format(save_baseline(args.save, results)))
+    if len(regressions) > 0:
+        print("\nregressions over {:.2f}x the '{}' baseline:".format(args.threshold, args.compare))
+        for regression in regressions:
+            print("  " + regression)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
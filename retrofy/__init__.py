@@ -1 +1,14 @@
-from retrofy.filters.vhs import VHS
+#filters are imported on first access, so 'import retrofy' (or retrofy.loader, retrofy.utils...) does not import numpy
+#and every effect module. 'from retrofy import VHS' works as before
+__all__ = ["VHS", "VHSStream", "Preset"]
+
+
+def __getattr__(name):
+    if name in __all__:
+        import retrofy.filters.vhs as vhs
+        return getattr(vhs, name)
+    raise AttributeError("module 'retrofy' has no attribute '{}'".format(name))
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,3 @@
+from retrofy.cli import main
+
+main()
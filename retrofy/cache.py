@@ -0,0 +1,115 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+from retrofy.configs import Cache_Configs
+
+CONFIGS = Cache_Configs()
+
+class MaskCache():
+
+    def __init__(self, max_bytes=CONFIGS.DEFAULTS["max_bytes"], enabled=CONFIGS.DEFAULTS["enabled"]):
+        if isinstance(max_bytes, int) == False:
+            raise TypeError("Parameter 'max_bytes' must be an integer.")
+        if isinstance(enabled, bool) == False:
+            raise TypeError("Parameter 'enabled' must be a boolean.")
+
+        self.__entries = OrderedDict() #least recently used entries first
+        self.__lock = threading.Lock()
+        self.__max_bytes = max_bytes
+        self.__enabled = enabled
+        self.__bytes = 0
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+
+
+
+    @property
+    def enabled(self):
+        return self.__enabled
+
+    @enabled.setter
+    def enabled(self, enabled):
+        if isinstance(enabled, bool) == False:
+            raise TypeError("Parameter 'enabled' must be a boolean.")
+        self.__enabled = enabled
+        if enabled == False:
+            self.clear()
+
+    @property
+    def max_bytes(self):
+        return self.__max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, max_bytes):
+        if isinstance(max_bytes, int) == False:
+            raise TypeError("Parameter 'max_bytes' must be an integer.")
+        with self.__lock:
+            self.__max_bytes = max_bytes
+            self.__evict()
+
+    @property
+    def stats(self):
+        with self.__lock:
+            return {
+                "hits": self.__hits,
+                "misses": self.__misses,
+                "evictions": self.__evictions,
+                "entries": len(self.__entries),
+                "bytes": self.__bytes,
+                "max_bytes": self.__max_bytes,
+                "enabled": self.__enabled
+            }
+
+
+
+    def __evict(self):
+        while self.__bytes > self.__max_bytes and len(self.__entries) > 0:
+            _, arr = self.__entries.popitem(last=False)
+            self.__bytes -= arr.nbytes
+            self.__evictions += 1
+
+
+
+    def get(self, key, builder):
+        #returns the array cached on 'key' (effect, size, params...), building it with 'builder()' on a miss.
+        #cached arrays are read only, since they are shared by every caller
+        if self.__enabled == False:
+            return np.asarray(builder())
+
+        with self.__lock:
+            arr = self.__entries.get(key)
+            if arr is not None:
+                self.__entries.move_to_end(key)
+                self.__hits += 1
+                return arr
+            self.__misses += 1
+
+        arr = np.asarray(builder())
+        arr.flags.writeable = False
+
+        with self.__lock:
+            if arr.nbytes <= self.__max_bytes and key not in self.__entries:
+                self.__entries[key] = arr
+                self.__bytes += arr.nbytes
+                self.__evict()
+        return arr
+
+
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            self.__bytes = 0
+
+
+
+    def reset_stats(self):
+        with self.__lock:
+            self.__hits = 0
+            self.__misses = 0
+            self.__evictions = 0
+
+
+
+MASK_CACHE = MaskCache() #process wide cache for masks that only depend on image size and parameters
@@ -0,0 +1,43 @@
+import argparse
+from retrofy.filters.filter import Filter, DEFAULT_MAX_SIZE
+from retrofy.configs import Server_Configs
+
+CONFIGS = Server_Configs()
+
+
+
+def get_size(value):
+    #'WIDTHxHEIGHT', 'none' or 'default' (the max size of the filter class, resolved when images are loaded)
+    if value.lower() == "none":
+        return None
+    if value.lower() == DEFAULT_MAX_SIZE:
+        return DEFAULT_MAX_SIZE
+    try:
+        w, h = value.lower().split("x")
+        return (int(w), int(h))
+    except ValueError:
+        raise argparse.ArgumentTypeError("Size must be WIDTHxHEIGHT, 'none' or 'default'.")
+
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog="retrofy")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="runs the local HTTP rendering service")
+    serve_parser.add_argument("--host", default=CONFIGS.DEFAULTS["host"])
+    serve_parser.add_argument("--port", type=int, default=CONFIGS.DEFAULTS["port"])
+    serve_parser.add_argument("--workers", type=int, default=None, help="worker processes, one per CPU by default")
+    serve_parser.add_argument("--max-queue", type=int, default=None, help="requests waiting for a worker before new ones get 503 ({} per worker by default)".format(CONFIGS.DEFAULTS["queue_per_worker"]))
+    serve_parser.add_argument("--max-size", type=get_size, default=DEFAULT_MAX_SIZE, help="images are fitted in WIDTHxHEIGHT, or kept with 'none' (default: the max size of the filter, {}x{})".format(*Filter.MAX_SIZE))
+    serve_parser.add_argument("--timeout", type=float, default=CONFIGS.DEFAULTS["timeout"])
+    args = parser.parse_args(args)
+
+    if args.command == "serve":
+        from retrofy.server import serve #only the service needs it
+        serve(args.host, args.port, args.workers, args.max_queue, args.max_size, args.timeout)
+
+
+
+if __name__ == "__main__":
+    main()
@@ -2,27 +2,102 @@ from pathlib import Path
 import os
 
 DOWNLOADS_FOLDER = Path(os.path.expanduser("~")) / Path("Downloads/")
+PACKAGE_FOLDER = Path(__file__).resolve().parent #assets paths do not depend on the current working directory
 
 class Filter_Configs():
 
+    FORMATS = ["jpg", "jpeg", "png", "bmp", "gif", "tif", "tiff", "webp"] #image files formats read from directories
+
     MAXS = {
         "size": (1920, 1080)
     }
 
+    DEFAULTS = {
+        "history": {
+            "max_entries": 20, #modifications kept for undo/redo
+            "max_bytes": 256 * 1024 * 1024,
+            "uncompressed_entries": 2, #most recent modifications kept as images, older ones are compressed
+            "compression_level": 1
+        },
+        "batch": {
+            "in_flight_per_worker": 2 #sources submitted per worker before waiting for results
+        }
+    }
+
+class Cache_Configs():
+
+    DEFAULTS = {
+        "max_bytes": 256 * 1024 * 1024, #memory budget of the masks cache
+        "enabled": True
+    }
+
+class Profiling_Configs():
+
+    DEFAULTS = {
+        "enabled": False, #process wide profiling of every filter, filters with a profiler are always profiled
+        "track_allocations": False, #measures allocations with tracemalloc, which slows every call down
+        "max_records": 1000 #records kept by a profiler, oldest are dropped first
+    }
+
+class Server_Configs():
+
+    FORMATS = {"png": "image/png", "jpeg": "image/jpeg", "webp": "image/webp"} #encodings of the rendered images
+
+    DEFAULTS = {
+        "host": "127.0.0.1",
+        "port": 8765,
+        "queue_per_worker": 4, #requests waiting per worker, more requests are answered with 503 until the queue drains
+        "max_body_bytes": 32 * 1024 * 1024,
+        "timeout": 120, #seconds a request may wait for its render
+        "format": "png",
+        "quality": 90, #jpeg and webp quality
+        "warm_up_size": (705, 405) #size of the image every worker renders on start, to load fonts, assets and masks
+    }
+
+class Loader_Configs():
+
+    ENCODERS = { #Pillow format and default options of every encoder, options favour encoding speed
+        "png": ("PNG", {"compress_level": 1}), #0 (fastest, biggest) to 9
+        "jpeg": ("JPEG", {"quality": 90, "optimize": False}),
+        "webp": ("WEBP", {"quality": 90, "method": 2}) #0 (fastest, biggest) to 6
+    }
+    ALPHA_FORMATS = ["png", "webp"] #formats that keep transparency
+
+    DEFAULTS = {
+        "timeout": (5, 30), #(connect, read) seconds
+        "retries": 3, #retries of failed connections and 429/5xx responses
+        "backoff": 0.3, #seconds, doubled on every retry
+        "pool_size": 16, #kept alive connections per host
+        "prefetch": {
+            "workers": 8,
+            "look_ahead_per_worker": 2 #sources downloaded ahead of the consumer per worker
+        }
+    }
+
 class VHS_Configs():
 
     SIZE = (705, 405)
 
+    ENGINES = ("steps", "fused", "strips") #'steps' applies each effect on its own image, 'fused' applies them on a single array, 'strips' on horizontal strips of it
+    PRESET_ENGINES = ("fused", "strips") #presets only run resolved graphs
+    WAVE_WARP_MODES = ("block", "sine", "bands") #'block' repeats the rows above the warp, 'sine' bends its rows sideways, 'bands' shifts bands of them by random offsets
+    BLENDS = ("native", "blend_modes") #'native' blends RGB float32 arrays, 'blend_modes' is the legacy RGBA float64 blend (needs blend_modes)
+
     PATHS = {
         "images": {
-            ".": Path("./retrofy/filters/vhs/images"),
-            "noise_lines": Path("./retrofy/filters/vhs/images/noise_lines")
+            ".": PACKAGE_FOLDER / Path("filters/vhs/images"),
+            "noise_lines": PACKAGE_FOLDER / Path("filters/vhs/images/noise_lines")
         },
 
-        "fonts": Path("./retrofy/filters/vhs/fonts")
+        "fonts": PACKAGE_FOLDER / Path("filters/vhs/fonts")
 
     }
 
+    FONTS = {
+        "vhs": "VCR_OSD_MONO_1.001.ttf",
+        "play_icon": "play_icon.ttf"
+    }
+
     MAXS = {
         "noise_lines": {
             "iter": 30, #iterations
@@ -84,7 +159,11 @@ class VHS_Configs():
         "film_grain": {
             "gaussian_std": 100000,
             "intensity": 0.4,
-            "blur": 0.3
+            "blur": 0.3,
+            "pooled": True, #grain layers are taken from a pool of pre generated tiles
+            "pool_tiles": 4, #tiles per intensity and blur level
+            "pool_tile_size": 512,
+            "pool_seed": 0
         },
         "horizontal_lines": {
             "intensity": 0.4,
@@ -94,12 +173,39 @@ class VHS_Configs():
         },
         "wave_warp": {
             "intensity":0.6,
-            "height_divider": 6
+            "height_divider": 6,
+            "width_divider": 20, #the largest sideways offset is a percentage of width/width_divider
+            "mode": "block",
+            "zones": 1, #warps on random rows
+            "bands": 4 #bands of every warp on 'bands' mode
         },
         "play_text": {
             "offset_multiplier": 0.05,
             "width_divider": 12,
-            "intensity": 0.3
+            "intensity": 0.3,
+            "fonts_cache_size": 64, #loaded fonts kept in memory, per font and size
+            "sprites_cache_size": 1024 #rendered texts kept in memory
+        },
+        "all_effects": {
+            "engine": "steps"
+        },
+        "blend": {
+            "engine": "native"
+        },
+        "strips": {
+            "height": 256, #rows processed at once by render_strips, bounds the working memory
+            "bands_per_thread": 4 #with threads, images are split in at least this many row bands per thread
+        },
+        "threads": 1,
+        "preset": {
+            "engine": "fused",
+            "max_sizes": 32 #image sizes a preset keeps resolved parameters for
+        },
+        "stream": {
+            "fps": 30,
+            "noise_lines_persistence": 0.85, #probability of a noise line to stay on the next frame
+            "grain_margin": 32, #extra grain pixels, frames take random windows of the grain layer
+            "warp_drift": 3 #rows the wave warp moves down on each frame
         }
 
     }
@@ -1,68 +1,176 @@
-import numpy as np
-import requests
-import os
-from PIL import Image, ImageOps
+import io
+from PIL import Image
 from pathlib import Path
 from retrofy.configs import Filter_Configs
-import retrofy.utils as utils
+from retrofy.filters.history import History
+import retrofy.loader as loader
+from retrofy.profiling import Profiler
 
 CONFIGS = Filter_Configs()
 
+#default max_size of filters: the MAX_SIZE of their class, read when the image is loaded, so it can be changed or overridden
+DEFAULT_MAX_SIZE = "default"
+
 class Filter():
 
     MAX_SIZE = CONFIGS.MAXS["size"]
 
-    def __init__(self, img_src):
-        if isinstance(img_src, (str, Image.Image)) == False:
-            raise TypeError("Parameter 'img_src' must be a string or a Pillow Image object.")
+    def __init__(self, img_src, history=True, max_size=DEFAULT_MAX_SIZE):
+        if isinstance(img_src, (str, Path, bytes, bytearray, memoryview, Image.Image)) == False and loader.is_file_object(img_src) == False and loader.is_array(img_src) == False:
+            raise TypeError("Parameter 'img_src' must be a string, a Path object, bytes, a binary file object, a Pillow Image object or a numpy array.")
+        if isinstance(history, (bool, History)) == False:
+            raise TypeError("Parameter 'history' must be a boolean or a History object.")
+        if isinstance(max_size, tuple) == False and max_size != None and max_size != DEFAULT_MAX_SIZE:
+            raise TypeError("Parameter 'max_size' must be a tuple.")
+
+        #history=False keeps no modifications at all, for batch and server use
+        if history == True:
+            history = History()
+        elif history == False:
+            history = History(max_entries=0)
 
         self.__img_src = img_src
-        self.__last_modifications = [] #list for all modifications that wasnt undoed
-        self.__last_undos = []
+        if max_size == DEFAULT_MAX_SIZE:
+            max_size = self.MAX_SIZE
+        self.__max_size = max_size #larger images are resized to fit in it, None keeps the original size
+        self.__last_modifications = history #all modifications that wasnt undoed
+        self.__last_undos = history.copy_empty()
+        self.__profiler = None #profiled calls are recorded on it, see retrofy.profiling
         self.__load_image()
 
 
 
     @property
     def modified_img(self):
-        return self.__modified_img
+        return self.render()
 
     @modified_img.setter
     def modified_img(self, img):
         if isinstance(img, Image.Image) == False:
             raise TypeError("Parameter 'modified_img' must be a Pillow Image object.")
-        self.__modified_img = img
-        self.__last_modifications.append(self.__modified_img)
+        self.__push(img)
+
+    @property
+    def array(self):
+        return self.render_array()
+
+    @array.setter
+    def array(self, arr):
+        #the array is kept without a copy, as a read only view
+        if loader.is_array(arr) == False:
+            raise TypeError("Parameter 'array' must be a numpy array.")
+        loader.get_array_mode(arr)
+        self.__push(Filter.__get_readonly(arr))
+
+    @property
+    def size(self):
+        #(width, height) of the modified image, from the image or the array the filter keeps, without making the other one
+        if self.__modified_img is not None:
+            return self.__modified_img.size
+        return (self.__modified_arr.shape[1], self.__modified_arr.shape[0])
+
+    @property
+    def max_size(self):
+        return self.__max_size
 
     @property
     def original_img(self):
+        if self.__original_img is None:
+            self.__original_img = loader.array_to_image(self.__original_arr)
         return self.__original_img
 
     @property
     def last_modifications(self):
+        return [loader.array_to_image(img) if loader.is_array(img) == True else img for img in self.__last_modifications.images()]
+
+    @property
+    def history(self):
         return self.__last_modifications
 
+    @property
+    def profiler(self):
+        return self.__profiler
+
+    @profiler.setter
+    def profiler(self, profiler):
+        if isinstance(profiler, Profiler) == False and profiler != None:
+            raise TypeError("Parameter 'profiler' must be a Profiler object.")
+        self.__profiler = profiler
+
 
 
     def __load_image(self):
-        # if img_src alredy is a PIL Image object
+        #the image is kept as a Pillow Image object or as an uint8 array, the other one is only made when it is needed
+        #(see render and render_array) and kept until the image changes
+        self.__original_img, self.__original_arr = None, None
+        # if img_src alredy is a PIL Image object, it is never changed: large images are resized into a new one
         if isinstance(self.__img_src, Image.Image) == True:
             self.__original_img = self.__img_src
+            if self.__max_size != None:
+                self.__original_img = loader.get_thumbnail(self.__img_src, self.__max_size)
+        elif loader.is_array(self.__img_src) == True:
+            #arrays (e.g. OpenCV frames, in RGB order) are used without a copy, so they must not be changed while the filter
+            #uses them. large arrays are resized into a new image
+            loader.get_array_mode(self.__img_src)
+            self.__original_arr = Filter.__get_readonly(self.__img_src)
+            if self.__max_size != None and loader.get_thumbnail_size((self.__original_arr.shape[1], self.__original_arr.shape[0]), self.__max_size) != None:
+                self.__original_img = loader.get_thumbnail(loader.array_to_image(self.__original_arr), self.__max_size)
+                self.__original_arr = None
         else:
-            if utils.is_url(self.__img_src) == True:
-                try:
-                    self.__img_src = requests.get(self.__img_src, stream=True).raw
-                    self.__original_img = Image.open(self.__img_src).convert("RGB")
-                except:
-                    raise ValueError("Could not download image from URL '{}'.".format(self.__img_src))
-            else:
-                try:
-                    self.__original_img = Image.open(self.__img_src).convert("RGB")
-                except:
-                    raise ValueError("Could not access image on file '{}'.".format(self.__img_src))
-        #resize large images (with same aspect ratio)
-        self.__original_img.thumbnail(self.MAX_SIZE)
-        self.__modified_img = self.__original_img
+            #URLs are downloaded on the process wide loader, with pooled connections, timeouts and retries. encoded bytes and
+            #file objects are decoded in memory. large images are resized (with same aspect ratio) while they are decoded
+            self.__original_img = loader.LOADER.open_image(self.__img_src, max_size=self.__max_size)
+        self.__modified_img, self.__modified_arr = self.__original_img, self.__original_arr
+
+
+
+    @staticmethod
+    def __get_readonly(arr):
+        if arr.ndim == 2:
+            return loader.expand_gray(arr) #a read only view, as RGB
+        arr = arr.view()
+        arr.flags.writeable = False
+        return arr
+
+
+
+    def __set(self, img):
+        if isinstance(img, Image.Image) == True:
+            self.__modified_img, self.__modified_arr = img, None
+        else:
+            self.__modified_img, self.__modified_arr = None, img
+
+
+
+    def __push(self, img):
+        self.__set(img)
+        self.__last_modifications.push(img)
+
+
+
+    @classmethod
+    def from_bytes(cls, data, **kwargs):
+        #filter of an encoded image (e.g. the body of a request), decoded in memory
+        if isinstance(data, (bytes, bytearray, memoryview)) == False:
+            raise TypeError("Parameter 'data' must be bytes.")
+        return cls(data, **kwargs)
+
+
+
+    def render(self):
+        #returns the modified image. filters that defer their effects run them here
+        if self.__modified_img is None:
+            self.__modified_img = loader.array_to_image(self.__modified_arr)
+        return self.__modified_img
+
+
+
+    def render_array(self):
+        #returns the modified image as a read only uint8 (h, w), (h, w, 3) or (h, w, 4) array, as render() does. images
+        #of other modes are converted to RGB (or RGBA)
+        if self.__modified_arr is None:
+            self.__modified_arr = loader.image_to_array(self.__modified_img)
+        return self.__modified_arr
 
 
 
@@ -73,12 +181,11 @@ class Filter():
         if len(self.__last_modifications) > 0:
             for i in range(times):
                 if len(self.__last_modifications) > 0:
-                    self.__last_undos.append(self.__last_modifications[-1])
-                    self.__last_modifications.pop(-1)
+                    self.__last_undos.push(self.__last_modifications.pop())
             if len(self.__last_modifications) == 0:
                 self.reset()
             else:
-                self.__modified_img = self.__last_modifications[-1]
+                self.__set(self.__last_modifications.peek())
 
 
 
@@ -89,13 +196,26 @@ class Filter():
         if len(self.__last_undos) > 0:
             for i in range(times):
                 if len(self.__last_undos) > 0:
-                    self.modified_img = self.__last_undos[-1]
-                    self.__last_undos.pop(-1)
+                    self.__push(self.__last_undos.pop())
+
+
+
+    def restore(self, img, entries=0):
+        #drops the last 'entries' modifications and sets 'img' (a Pillow Image object or an array) as the modified image
+        #without recording it. unlike undo, it does not depend on how many entries a bounded history still keeps
+        if isinstance(img, Image.Image) == False and loader.is_array(img) == False:
+            raise TypeError("Parameter 'img' must be a Pillow Image object or a numpy array.")
+        if isinstance(entries, int) == False:
+            raise TypeError("Parameter 'entries' must be an integer.")
+
+        for i in range(min(entries, len(self.__last_modifications))):
+            self.__last_modifications.pop()
+        self.__set(img)
 
 
 
     def reset(self):
-        self.__modified_img = self.__original_img
+        self.__modified_img, self.__modified_arr = self.__original_img, self.__original_arr
 
 
 
@@ -104,27 +224,54 @@ class Filter():
             raise TypeError("Parameter 'original' must be a boolean.")
 
         if original == False:
-            self.__modified_img.show()
+            self.modified_img.show()
         else:
-            self.__original_img.show()
+            self.original_img.show()
 
 
 
-    def save(self, path, original=False):
+    def save(self, path, original=False, format=None, quality=None, **options):
+        #saves on a path or a binary file object. the format is taken from the path suffix ('png' if it has none), unless
+        #given. png, jpeg and webp are encoded with the fast options of the loader encoders, 'quality' (jpeg and webp) and
+        #Pillow 'options' override them. other suffixes are saved by Pillow with its own options
         if isinstance(original, bool) == False:
             raise TypeError("Parameter 'original' must be a boolean.")
-        if isinstance(path, str) == False and isinstance(file_path, Path) == False:
-            raise TypeError("Parameter 'path' must be a string or a Path object.")
-
-        path = Path(path)
-        if path.suffix == "":
-            path = path.parent / Path(path.stem + ".png")
-        if self.__modified_img.mode == "RGBA" and path.suffix != ".png":
-            raise ValueError("RGBA Image must have 'png' file extension.")
+        if isinstance(path, (str, Path)) == False and callable(getattr(path, "write", None)) == False:
+            raise TypeError("Parameter 'path' must be a string, a Path object or a binary file object.")
+        if isinstance(format, str) == False and format != None:
+            raise TypeError("Parameter 'format' must be a string.")
+
+        if isinstance(path, (str, Path)) == True:
+            path = Path(path)
+            if path.suffix == "":
+                path = path.parent / Path(path.stem + ".png")
+            if format == None:
+                format = path.suffix
+        elif format == None:
+            format = "png"
+
+        img = self.modified_img if original == False else self.original_img
+        if loader.get_format(format) != None:
+            try:
+                return loader.encode_image(img, path, format, quality, **options)
+            except OSError as e:
+                raise ValueError("Could not save image on especified path.") from e
+
+        pillow_format = Image.registered_extensions().get("." + format.lower().lstrip("."))
+        if pillow_format == None:
+            raise ValueError("Invalid format '{}'.".format(format))
+        img = loader.drop_opaque_alpha(img)
+        if img.mode == "RGBA":
+            raise ValueError("Images with transparency must be saved as one of {}.".format(loader.CONFIGS.ALPHA_FORMATS))
         try:
-            if original == False:
-                self.__modified_img.save(path)
-            else:
-                self.__original_img.save(path)
-        except:
-            raise ValueError("Could not save image on especified path.")
+            img.save(path, pillow_format, **options)
+        except (OSError, ValueError) as e:
+            raise ValueError("Could not save image on especified path.") from e
+
+
+
+    def to_bytes(self, format="png", quality=None, original=False, **options):
+        #the image encoded in memory, as save() does on a file
+        data = io.BytesIO()
+        self.save(data, original, format, quality, **options)
+        return data.getvalue()
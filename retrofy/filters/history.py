@@ -0,0 +1,141 @@
+import zlib
+from PIL import Image
+from retrofy.configs import Filter_Configs
+import retrofy.loader as loader
+
+CONFIGS = Filter_Configs()
+
+class History():
+
+    def __init__(self, max_entries=CONFIGS.DEFAULTS["history"]["max_entries"], max_bytes=CONFIGS.DEFAULTS["history"]["max_bytes"], uncompressed_entries=CONFIGS.DEFAULTS["history"]["uncompressed_entries"], compression_level=CONFIGS.DEFAULTS["history"]["compression_level"]):
+        if isinstance(max_entries, int) == False:
+            raise TypeError("Parameter 'max_entries' must be an integer.")
+        if isinstance(max_bytes, int) == False:
+            raise TypeError("Parameter 'max_bytes' must be an integer.")
+        if isinstance(uncompressed_entries, int) == False:
+            raise TypeError("Parameter 'uncompressed_entries' must be an integer.")
+        if isinstance(compression_level, int) == False:
+            raise TypeError("Parameter 'compression_level' must be an integer.")
+
+        if max_entries < 0 or max_bytes < 0:
+            raise ValueError("Parameters 'max_entries' and 'max_bytes' must not be negative.")
+        if uncompressed_entries < 1:
+            raise ValueError("Parameter 'uncompressed_entries' must be greater than 0.")
+        if compression_level < 0 or compression_level > 9:
+            raise ValueError("Parameter 'compression_level' must be an integer between 0 and 9.")
+
+        self.__max_entries = max_entries
+        self.__max_bytes = max_bytes
+        self.__uncompressed_entries = uncompressed_entries
+        self.__compression_level = compression_level
+        #oldest first. recent entries are Pillow Image objects or uint8 arrays, older ones are (mode, size, compressed bytes)
+        #or, for arrays, (shape, compressed bytes)
+        self.__entries = []
+        self.__bytes = 0
+
+
+
+    @property
+    def enabled(self):
+        return self.__max_entries > 0
+
+    @property
+    def max_entries(self):
+        return self.__max_entries
+
+    @property
+    def max_bytes(self):
+        return self.__max_bytes
+
+    @property
+    def bytes(self):
+        return self.__bytes
+
+    def __len__(self):
+        return len(self.__entries)
+
+
+
+    def copy_empty(self):
+        #returns a new empty history with the same limits
+        return History(self.__max_entries, self.__max_bytes, self.__uncompressed_entries, self.__compression_level)
+
+
+
+    @staticmethod
+    def __get_nbytes(entry):
+        if isinstance(entry, Image.Image) == True:
+            return entry.size[0] * entry.size[1] * len(entry.getbands())
+        if isinstance(entry, tuple) == False:
+            return entry.nbytes
+        return len(entry[-1])
+
+    @staticmethod
+    def __get_image(entry):
+        if isinstance(entry, tuple) == False:
+            return entry
+        if len(entry) == 2:
+            import numpy as np #arrays were pushed, so numpy is already imported
+
+            shape, data = entry
+            return np.frombuffer(zlib.decompress(data), dtype=np.uint8).reshape(shape) #read only
+        mode, size, data = entry
+        return Image.frombytes(mode, size, zlib.decompress(data))
+
+
+
+    def __compress(self):
+        #entries older than the most recent 'uncompressed_entries' are stored as compressed snapshots
+        for i in range(len(self.__entries) - self.__uncompressed_entries - 1, -1, -1):
+            entry = self.__entries[i]
+            if isinstance(entry, tuple) == True:
+                break #older entries are already compressed
+            if isinstance(entry, Image.Image) == True:
+                snapshot = (entry.mode, entry.size, zlib.compress(entry.tobytes(), self.__compression_level))
+            else:
+                snapshot = (entry.shape, zlib.compress(entry.tobytes(), self.__compression_level))
+            self.__bytes += History.__get_nbytes(snapshot) - History.__get_nbytes(entry)
+            self.__entries[i] = snapshot
+
+
+
+    def __trim(self):
+        while len(self.__entries) > 0 and (len(self.__entries) > self.__max_entries or self.__bytes > self.__max_bytes):
+            self.__bytes -= History.__get_nbytes(self.__entries.pop(0))
+
+
+
+    def push(self, img):
+        #'img' is a Pillow Image object or an uint8 array (see Filter.array), entries are returned as they were pushed
+        if isinstance(img, Image.Image) == False and loader.is_array(img) == False:
+            raise TypeError("Parameter 'img' must be a Pillow Image object or a numpy array.")
+        if self.enabled == False:
+            return
+
+        self.__entries.append(img)
+        self.__bytes += History.__get_nbytes(img)
+        self.__compress()
+        self.__trim()
+
+
+
+    def pop(self):
+        entry = self.__entries.pop(-1)
+        self.__bytes -= History.__get_nbytes(entry)
+        return History.__get_image(entry)
+
+
+
+    def peek(self):
+        return History.__get_image(self.__entries[-1])
+
+
+
+    def clear(self):
+        self.__entries = []
+        self.__bytes = 0
+
+
+
+    def images(self):
+        return [History.__get_image(entry) for entry in self.__entries]
@@ -1 +1,19 @@
-from retrofy.filters.vhs.vhs import VHS
+#imported on first access, so importing a submodule (e.g. kernels or assets) does not import the whole filter
+__all__ = ["VHS", "VHSStream", "Preset"]
+
+
+def __getattr__(name):
+    if name == "VHS":
+        from retrofy.filters.vhs.vhs import VHS
+        return VHS
+    if name == "VHSStream":
+        from retrofy.filters.vhs.stream import VHSStream
+        return VHSStream
+    if name == "Preset":
+        from retrofy.filters.vhs.preset import Preset
+        return Preset
+    raise AttributeError("module 'retrofy.filters.vhs' has no attribute '{}'".format(name))
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
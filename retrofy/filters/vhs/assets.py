@@ -0,0 +1,301 @@
+import os
+import math
+import threading
+import functools
+from pathlib import Path
+import numpy as np
+from PIL import Image
+from retrofy.configs import VHS_Configs
+from retrofy.cache import MASK_CACHE
+
+CONFIGS = VHS_Configs()
+
+class NoiseLinesBank():
+
+    #packed files are a flat uint8 array: a uint32 table [n, (id, height, width, offset) * n] followed by all masks pixels
+
+    def __init__(self, path=CONFIGS.PATHS["images"]["noise_lines"]):
+        self.__lock = threading.Lock()
+        self.load(path)
+
+
+
+    @property
+    def path(self):
+        return self.__path
+
+    @property
+    def ids(self):
+        return sorted(self.__get_masks().keys())
+
+
+
+    def load(self, path):
+        #'path' is a folder with <id>.png files or a packed .npy file. assets are only read on first use
+        if isinstance(path, (str, Path)) == False:
+            raise TypeError("Parameter 'path' must be a string or a Path object.")
+        with self.__lock:
+            self.__path = Path(path)
+            self.__masks = None
+
+
+
+    def __get_masks(self):
+        masks = self.__masks
+        if masks != None:
+            return masks
+
+        with self.__lock:
+            if self.__masks == None:
+                if self.__path.suffix == ".npy":
+                    self.__masks = NoiseLinesBank.__read_packed(self.__path)
+                else:
+                    self.__masks = NoiseLinesBank.__read_folder(self.__path)
+            return self.__masks
+
+
+
+    @staticmethod
+    def __read_folder(folder_path):
+        if os.path.isdir(folder_path) == False:
+            raise ValueError("Could not find noise lines folder '{}'.".format(folder_path))
+
+        masks = {}
+        for name in os.listdir(folder_path):
+            name_path = Path(name)
+            if name_path.suffix.lower() == ".png" and name_path.stem.isdigit() == True:
+                mask = np.array(Image.open(folder_path / name_path).convert("L"))
+                mask.flags.writeable = False
+                masks[int(name_path.stem)] = mask
+        return masks
+
+
+
+    @staticmethod
+    def __read_packed(file_path):
+        try:
+            data = np.load(file_path, mmap_mode="r")
+            n_masks = int(data[:4].view(np.uint32)[0])
+            table = np.asarray(data[4 : 4 + 16*n_masks]).view(np.uint32).reshape(n_masks, 4)
+        except (OSError, ValueError) as e:
+            raise ValueError("Could not read packed noise lines file '{}'.".format(file_path)) from e
+
+        start = 4 + 16*n_masks
+        masks = {}
+        for id, h, w, offset in table.tolist():
+            masks[id] = data[start + offset : start + offset + h*w].reshape(h, w) #view of the memory mapped file
+        return masks
+
+
+
+    def pack(self, file_path):
+        #saves every mask on a single .npy file that can be memory mapped by load()
+        if isinstance(file_path, (str, Path)) == False:
+            raise TypeError("Parameter 'file_path' must be a string or a Path object.")
+
+        masks = self.__get_masks()
+        table = [len(masks)]
+        offset = 0
+        for id in sorted(masks):
+            h, w = masks[id].shape
+            table += [id, h, w, offset]
+            offset += h*w
+
+        header = np.array(table, dtype=np.uint32).view(np.uint8)
+        data = np.concatenate([header] + [masks[id].ravel() for id in sorted(masks)])
+        np.save(file_path, data)
+
+
+
+    def get(self, id):
+        #returns a read only (height, width) uint8 view of the mask
+        if isinstance(id, int) == False:
+            raise TypeError("Parameter 'id' must be an integer.")
+
+        mask = self.__get_masks().get(id)
+        if mask is None:
+            raise ValueError("Invalid ID '{}' for noise lines images.".format(id))
+        return mask
+
+
+
+    def resized(self, id, size):
+        #returns the mask resized to 'size', cached per target size
+        if isinstance(size, tuple) == False:
+            raise TypeError("Parameter 'size' must be a tuple.")
+
+        mask = self.get(id)
+        if (mask.shape[1], mask.shape[0]) == tuple(size):
+            return mask
+        return MASK_CACHE.get(("noise_lines_id", str(self.__path), id, size), lambda: Image.fromarray(mask, "L").resize(size))
+
+
+
+NOISE_LINES = NoiseLinesBank() #process wide bank, indexed once on first use
+
+
+
+class GrainPool():
+
+    #pools are keyed by film grain (intensity, blur) levels and hold (n_tiles, tile_size, tile_size) uint8 arrays of seamless tiles
+
+    def __init__(self, path=None, n_tiles=CONFIGS.DEFAULTS["film_grain"]["pool_tiles"], tile_size=CONFIGS.DEFAULTS["film_grain"]["pool_tile_size"], seed=CONFIGS.DEFAULTS["film_grain"]["pool_seed"]):
+        if isinstance(n_tiles, int) == False:
+            raise TypeError("Parameter 'n_tiles' must be an integer.")
+        if isinstance(tile_size, int) == False:
+            raise TypeError("Parameter 'tile_size' must be an integer.")
+        if isinstance(seed, int) == False:
+            raise TypeError("Parameter 'seed' must be an integer.")
+
+        if n_tiles < 1 or tile_size < 1:
+            raise ValueError("Parameters 'n_tiles' and 'tile_size' must be greater than 0.")
+
+        self.__lock = threading.Lock()
+        self.__n_tiles = n_tiles
+        self.__tile_size = tile_size
+        self.__seed = seed
+        self.__tiles = {}
+        if path != None:
+            self.load(path)
+
+
+
+    @property
+    def n_tiles(self):
+        return self.__n_tiles
+
+    @property
+    def tile_size(self):
+        return self.__tile_size
+
+    @property
+    def levels(self):
+        return sorted(self.__tiles.keys())
+
+
+
+    def get(self, level, builder):
+        #returns the tiles of an (intensity, blur) level, building them with 'builder(tile_size, rng)' once per level.
+        #tiles only depend on the pool seed and the level, so a saved pool and a rebuilt one are the same
+        tiles = self.__tiles.get(level)
+        if tiles is not None:
+            return tiles
+
+        with self.__lock:
+            tiles = self.__tiles.get(level)
+            if tiles is None:
+                rng = np.random.default_rng([self.__seed] + [int(round(value * 1e6)) for value in level])
+                tiles = np.stack([np.asarray(builder(self.__tile_size, rng), dtype=np.uint8) for i in range(self.__n_tiles)])
+                tiles.flags.writeable = False
+                self.__tiles[level] = tiles
+            return tiles
+
+
+
+    def sample(self, tiles, rng):
+        #returns a random tile of the level, with random flips and offset
+        tile = tiles[rng.integers(0, len(tiles))]
+        flip_rows, flip_cols, y, x = rng.integers(0, [2, 2, self.__tile_size, self.__tile_size])
+        if flip_rows == 1:
+            tile = tile[::-1]
+        if flip_cols == 1:
+            tile = tile[:, ::-1]
+        return np.roll(tile, (-y, -x), axis=(0, 1))
+
+
+
+    @staticmethod
+    def tile(tile, size, start_row=0):
+        #returns a (height, width) layer of 'tile' repeated, starting on row 'start_row' of the repeated layer
+        w, h = size
+        tile_h, tile_w = tile.shape
+        if start_row % tile_h != 0:
+            tile = np.roll(tile, -(start_row % tile_h), axis=0)
+        return np.tile(tile, (-(-h // tile_h), -(-w // tile_w)))[:h, :w]
+
+
+
+    def layer(self, size, tiles, rng):
+        #returns a (height, width) layer tiled from a random tile of the level, with a random offset and flips
+        return GrainPool.tile(self.sample(tiles, rng), size)
+
+
+
+    def save(self, file_path):
+        #saves every built level on a .npz file, to be loaded by load() instead of building the tiles again
+        if isinstance(file_path, (str, Path)) == False:
+            raise TypeError("Parameter 'file_path' must be a string or a Path object.")
+
+        with self.__lock:
+            np.savez(file_path, **{"{!r}_{!r}".format(*level): tiles for level, tiles in self.__tiles.items()})
+
+
+
+    def load(self, file_path):
+        if isinstance(file_path, (str, Path)) == False:
+            raise TypeError("Parameter 'file_path' must be a string or a Path object.")
+
+        try:
+            with np.load(file_path) as data:
+                loaded = {tuple(float(value) for value in name.split("_")): data[name] for name in data.files}
+        except (OSError, ValueError) as e:
+            raise ValueError("Could not read film grain pool file '{}'.".format(file_path)) from e
+
+        for level, tiles in loaded.items():
+            if tiles.ndim != 3 or tiles.shape[1:] != (self.__tile_size, self.__tile_size):
+                raise ValueError("Film grain pool file '{}' does not have {}x{} tiles.".format(file_path, self.__tile_size, self.__tile_size))
+            tiles.flags.writeable = False
+        with self.__lock:
+            self.__tiles.update(loaded)
+
+
+
+    def clear(self):
+        with self.__lock:
+            self.__tiles = {}
+
+
+
+GRAIN_POOL = GrainPool() #process wide pool, levels are built on first use
+
+
+
+@functools.lru_cache(maxsize=CONFIGS.DEFAULTS["play_text"]["fonts_cache_size"])
+def get_font(name, size):
+    #fonts are loaded from disk once per (name, size). ImageFont is only imported by filters that draw texts
+    from PIL import ImageFont
+    if name not in CONFIGS.FONTS:
+        raise ValueError("Invalid font '{}'. Font must be one of {}.".format(name, list(CONFIGS.FONTS.keys())))
+    return ImageFont.truetype(str(CONFIGS.PATHS["fonts"] / Path(CONFIGS.FONTS[name])), size)
+
+
+
+def render_text(xy, text, font_name, font_size):
+    #renders 'text' as it would be drawn on 'xy' into a sprite just big enough for it.
+    #returns the sprite upper left position and the sprite as a (height, width) uint8 alpha mask
+    x, y = xy
+    int_x, int_y = math.floor(x), math.floor(y)
+    sprite_x, sprite_y, sprite = get_text_sprite(text, font_name, font_size, x - int_x, y - int_y)
+    return int_x + sprite_x, int_y + sprite_y, sprite
+
+
+
+@functools.lru_cache(maxsize=CONFIGS.DEFAULTS["play_text"]["sprites_cache_size"])
+def get_text_sprite(text, font_name, font_size, frac_x=0, frac_y=0):
+    #only the fractional part of the position changes how glyphs are rendered, so sprites do not depend on the image size.
+    #returns the sprite position relative to the text position and the read only sprite
+    from PIL import ImageDraw
+    font = get_font(font_name, font_size)
+    left, top, right, bottom = ImageDraw.Draw(Image.new("L", (1, 1))).textbbox((frac_x, frac_y), text, font=font)
+    #drawing on negative coordinates would change the fractional part, so the sprite is trimmed after rendering instead
+    left, top = min(math.floor(left), 0), min(math.floor(top), 0)
+
+    sprite = Image.new("L", (max(math.ceil(right) - left, 1), max(math.ceil(bottom) - top, 1)), 0)
+    ImageDraw.Draw(sprite).text((frac_x - left, frac_y - top), text, 255, font=font)
+    bbox = sprite.getbbox()
+    if bbox != None:
+        sprite = sprite.crop(bbox)
+        left, top = left + bbox[0], top + bbox[1]
+    sprite = np.array(sprite)
+    sprite.flags.writeable = False
+    return left, top, sprite
@@ -0,0 +1,177 @@
+import os
+from pathlib import Path
+from urllib.parse import urlparse
+from collections import namedtuple
+from collections.abc import Iterable
+from concurrent.futures import FIRST_COMPLETED, wait
+import numpy as np
+from PIL import Image
+from retrofy.configs import Filter_Configs
+import retrofy.utils as utils
+
+CONFIGS = Filter_Configs()
+
+#result of a single source. 'error' is None when the source was processed and saved on 'path'
+BatchResult = namedtuple("BatchResult", ["index", "src", "path", "error"])
+
+
+
+def get_effects(filter_cls, effects):
+    #normalizes 'effects' into a list of (method name, kwargs) pairs
+    if effects == None:
+        effects = ["all_effects"]
+    elif isinstance(effects, dict) == True:
+        effects = list(effects.items())
+    elif isinstance(effects, (str, Iterable)) == False:
+        raise TypeError("Parameter 'effects' must be a list of effects names or (name, kwargs) pairs, or a dict.")
+    if isinstance(effects, str) == True:
+        effects = [effects]
+
+    normalized_effects = []
+    for effect in effects:
+        if isinstance(effect, str) == True:
+            name, kwargs = effect, {}
+        elif isinstance(effect, tuple) == True and len(effect) == 2 and isinstance(effect[1], dict) == True:
+            name, kwargs = effect
+        else:
+            raise TypeError("Invalid effect '{}'. Effects must be names or (name, kwargs) pairs.".format(effect))
+
+        method_name = "apply_" + name.strip().lower()
+        if hasattr(filter_cls, method_name) == False:
+            raise ValueError("Invalid effect '{}' for {} filter.".format(name, filter_cls.__name__))
+        if "inplace" in kwargs:
+            raise ValueError("Effects on batch processing are always applied inplace.")
+        normalized_effects.append((method_name, kwargs))
+    return normalized_effects
+
+
+
+def get_sources(sources):
+    #a directory path yields the images inside it, any other iterable is consumed lazily
+    if isinstance(sources, (str, Path)) == True and os.path.isdir(sources) == True:
+        folder_path = Path(sources)
+        return (folder_path / name for name in sorted(os.listdir(folder_path)) if Path(name).suffix.strip(".").lower() in CONFIGS.FORMATS)
+    if isinstance(sources, (str, Path, Image.Image)) == True:
+        return iter([sources])
+    if isinstance(sources, Iterable) == False:
+        raise TypeError("Parameter 'sources' must be a directory path or an iterable of image sources.")
+    return iter(sources)
+
+
+
+def get_stem(index, src):
+    if isinstance(src, Path) == True:
+        return src.stem
+    if utils.is_url(src) == True:
+        stem = Path(urlparse(src).path).stem
+    elif isinstance(src, str) == True:
+        stem = Path(src).stem
+    else:
+        stem = ""
+    if stem == "":
+        stem = "image_{}".format(index)
+    return stem
+
+
+
+def check_name(name):
+    #the name template is validated once, before any source is submitted
+    try:
+        name.format(stem="stem", index=0)
+    except (KeyError, IndexError, ValueError) as e:
+        raise ValueError("Invalid name '{}'. Name can only use the '{{stem}}' and '{{index}}' fields.".format(name)) from e
+    if name.format(stem="stem", index=0) == "" or os.sep in name or (os.altsep != None and os.altsep in name):
+        raise ValueError("Invalid name '{}'. Name must be a non empty file name.".format(name))
+
+
+
+def get_out_name(name, index, src, used_names):
+    #sources with the same stem (e.g. 'a.jpg' and 'a.png', or URLs ending on the same file name) would be saved on the same
+    #path, so later ones get the index of the source appended. 'used_names' keeps the names given so far (lowercase,
+    #case insensitive file systems would collide as well)
+    out_name = name.format(stem=get_stem(index, src), index=index)
+    while out_name.lower() in used_names:
+        out_name = "{}_{}".format(out_name, index)
+    used_names.add(out_name.lower())
+    return out_name
+
+
+
+def process_item(filter_cls, src, out_path, effects, seed):
+    if isinstance(src, Path) == True:
+        src = str(src)
+    retrofier = filter_cls(src, seed=seed, history=False)
+    for method_name, kwargs in effects:
+        getattr(retrofier, method_name)(**kwargs)
+    retrofier.save(out_path)
+    return out_path
+
+
+
+def process_many(filter_cls, sources, out_dir, effects=None, workers=None, seed=None, format="png", name="{stem}", max_in_flight=None):
+    if isinstance(out_dir, (str, Path)) == False:
+        raise TypeError("Parameter 'out_dir' must be a string or a Path object.")
+    if isinstance(workers, int) == False and workers != None:
+        raise TypeError("Parameter 'workers' must be an integer.")
+    if isinstance(seed, int) == False and seed != None:
+        raise TypeError("Parameter 'seed' must be an integer.")
+    if isinstance(format, str) == False:
+        raise TypeError("Parameter 'format' must be a string.")
+    if isinstance(name, str) == False:
+        raise TypeError("Parameter 'name' must be a string.")
+    if isinstance(max_in_flight, int) == False and max_in_flight != None:
+        raise TypeError("Parameter 'max_in_flight' must be an integer.")
+
+    if workers == None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError("Parameter 'workers' must be greater than 0.")
+    if max_in_flight == None:
+        max_in_flight = workers * CONFIGS.DEFAULTS["batch"]["in_flight_per_worker"]
+    if max_in_flight < workers:
+        raise ValueError("Parameter 'max_in_flight' must not be lesser than 'workers'.")
+
+    check_name(name)
+    effects = get_effects(filter_cls, effects)
+    sources = get_sources(sources)
+    format = format.strip(".").lower()
+    entropy = np.random.SeedSequence(seed).entropy #every source gets its own independent stream from this entropy
+
+    out_dir = Path(out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+
+    return iter_results(filter_cls, sources, out_dir, effects, workers, entropy, format, name, max_in_flight)
+
+
+
+def iter_results(filter_cls, sources, out_dir, effects, workers, entropy, format, name, max_in_flight):
+    from concurrent.futures import ProcessPoolExecutor #imports multiprocessing, only needed by batches
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = {}
+        used_names = set()
+        index = 0
+        exhausted = False
+        while exhausted == False or len(in_flight) > 0:
+            #only 'max_in_flight' sources are submitted at a time, so sources and results are never all in memory
+            while exhausted == False and len(in_flight) < max_in_flight:
+                try:
+                    src = next(sources)
+                except StopIteration:
+                    exhausted = True
+                    break
+                out_path = str(out_dir / "{}.{}".format(get_out_name(name, index, src, used_names), format))
+                item_seed = np.random.SeedSequence(entropy, spawn_key=(index,))
+                future = executor.submit(process_item, filter_cls, src, out_path, effects, item_seed)
+                in_flight[future] = (index, src, out_path)
+                index += 1
+
+            if len(in_flight) == 0:
+                break
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                item_index, src, out_path = in_flight.pop(future)
+                error = future.exception()
+                if error != None:
+                    yield BatchResult(item_index, src, None, error)
+                else:
+                    yield BatchResult(item_index, src, out_path, None)
@@ -0,0 +1,136 @@
+import json
+import datetime as dt
+from collections import namedtuple
+
+
+EffectNode = namedtuple("EffectNode", ["name", "params"])
+
+
+
+class EffectGraph():
+
+    #effects that can be recorded, all of them run on the same float32 working buffer when rendered
+    EFFECTS = ("noise_lines", "color_glitch", "horizontal_lines", "film_grain", "play_text", "wave_warp")
+
+    def __init__(self, nodes=None):
+        self.__nodes = []
+        for node in nodes or []:
+            if isinstance(node, dict) == True:
+                self.add(node.get("name"), node.get("params", {}))
+            else:
+                self.add(*node)
+
+
+
+    @property
+    def nodes(self):
+        return tuple(self.__nodes)
+
+    def __len__(self):
+        return len(self.__nodes)
+
+
+
+    def add(self, name, params=None):
+        if name not in EffectGraph.EFFECTS:
+            raise ValueError("Invalid effect '{}'. Effect must be one of {}.".format(name, EffectGraph.EFFECTS))
+        if isinstance(params, dict) == False and params != None:
+            raise TypeError("Parameter 'params' must be a dictionary.")
+
+        self.__nodes.append(EffectNode(name, dict(params or {})))
+
+
+
+    def extend(self, graph):
+        if isinstance(graph, EffectGraph) == False:
+            raise TypeError("Parameter 'graph' must be an EffectGraph object.")
+        for node in graph.nodes:
+            self.add(node.name, node.params)
+
+
+
+    def pop(self, times=1):
+        #removes and returns the last 'times' nodes, most recent first
+        if isinstance(times, int) == False:
+            raise TypeError("Parameter 'times' must be an integer.")
+
+        popped = []
+        for i in range(times):
+            if len(self.__nodes) == 0:
+                break
+            popped.append(self.__nodes.pop(-1))
+        return popped
+
+
+
+    def clear(self):
+        self.__nodes = []
+
+
+
+    def plan(self):
+        #returns the steps render() will run. the image is converted to a float32 buffer once, every effect works on
+        #that buffer (blends go straight from one to the next, without rounding to uint8 or RGBA conversions in between)
+        #and the buffer is converted back to an image once, with a single history entry
+        if len(self.__nodes) == 0:
+            return []
+
+        steps = [{"step": "to_buffer"}]
+        for node in self.__nodes:
+            steps.append({"step": "effect", "name": node.name, "params": dict(node.params)})
+        steps.append({"step": "to_image"})
+        return steps
+
+
+
+    @staticmethod
+    def __encode(value):
+        if isinstance(value, dt.datetime) == True:
+            return {"datetime": value.isoformat()}
+        return value
+
+    @staticmethod
+    def __decode(value):
+        if isinstance(value, dict) == True and "datetime" in value:
+            return dt.datetime.fromisoformat(value["datetime"])
+        return value
+
+
+
+    def to_dict(self):
+        nodes = []
+        for node in self.__nodes:
+            params = {key: EffectGraph.__encode(value) for key, value in node.params.items()}
+            nodes.append({"name": node.name, "params": params})
+        return {"nodes": nodes}
+
+
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
+
+
+    @staticmethod
+    def from_dict(graph_dict):
+        if isinstance(graph_dict, dict) == False:
+            raise TypeError("Parameter 'graph_dict' must be a dictionary.")
+
+        nodes = []
+        for node in graph_dict.get("nodes", []):
+            params = {key: EffectGraph.__decode(value) for key, value in node.get("params", {}).items()}
+            nodes.append((node.get("name"), params))
+        return EffectGraph(nodes)
+
+
+
+    @staticmethod
+    def from_json(graph_json):
+        if isinstance(graph_json, str) == False:
+            raise TypeError("Parameter 'graph_json' must be a string.")
+
+        try:
+            graph_dict = json.loads(graph_json)
+        except ValueError as e:
+            raise ValueError("Could not parse effect graph JSON.") from e
+        return EffectGraph.from_dict(graph_dict)
@@ -0,0 +1,250 @@
+import numpy as np
+from PIL import Image, ImageFilter, ImageEnhance
+
+
+# array kernels used by the fused engine. every kernel works in place (or returns a view) on a
+# float32 (h, w, 3) working buffer with values in range 0-255. single channel layers have shape (h, w), or (h, 1) for
+# layers constant along rows, and are broadcasted to the 3 channels, so no RGBA/alpha work is done.
+
+
+def to_buffer(img):
+    # from a Pillow Image object or an uint8 (h, w), (h, w, 3) or (h, w, 4) array. arrays are cast straight into the
+    # buffer: gray ones are broadcasted to the 3 channels and the alpha channel is dropped, as convert("RGB") does
+    if isinstance(img, np.ndarray) == True:
+        if img.ndim == 2:
+            img = img[:, :, None]
+        return np.broadcast_to(img[:, :, :3], img.shape[:2] + (3,)).astype(np.float32)
+    if isinstance(img, Image.Image) == False:
+        raise TypeError("Parameter 'img' must be a Pillow Image object or a numpy array.")
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    return np.asarray(img, dtype=np.float32)
+
+
+
+def to_array(buf):
+    np.clip(buf, 0, 255, out=buf)
+    return buf.astype(np.uint8)
+
+
+
+def to_image(buf):
+    return Image.fromarray(to_array(buf), "RGB")
+
+
+
+def get_noise_lines(shape, iterations, p_threshold, rng):
+    #random draws of the noise lines of a (h, w) array: rows, horizontal sizes, vertical starts and vertical ends
+    n_rows, n_cols = shape
+
+    #probabilities of every row becoming a noise line, for all iterations at once
+    rows = np.arange(n_rows)
+    p = rng.random((iterations, n_rows))
+    p[:, (rows < n_rows/10) | (n_rows - rows < n_rows/10)] *= 1.1 #increases probability for top and bottom rows
+
+    lines_rows = np.nonzero(p > p_threshold)[1] #rows that become noise lines, in iteration order
+    n_lines = lines_rows.size
+
+    hsizes = rng.choice(np.arange(1,3), size=n_lines, p=[0.95, 0.05]) #lines horizontal sizes
+    vstarts = rng.integers(0, n_cols, size=n_lines) #lines vertical start pixels
+    dividers = rng.choice(np.array([5, 10, 15, 20]), size=n_lines, p=[0.1, 0.2, 0.3, 0.4])
+    vends = rng.integers(0, (n_cols / dividers).astype(int) + 1) #lines vertical end pixels based on array size. Smaller lines have more chance to occur
+    return lines_rows, hsizes, vstarts, vends
+
+
+
+def fill_noise_lines(noise_arr, positions, hsizes, vstarts, vends, rng):
+    #draws the lines (value 1) on the 'positions' rows of 'noise_arr'
+    n_cols = noise_arr.shape[1]
+    noise_width = int(n_cols/15)
+    for row, hsize, vstart, vend in zip(positions, hsizes, vstarts, vends):
+        noise_arr[row : row + hsize, vstart : (vstart + vend) % n_cols] = 1
+        rng.shuffle(noise_arr[row, vstart : vstart + vend + noise_width]) #creates noise for each line
+
+
+
+def draw_noise_lines(noise_arr, iterations, p_threshold, rng):
+    #draws noise lines (value 1) on a (h, w) uint8 array and returns the rows that were drawn on
+    n_rows = noise_arr.shape[0]
+    lines_rows, hsizes, vstarts, vends = get_noise_lines(noise_arr.shape, iterations, p_threshold, rng)
+    fill_noise_lines(noise_arr, lines_rows, hsizes, vstarts, vends, rng)
+
+    drawn_rows = np.concatenate((lines_rows, lines_rows[hsizes == 2] + 1))
+    return np.unique(drawn_rows[drawn_rows < n_rows])
+
+
+
+def draw_sparse_noise_lines(shape, iterations, p_threshold, rng):
+    #same lines as draw_noise_lines on a (h, w) array, keeping only the rows drawn on.
+    #returns the sorted rows and a (rows, w) uint8 array with their pixels
+    n_rows, n_cols = shape
+    lines_rows, hsizes, vstarts, vends = get_noise_lines(shape, iterations, p_threshold, rng)
+
+    drawn_rows = np.concatenate((lines_rows, lines_rows[hsizes == 2] + 1))
+    rows = np.unique(drawn_rows[drawn_rows < n_rows])
+    noise_arr = np.zeros((rows.size, n_cols), dtype=np.uint8)
+    #a line's second row is always the next kept row, so lines keep their shape on the packed array
+    fill_noise_lines(noise_arr, np.searchsorted(rows, lines_rows), hsizes, vstarts, vends, rng)
+    return rows, noise_arr
+
+
+
+def get_sparse_noise_lines_mask(rows, noise_arr, n_rows, start, end, blur, bright):
+    #blurred and brightened mask of rows [start, end) of sparse noise lines (see draw_sparse_noise_lines), as blur_rows does
+    halo = int(blur * 3) + 2
+    src_start = max(start - halo, 0)
+    src_end = min(end + halo, n_rows)
+
+    band_arr = np.zeros((src_end - src_start, noise_arr.shape[1]), dtype=np.uint8)
+    first, last = np.searchsorted(rows, [src_start, src_end])
+    if first == last:
+        return None #no lines near the band
+    band_arr[rows[first:last] - src_start] = noise_arr[first:last]
+
+    band_img = Image.fromarray(band_arr*255, "L")
+    band_img = band_img.filter(ImageFilter.GaussianBlur(blur))
+    band_img = ImageEnhance.Brightness(band_img).enhance(bright)
+    return np.asarray(band_img)[start - src_start : end - src_start]
+
+
+
+def blur_rows(noise_arr, mask, rows, blur, bright):
+    #recomputes the blurred and brightened 'mask' of a 0/1 'noise_arr' only around 'rows'
+    n_rows = noise_arr.shape[0]
+    if len(rows) == 0:
+        return mask
+    halo = int(blur * 3) + 2
+
+    #groups the rows into bands of rows affected by the blur
+    rows = np.sort(rows)
+    splits = np.flatnonzero(np.diff(rows) > 2*halo) + 1
+    for band_rows in np.split(rows, splits):
+        start = max(band_rows[0] - halo, 0)
+        end = min(band_rows[-1] + halo + 1, n_rows)
+        src_start = max(start - halo, 0)
+        src_end = min(end + halo, n_rows)
+
+        band_img = Image.fromarray(noise_arr[src_start:src_end]*255, "L")
+        band_img = band_img.filter(ImageFilter.GaussianBlur(blur))
+        band_img = ImageEnhance.Brightness(band_img).enhance(bright)
+        mask[start:end] = np.asarray(band_img)[start - src_start : end - src_start]
+    return mask
+
+
+
+def composite_white(buf, mask):
+    # same as Image.composite(white_img, img, mask), only on rows touched by the mask
+    rows = np.flatnonzero(mask.any(axis=1))
+    if rows.size == 0:
+        return buf
+    alpha = mask[rows].astype(np.float32)[:, :, None] / 255
+    band = buf[rows]
+    band += (255 - band) * alpha
+    buf[rows] = np.rint(band)
+    return buf
+
+
+
+def composite_white_at(buf, mask, x, y):
+    # composite_white of a mask smaller than the buffer with its upper left corner on (x, y), clipped to the buffer
+    h, w = buf.shape[:2]
+    mask_h, mask_w = mask.shape
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + mask_w, w), min(y + mask_h, h)
+    if x0 < x1 and y0 < y1:
+        composite_white(buf[y0:y1, x0:x1], mask[y0 - y:y1 - y, x0 - x:x1 - x])
+    return buf
+
+
+
+def roll_into(dst, src, dy, dx):
+    # dst[y, x] = src[(y + dy) % h, (x + dx) % w], as np.roll would do, with up to 4 slice copies and no temporaries
+    h, w = src.shape[:2]
+    dy, dx = dy % h, dx % w
+    for dst_rows, src_rows in ((slice(0, h - dy), slice(dy, h)), (slice(h - dy, h), slice(0, dy))):
+        for dst_cols, src_cols in ((slice(0, w - dx), slice(dx, w)), (slice(w - dx, w), slice(0, dx))):
+            dst[dst_rows, dst_cols] = src[src_rows, src_cols]
+    return dst
+
+
+
+def warp_rows(src, row_map, offsets, out=None):
+    # row displacement map: dst[y, x] = src[row_map[y], x - offsets[y]], with columns clamped to the borders.
+    # only the rows the map changes are gathered, with a single fancy indexing into a fresh array, before they are written,
+    # so 'out' may be 'src' itself. by default the result is a copy and 'src' is never written (it may be read only)
+    h, w = src.shape[:2]
+    rows = np.flatnonzero((row_map != np.arange(h)) | (offsets != 0))
+    cols = np.clip(np.arange(w) - offsets[rows, None], 0, w - 1)
+    warped = src[row_map[rows, None], cols]
+    if out is None:
+        out = src.copy()
+    out[rows] = warped
+    return out
+
+
+
+def channel_offset(buf, offset, crop=True, out=None):
+    # same as offsetting red by (offset, -offset) and blue by (-offset, offset), wrapping around the borders.
+    # with 'crop', 'offset' pixels are cropped from every border, where channels would wrap.
+    # works on any dtype, every channel is copied once from slice views of 'buf' into 'out'
+    h, w = buf.shape[:2]
+    if crop == True:
+        out_shape = (h - 2*offset, w - 2*offset, 3)
+    else:
+        out_shape = (h, w, 3)
+    if out is None:
+        if offset <= 0:
+            return buf
+        out = np.empty(out_shape, dtype=buf.dtype)
+    elif out.shape != out_shape:
+        raise ValueError("Parameter 'out' must have {} shape.".format(out_shape))
+
+    if crop == False:
+        roll_into(out[:, :, 0], buf[:, :, 0], offset, -offset)
+        out[:, :, 1] = buf[:, :, 1]
+        roll_into(out[:, :, 2], buf[:, :, 2], -offset, offset)
+        return out
+    out[:, :, 0] = buf[2*offset:, :w - 2*offset, 0]
+    out[:, :, 1] = buf[offset:h - offset, offset:w - offset, 1]
+    out[:, :, 2] = buf[:h - 2*offset, 2*offset:, 2]
+    return out
+
+
+
+def get_layer_factor(layer, opacity, scale):
+    # (h, w, 1) or (h, 1, 1) float32 layer term of the blends, (2*layer - 255) * opacity / scale.
+    # 'opacity' is a float or a (h, w) array, for images with transparency
+    factor = layer.astype(np.float32)[:, :, None]
+    factor *= 2
+    factor -= 255
+    factor /= scale
+    if np.ndim(opacity) > 0:
+        return factor * np.asarray(opacity, dtype=np.float32)[:, :, None] #broadcasts (h, 1) layers to the opacity shape
+    factor *= np.float32(opacity)
+    return factor
+
+
+
+def soft_light(buf, layer, opacity, out=None):
+    # same math as blend_modes.soft_light for opaque images, written as buf + opacity * buf * (255 - buf) * (2*layer - 255) / 255^2.
+    # the result is written on 'out' (the buffer itself by default) with a single temporary buffer
+    if out is None:
+        out = buf
+    tmp = np.subtract(255, buf, dtype=np.float32)
+    tmp *= buf
+    tmp *= get_layer_factor(layer, opacity, 255*255)
+    np.add(buf, tmp, out=out)
+    return np.floor(out, out=out)
+
+
+
+def overlay(buf, layer, opacity, out=None):
+    # same math as blend_modes.overlay for opaque images, written as buf + opacity * min(buf, 255 - buf) * (2*layer - 255) / 255.
+    # the result is written on 'out' (the buffer itself by default) with a single temporary buffer
+    if out is None:
+        out = buf
+    tmp = np.subtract(255, buf, dtype=np.float32)
+    np.minimum(tmp, buf, out=tmp)
+    tmp *= get_layer_factor(layer, opacity, 255)
+    np.add(buf, tmp, out=out)
+    return np.floor(out, out=out)
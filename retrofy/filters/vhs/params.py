@@ -0,0 +1,73 @@
+import datetime as dt
+from retrofy.configs import VHS_Configs
+
+CONFIGS = VHS_Configs()
+
+#parameters of every effect: accepted types, type name for errors and default value. the apply_* methods of VHS and
+#presets validate them here, so both accept the same values
+PARAMS = {
+    "noise_lines": {
+        "intensity": ((int, float), "a float", CONFIGS.DEFAULTS["noise_lines"]["intensity"]),
+        "blur": ((int, float), "a float", CONFIGS.DEFAULTS["noise_lines"]["blur"]),
+        "bright": ((int, float), "a float", CONFIGS.DEFAULTS["noise_lines"]["bright"]),
+        "img_id": ((int, type(None)), "an integer", None)
+    },
+    "color_glitch": {
+        "intensity": ((int, float), "a float", CONFIGS.DEFAULTS["color_glitch"]["intensity"]),
+        "crop": (bool, "a boolean", True)
+    },
+    "horizontal_lines": {
+        "intensity": ((int, float), "a float", CONFIGS.DEFAULTS["horizontal_lines"]["intensity"]),
+        "blur": ((int, float), "a float", CONFIGS.DEFAULTS["horizontal_lines"]["blur"])
+    },
+    "film_grain": {
+        "intensity": ((int, float), "a float", CONFIGS.DEFAULTS["film_grain"]["intensity"]),
+        "blur": ((int, float), "a float", CONFIGS.DEFAULTS["film_grain"]["blur"]),
+        "pooled": (bool, "a boolean", CONFIGS.DEFAULTS["film_grain"]["pooled"])
+    },
+    "play_text": {
+        "intensity": ((int, float), "a float", CONFIGS.DEFAULTS["play_text"]["intensity"]),
+        "datetime": ((dt.datetime, type(None)), "a datetime.datetime object", None),
+        "hour": ((int, type(None)), "an integer", None)
+    },
+    "wave_warp": {
+        "intensity": ((int, float), "a float", CONFIGS.DEFAULTS["wave_warp"]["intensity"]),
+        "row": ((int, type(None)), "an integer", None),
+        "mode": (str, "a string", CONFIGS.DEFAULTS["wave_warp"]["mode"]),
+        "zones": (int, "an integer", CONFIGS.DEFAULTS["wave_warp"]["zones"])
+    }
+}
+
+
+
+def get_params(name, params):
+    #validates the parameters of an effect and adds the defaults of the missing ones. checks that need the image (as the
+    #wave warp row against its height) are left to the effects
+    if name not in PARAMS:
+        raise ValueError("Invalid effect '{}'. Effect must be one of {}.".format(name, list(PARAMS)))
+    for key in params:
+        if key not in PARAMS[name]:
+            raise ValueError("Invalid parameter '{}' for effect '{}'. Parameters must be some of {}.".format(key, name, list(PARAMS[name])))
+
+    validated_params = {}
+    for key, (types, type_name, default) in PARAMS[name].items():
+        value = params.get(key, default)
+        if isinstance(value, types) == False:
+            raise TypeError("Parameter '{}' of effect '{}' must be {}.".format(key, name, type_name))
+        validated_params[key] = value
+
+    if name == "play_text":
+        if validated_params["hour"] != None and (validated_params["hour"] < 0 or validated_params["hour"] > 23):
+            raise ValueError("Parameter 'hour' must be an integer between 0 and 23.")
+        if validated_params["datetime"] != None and validated_params["hour"] != None:
+            raise ValueError("Parameter 'hour' can only be passed if parameter 'datetime' is None.")
+    if name == "wave_warp":
+        if validated_params["row"] != None and validated_params["row"] < 0:
+            raise ValueError("Parameter 'row' must be lesser than image's height.")
+        if validated_params["mode"] not in CONFIGS.WAVE_WARP_MODES:
+            raise ValueError("Invalid mode '{}'. Mode must be one of {}.".format(validated_params["mode"], CONFIGS.WAVE_WARP_MODES))
+        if validated_params["zones"] < 1:
+            raise ValueError("Parameter 'zones' must be greater than 0.")
+        if validated_params["row"] != None and validated_params["zones"] > 1:
+            raise ValueError("Parameter 'row' can only be passed with a single zone.")
+    return validated_params
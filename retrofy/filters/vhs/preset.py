@@ -0,0 +1,129 @@
+import json
+import threading
+from collections.abc import Iterable
+from retrofy.configs import VHS_Configs
+from retrofy.filters.vhs.vhs import VHS
+from retrofy.filters.vhs.graph import EffectGraph
+from retrofy.filters.vhs.params import get_params
+
+CONFIGS = VHS_Configs()
+
+class Preset():
+
+    #a named look: effects and parameters validated once, with the values derived from them (offsets, iterations, blur
+    #radii, masks profiles and texts layouts) resolved once per image size. presets never change after they are built,
+    #so threads can share them, and they are pickled (without the resolved sizes) to pool workers or saved as JSON
+
+    def __init__(self, effects=None, name=None):
+        if isinstance(effects, (str, Iterable, EffectGraph)) == False and effects != None:
+            raise TypeError("Parameter 'effects' must be an EffectGraph object or a list of effects names or (name, params) pairs.")
+        if isinstance(name, str) == False and name != None:
+            raise TypeError("Parameter 'name' must be a string.")
+
+        if effects == None:
+            effects = VHS.get_all_effects_graph()
+        if isinstance(effects, EffectGraph) == False:
+            if isinstance(effects, str) == True:
+                effects = [effects]
+            effects = EffectGraph([(effect, {}) if isinstance(effect, str) == True else effect for effect in effects])
+
+        self.__name = name
+        self.__graph = EffectGraph([(node.name, get_params(node.name, node.params)) for node in effects.nodes])
+        self.__resolved = {}
+        self.__lock = threading.Lock()
+
+
+
+    @property
+    def name(self):
+        return self.__name
+
+    @property
+    def graph(self):
+        #a copy, changing it does not change the preset
+        return EffectGraph(self.__graph.nodes)
+
+    @property
+    def sizes(self):
+        #image sizes with resolved parameters
+        with self.__lock:
+            return tuple(self.__resolved)
+
+
+
+    def resolve(self, size):
+        #returns the effects with the parameters their runners take on an image of 'size' (see VHS.resolve_graph),
+        #resolved on the first call for each size
+        if isinstance(size, tuple) == False:
+            raise TypeError("Parameter 'size' must be a tuple.")
+
+        effects = self.__resolved.get(size)
+        if effects == None:
+            effects = VHS.resolve_graph(self.__graph, size)
+            with self.__lock:
+                if len(self.__resolved) >= CONFIGS.DEFAULTS["preset"]["max_sizes"]:
+                    self.__resolved.pop(next(iter(self.__resolved))) #the oldest size
+                self.__resolved[size] = effects
+        return effects
+
+
+
+    def __getstate__(self):
+        return self.to_dict() #resolved sizes are not pickled, every process resolves its own
+
+    def __setstate__(self, state):
+        self.__init__(EffectGraph.from_dict(state), state.get("name"))
+
+
+
+    def to_dict(self):
+        preset_dict = self.__graph.to_dict()
+        preset_dict["name"] = self.__name
+        return preset_dict
+
+
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
+
+
+    def save(self, path):
+        try:
+            with open(path, "w") as preset_file:
+                preset_file.write(self.to_json(indent=2))
+        except OSError as e:
+            raise ValueError("Could not save preset on especified path.") from e
+
+
+
+    @staticmethod
+    def from_dict(preset_dict):
+        if isinstance(preset_dict, dict) == False:
+            raise TypeError("Parameter 'preset_dict' must be a dictionary.")
+
+        return Preset(EffectGraph.from_dict(preset_dict), preset_dict.get("name"))
+
+
+
+    @staticmethod
+    def from_json(preset_json):
+        if isinstance(preset_json, str) == False:
+            raise TypeError("Parameter 'preset_json' must be a string.")
+
+        try:
+            preset_dict = json.loads(preset_json)
+        except ValueError as e:
+            raise ValueError("Could not parse preset JSON.") from e
+        return Preset.from_dict(preset_dict)
+
+
+
+    @staticmethod
+    def load(path):
+        try:
+            with open(path) as preset_file:
+                preset_json = preset_file.read()
+        except OSError as e:
+            raise ValueError("Could not read preset from especified path.") from e
+        return Preset.from_json(preset_json)
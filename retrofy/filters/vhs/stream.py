@@ -0,0 +1,245 @@
+import shutil
+import subprocess
+import json
+import datetime as dt
+from pathlib import Path
+import numpy as np
+from PIL import Image
+from retrofy.filters.vhs.vhs import VHS
+from retrofy.configs import VHS_Configs
+import retrofy.filters.vhs.kernels as kernels
+import retrofy.filters.vhs.assets as assets
+import retrofy.utils as utils
+
+CONFIGS = VHS_Configs()
+
+class VHSStream():
+
+    def __init__(self, play_text=False, wave_warp=False, seed=None, fps=CONFIGS.DEFAULTS["stream"]["fps"], datetime=None):
+        if isinstance(play_text, bool) == False:
+            raise TypeError("Parameter 'play_text' must be a boolean.")
+        if isinstance(wave_warp, bool) == False:
+            raise TypeError("Parameter 'wave_warp' must be a boolean.")
+        if isinstance(seed, (int, np.random.SeedSequence, np.random.Generator)) == False and seed != None:
+            raise TypeError("Parameter 'seed' must be an integer, a numpy SeedSequence or a numpy Generator.")
+        if isinstance(fps, (int, float)) == False:
+            raise TypeError("Parameter 'fps' must be a float.")
+        if isinstance(datetime, dt.datetime) == False and datetime != None:
+            raise TypeError("Parameter 'datetime' must be a datetime.datetime object.")
+
+        if fps <= 0:
+            raise ValueError("Parameter 'fps' must be greater than 0.")
+
+        self.__play_text = play_text
+        self.__wave_warp = wave_warp
+        self.__fps = fps
+        self.__rng = utils.get_rng(seed)
+        if datetime == None:
+            datetime = utils.get_random_datetime(1980, 1990, rng=self.__rng)
+        self.__datetime = datetime #datetime of the first frame, the play text clock runs with the video
+
+        self.__size = None
+        self.__frame_index = 0
+
+
+
+    @property
+    def rng(self):
+        return self.__rng
+
+    @property
+    def frame_index(self):
+        return self.__frame_index
+
+
+
+    def __setup(self, size):
+        #per video work, done again only if the frames size changes
+        w, h = size
+        self.__size = size
+
+        p_threshold, iterations, blur, bright = VHS.get_noise_lines_params(CONFIGS.DEFAULTS["noise_lines"]["intensity"], CONFIGS.DEFAULTS["noise_lines"]["blur"], CONFIGS.DEFAULTS["noise_lines"]["bright"])
+        self.__noise_lines_params = (p_threshold, iterations, blur, bright)
+        self.__noise_arr = np.zeros((h, w), dtype=np.uint8)
+        self.__noise_mask = np.zeros((h, w), dtype=np.uint8)
+        rows = kernels.draw_noise_lines(self.__noise_arr, iterations, p_threshold, self.__rng)
+        kernels.blur_rows(self.__noise_arr, self.__noise_mask, rows, blur, bright)
+
+        self.__offset = VHS.get_color_glitch_offset(h, CONFIGS.DEFAULTS["color_glitch"]["intensity"])
+        cropped_size = (w - 2*self.__offset, h - 2*self.__offset)
+
+        self.__lines_mask = VHS.generate_horizontal_lines_profile(cropped_size[1], CONFIGS.DEFAULTS["horizontal_lines"]["intensity"], CONFIGS.DEFAULTS["horizontal_lines"]["blur"])[:, None]
+
+        #a single grain layer bigger than the frame, every frame uses a random window of it
+        margin = CONFIGS.DEFAULTS["stream"]["grain_margin"]
+        grain_size = (cropped_size[0] + margin, cropped_size[1] + margin)
+        self.__grain_mask = np.asarray(VHS.generate_film_grain(grain_size, CONFIGS.DEFAULTS["film_grain"]["intensity"], CONFIGS.DEFAULTS["film_grain"]["blur"], rng=self.__rng))
+        self.__grain_opacity = VHS.get_film_grain_intensity(CONFIGS.DEFAULTS["film_grain"]["intensity"]) / 2
+
+        if self.__play_text == True:
+            font_size, texts, datetime_xy = VHS.get_play_text_layout(cropped_size, CONFIGS.DEFAULTS["play_text"]["intensity"])
+            self.__text_static_mask = Image.new("L", cropped_size, 0)
+            for xy, text, font_name in texts:
+                x, y, sprite = assets.render_text(xy, text, font_name, font_size)
+                self.__text_static_mask.paste(255, (x, y), Image.fromarray(sprite, "L"))
+            self.__datetime_xy = datetime_xy
+            self.__font_size = font_size
+            self.__datetime_str = None
+
+        if self.__wave_warp == True:
+            h = cropped_size[1]
+            self.__warp_size = VHS.get_wave_warp_size(h, CONFIGS.DEFAULTS["wave_warp"]["intensity"])
+            self.__warp_row = int(self.__rng.integers(0, h + 1))
+
+
+
+    def __update_noise_lines(self):
+        #some lines fade out and a few new ones show up, instead of generating all lines again
+        p_threshold, iterations, blur, bright = self.__noise_lines_params
+        lines_rows = np.flatnonzero(self.__noise_arr.any(axis=1))
+        dead_rows = lines_rows[self.__rng.random(lines_rows.size) > CONFIGS.DEFAULTS["stream"]["noise_lines_persistence"]]
+        self.__noise_arr[dead_rows] = 0
+
+        #new lines per frame keep the amount of lines close to a single image's one
+        births = iterations * (1 - CONFIGS.DEFAULTS["stream"]["noise_lines_persistence"])
+        births = int(births) + int(self.__rng.random() < births - int(births))
+        new_rows = kernels.draw_noise_lines(self.__noise_arr, births, p_threshold, self.__rng)
+
+        kernels.blur_rows(self.__noise_arr, self.__noise_mask, np.concatenate((dead_rows, new_rows)), blur, bright)
+
+
+
+    def __get_text_mask(self):
+        datetime = self.__datetime + dt.timedelta(seconds=self.__frame_index/self.__fps)
+        datetime_str = VHS.get_play_text_datetime(datetime)
+        if datetime_str != self.__datetime_str: #text is rendered again only when the clock changes
+            text_mask = self.__text_static_mask.copy()
+            x, y, sprite = assets.render_text(self.__datetime_xy, datetime_str, "vhs", self.__font_size)
+            text_mask.paste(255, (x, y), Image.fromarray(sprite, "L"))
+            self.__text_mask = np.asarray(text_mask)
+            self.__datetime_str = datetime_str
+        return self.__text_mask
+
+
+
+    def process_frame(self, frame):
+        if isinstance(frame, Image.Image) == True:
+            buf = kernels.to_buffer(frame)
+        elif isinstance(frame, np.ndarray) == True:
+            if frame.ndim != 3 or frame.shape[2] != 3:
+                raise ValueError("Frame arrays must have (height, width, 3) shape.")
+            buf = frame.astype(np.float32)
+        else:
+            raise TypeError("Parameter 'frame' must be a Pillow Image object or a numpy array.")
+
+        size = (buf.shape[1], buf.shape[0])
+        if size != self.__size:
+            self.__setup(size)
+        elif self.__frame_index > 0:
+            self.__update_noise_lines()
+
+        kernels.composite_white(buf, self.__noise_mask)
+        buf = kernels.channel_offset(buf, self.__offset)
+        kernels.soft_light(buf, self.__lines_mask, CONFIGS.DEFAULTS["horizontal_lines"]["bright"])
+
+        h, w = buf.shape[:2]
+        margin = CONFIGS.DEFAULTS["stream"]["grain_margin"]
+        y, x = self.__rng.integers(0, margin + 1, size=2)
+        kernels.overlay(buf, self.__grain_mask[y:y + h, x:x + w], self.__grain_opacity)
+
+        if self.__play_text == True:
+            kernels.composite_white(buf, self.__get_text_mask())
+
+        if self.__wave_warp == True:
+            #the warp drifts down the frame, as a tracking error would
+            self.__warp_row = (self.__warp_row + CONFIGS.DEFAULTS["stream"]["warp_drift"]) % (h + 1)
+            row_map, offsets = VHS.get_wave_warp_map((w, h), [self.__warp_row], self.__warp_size, 0, "block")
+            buf = kernels.warp_rows(buf, row_map, offsets, out=buf)
+
+        self.__frame_index += 1
+
+        if isinstance(frame, np.ndarray) == True:
+            return kernels.to_array(buf) #arrays stay arrays, without a Pillow image in between
+        return kernels.to_image(buf)
+
+
+
+    def process(self, frames):
+        #yields every processed frame, frames can be Pillow Image objects or (height, width, 3) uint8 arrays
+        for frame in frames:
+            yield self.process_frame(frame)
+
+
+
+def get_ffmpeg_path(name="ffmpeg"):
+    path = shutil.which(name)
+    if path == None:
+        raise RuntimeError("Could not find '{}'. Install ffmpeg to read and write videos.".format(name))
+    return path
+
+
+
+def get_video_info(path):
+    #returns ((width, height), fps) of the first video stream
+    if isinstance(path, (str, Path)) == False:
+        raise TypeError("Parameter 'path' must be a string or a Path object.")
+
+    command = [get_ffmpeg_path("ffprobe"), "-v", "error", "-select_streams", "v:0", "-show_entries", "stream=width,height,r_frame_rate", "-of", "json", str(path)]
+    try:
+        stream = json.loads(subprocess.run(command, capture_output=True, check=True).stdout)["streams"][0]
+    except (subprocess.CalledProcessError, KeyError, IndexError, ValueError) as e:
+        raise ValueError("Could not read video info from file '{}'.".format(path)) from e
+
+    numerator, denominator = stream["r_frame_rate"].split("/")
+    return (int(stream["width"]), int(stream["height"])), float(numerator) / float(denominator)
+
+
+
+def read_frames(path):
+    #yields the video frames as (height, width, 3) uint8 arrays through an ffmpeg pipe
+    (w, h), fps = get_video_info(path)
+    command = [get_ffmpeg_path(), "-v", "error", "-i", str(path), "-f", "rawvideo", "-pix_fmt", "rgb24", "pipe:1"]
+    frame_bytes = w * h * 3
+
+    process = subprocess.Popen(command, stdout=subprocess.PIPE)
+    try:
+        while True:
+            data = process.stdout.read(frame_bytes)
+            if len(data) < frame_bytes:
+                break
+            yield np.frombuffer(data, dtype=np.uint8).reshape(h, w, 3)
+    finally:
+        process.stdout.close()
+        process.terminate()
+        process.wait()
+
+
+
+def write_frames(frames, path, fps=CONFIGS.DEFAULTS["stream"]["fps"], codec="libx264"):
+    #writes frames (Pillow Image objects or uint8 arrays) to a video file through an ffmpeg pipe, returns the number of frames
+    if isinstance(path, (str, Path)) == False:
+        raise TypeError("Parameter 'path' must be a string or a Path object.")
+    if isinstance(fps, (int, float)) == False:
+        raise TypeError("Parameter 'fps' must be a float.")
+
+    process = None
+    size = None
+    n_frames = 0
+    try:
+        for frame in frames:
+            frame = np.asarray(frame.convert("RGB") if isinstance(frame, Image.Image) == True else frame, dtype=np.uint8)
+            if process == None: #frames size is only known after the first processed frame
+                size = (frame.shape[1], frame.shape[0])
+                command = [get_ffmpeg_path(), "-v", "error", "-y", "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", "{}x{}".format(*size), "-r", str(fps), "-i", "pipe:0",
+                           "-vf", "crop=trunc(iw/2)*2:trunc(ih/2)*2", "-c:v", codec, "-pix_fmt", "yuv420p", str(path)]
+                process = subprocess.Popen(command, stdin=subprocess.PIPE)
+            if (frame.shape[1], frame.shape[0]) != size:
+                raise ValueError("All frames must have the same size.")
+            process.stdin.write(np.ascontiguousarray(frame).tobytes())
+            n_frames += 1
+    finally:
+        if process != None:
+            process.stdin.close()
+            if process.wait() != 0:
+                raise RuntimeError("ffmpeg could not write video file '{}'.".format(path))
+    return n_frames
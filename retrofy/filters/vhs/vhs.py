@@ -1,20 +1,267 @@
+import contextlib
+import functools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-import random
-from PIL import Image, ImageFilter, ImageOps, ImageEnhance, ImageChops, ImageDraw, ImageFont
-import blend_modes
-from pathlib import Path
-import datetime as dt
-from retrofy.filters.filter import Filter
+from PIL import Image, ImageFilter, ImageEnhance
+from retrofy.filters.filter import Filter, DEFAULT_MAX_SIZE
 from retrofy.configs import VHS_Configs
 import retrofy.utils as utils
-import copy
+import retrofy.loader as loader
+from retrofy.cache import MASK_CACHE
+import retrofy.filters.vhs.assets as assets
+import retrofy.filters.vhs.kernels as kernels
+import retrofy.filters.vhs.batch as batch
+from retrofy.filters.vhs.graph import EffectGraph, EffectNode
+from retrofy.filters.vhs.params import get_params
+from retrofy.profiling import profiled
 
 CONFIGS = VHS_Configs()
 
 class VHS(Filter):
 
-    def __init__(self, img_src):
-        super().__init__(img_src)
+    def __init__(self, img_src, seed=None, history=True, lazy=False, max_size=DEFAULT_MAX_SIZE, threads=CONFIGS.DEFAULTS["threads"]):
+        if isinstance(seed, (int, np.random.SeedSequence, np.random.Generator)) == False and seed != None:
+            raise TypeError("Parameter 'seed' must be an integer, a numpy SeedSequence or a numpy Generator.")
+        if isinstance(lazy, bool) == False:
+            raise TypeError("Parameter 'lazy' must be a boolean.")
+        if isinstance(threads, int) == False:
+            raise TypeError("Parameter 'threads' must be an integer.")
+
+        if threads < 1:
+            raise ValueError("Parameter 'threads' must be greater than 0.")
+
+        #lazy filters only record inplace effects on the graph, they are rendered on show, save, render() or modified_img access
+        self.__lazy = lazy
+        self.__graph = EffectGraph()
+        #with more than one thread, graphs run on row bands on a thread pool and native blends are split in row bands.
+        #random draws are still taken on the calling thread in the same order, so results do not depend on the threads
+        self.__threads = threads
+        super().__init__(img_src, history=history, max_size=max_size)
+        self.__rng = utils.get_rng(seed) #every random effect draws from this generator, so a seed makes runs reproducible
+
+
+
+    @property
+    def rng(self):
+        return self.__rng
+
+    @property
+    def lazy(self):
+        return self.__lazy
+
+    @property
+    def graph(self):
+        return self.__graph
+
+    @property
+    def threads(self):
+        return self.__threads
+
+    @property
+    def size(self):
+        self.__render_graph()
+        return super().size
+
+
+
+    def __record(self, name, inplace, **params):
+        #records the effect on the graph if it must be deferred. effects that are not deferred run on the rendered image
+        if self.__lazy == False:
+            return False
+        if inplace == True:
+            self.__graph.add(name, params)
+            return True
+        self.render()
+        return False
+
+
+
+    def render(self):
+        #runs the pending effects of the graph on a single working buffer and returns the modified image
+        self.__render_graph()
+        return super().render()
+
+
+
+    def render_array(self):
+        #as render(), but returns the modified image as a read only array. graphs render straight into arrays, so an
+        #array filter rendered this way never makes a Pillow image
+        self.__render_graph()
+        return super().render_array()
+
+
+
+    def __render_graph(self):
+        if len(self.__graph) > 0:
+            graph = EffectGraph(self.__graph.nodes)
+            self.__graph.clear()
+            arr = super().render_array()
+            self.array = self.__run_graph(arr, VHS.resolve_graph(graph, (arr.shape[1], arr.shape[0])))
+
+
+
+    @profiled
+    def apply_graph(self, graph, inplace=True):
+        #runs (or records, on lazy filters) every effect of 'graph' on a single working buffer
+        if isinstance(graph, EffectGraph) == False:
+            raise TypeError("Parameter 'graph' must be an EffectGraph object.")
+        if isinstance(inplace, bool) == False:
+            raise TypeError("Parameter 'inplace' must be a boolean.")
+
+        if self.__lazy == True and inplace == True:
+            self.__graph.extend(graph)
+            return
+
+        arr = self.array
+        resulted_arr = self.__run_graph(arr, VHS.resolve_graph(graph, self.size))
+        if inplace == False:
+            return Image.fromarray(resulted_arr, "RGB")
+        else:
+            self.array = resulted_arr
+
+
+
+    @profiled
+    def apply_preset(self, preset, inplace=True, engine=CONFIGS.DEFAULTS["preset"]["engine"]):
+        #runs (or records, on lazy filters) the effects of a Preset with the parameters it resolved once for the image size
+        from retrofy.filters.vhs.preset import Preset #imported here, presets import this module
+
+        if isinstance(preset, Preset) == False:
+            raise TypeError("Parameter 'preset' must be a Preset object.")
+        if isinstance(inplace, bool) == False:
+            raise TypeError("Parameter 'inplace' must be a boolean.")
+        if engine not in CONFIGS.PRESET_ENGINES:
+            raise ValueError("Invalid engine '{}'. Engine must be one of {}.".format(engine, CONFIGS.PRESET_ENGINES))
+
+        if self.__lazy == True and inplace == True:
+            self.__graph.extend(preset.graph) #the size is only known when the graph is rendered
+            return
+
+        arr = self.array
+        effects = preset.resolve(self.size)
+        if engine == "fused":
+            resulted_arr = self.__run_graph(arr, effects)
+        else:
+            out = np.empty(arr.shape[:2] + (3,), dtype=np.uint8)
+            resulted_arr = self.__render_strips(arr, effects, out, CONFIGS.DEFAULTS["strips"]["height"], self.__threads)
+        if inplace == False:
+            return Image.fromarray(resulted_arr, "RGB")
+        else:
+            self.array = resulted_arr
+
+
+
+    @profiled
+    def render_strips(self, out=None, graph=None, strip_height=CONFIGS.DEFAULTS["strips"]["height"], threads=None):
+        #runs 'graph' (the pending graph by default) on horizontal strips of the image, written into 'out', and returns the
+        #(h, w, 3) uint8 result, a view of 'out'. every effect is a pass over the strips of 'out' with a float32 buffer of
+        #'strip_height' rows (plus the rows effects need around them), so working memory does not grow with the image.
+        #'out' may be a preallocated array or a numpy memmap with the image size; the filter itself is not changed.
+        #with more than one thread ('threads' of the filter by default), strips run on a thread pool
+        if isinstance(out, np.ndarray) == False and out is not None:
+            raise TypeError("Parameter 'out' must be a numpy array.")
+        if isinstance(graph, EffectGraph) == False and graph != None:
+            raise TypeError("Parameter 'graph' must be an EffectGraph object.")
+        if isinstance(strip_height, int) == False:
+            raise TypeError("Parameter 'strip_height' must be an integer.")
+        if isinstance(threads, int) == False and threads != None:
+            raise TypeError("Parameter 'threads' must be an integer.")
+
+        if strip_height < 1:
+            raise ValueError("Parameter 'strip_height' must be greater than 0.")
+        if threads != None and threads < 1:
+            raise ValueError("Parameter 'threads' must be greater than 0.")
+
+        if graph == None:
+            arr, graph = super().render_array(), EffectGraph(self.__graph.nodes)
+        else:
+            arr = self.array
+        h, w = arr.shape[:2]
+        if out is None:
+            out = np.empty((h, w, 3), dtype=np.uint8)
+        elif out.shape != (h, w, 3) or out.dtype != np.uint8:
+            raise ValueError("Parameter 'out' must be an uint8 array with {} shape.".format((h, w, 3)))
+        return self.__render_strips(arr, VHS.resolve_graph(graph, (w, h)), out, strip_height, threads or self.__threads)
+
+
+
+    def __render_strips(self, src, effects, out, strip_height, threads):
+        run = {
+            "noise_lines": self.__run_noise_lines_strips,
+            "color_glitch": self.__run_color_glitch_strips,
+            "horizontal_lines": self.__run_horizontal_lines_strips,
+            "film_grain": self.__run_film_grain_strips,
+            "play_text": self.__run_play_text_strips,
+            "wave_warp": self.__run_wave_warp_strips
+        }
+        h = src.shape[0]
+        if threads > 1: #smaller strips keep every thread busy
+            strip_height = min(strip_height, -(-h // (threads * CONFIGS.DEFAULTS["strips"]["bands_per_thread"])))
+
+        def copy_strip(a, b): #as convert("RGB"): alpha is dropped and gray is copied to every channel
+            out[a:b] = src[a:b, :, :3] if src.ndim == 3 else src[a:b, :, None]
+
+        with ThreadPoolExecutor(max_workers=threads) if threads > 1 else contextlib.nullcontext() as executor:
+            map_bands = functools.partial(VHS.__map_bands, executor=executor, in_flight=2*threads)
+            map_bands(copy_strip, VHS.get_strips(h, strip_height))
+            view = out
+            for node in effects:
+                view = run[node.name](view, strip_height, map_bands, **node.params)
+        return view
+
+
+
+    @staticmethod
+    def __map_bands(func, args, executor=None, in_flight=None):
+        #calls func(*arg) for every arg, on the executor if there is one. bands write on disjoint rows, so they may run in
+        #any order. at most 'in_flight' calls are queued, so arguments built by a generator are not all kept in memory
+        if executor == None:
+            for arg in args:
+                func(*arg)
+            return
+
+        futures = deque()
+        for arg in args:
+            futures.append(executor.submit(func, *arg))
+            if len(futures) >= in_flight:
+                futures.popleft().result()
+        for future in futures:
+            future.result()
+
+
+
+    @staticmethod
+    def get_strips(h, strip_height):
+        #(start, end) rows of the strips of an image with 'h' rows
+        return [(a, min(a + strip_height, h)) for a in range(0, h, strip_height)]
+
+
+
+    def undo(self, times=1):
+        if isinstance(times, int) == False:
+            raise TypeError("Parameter 'times' must be an integer.")
+
+        #pending effects are dropped without ever running
+        times -= len(self.__graph.pop(times))
+        if times > 0:
+            super().undo(times)
+
+
+
+    def reset(self):
+        self.__graph.clear()
+        super().reset()
+
+
+
+    @classmethod
+    def process_many(cls, sources, out_dir, effects=None, workers=None, seed=None, format="png", name="{stem}", max_in_flight=None):
+        #retrofies many sources (paths, URLs or Pillow Image objects, or a directory path) on a process pool.
+        #yields a BatchResult for each source as soon as it is done; failed sources are reported on 'error'.
+        #files are named by the 'name' template ('{stem}' and '{index}' fields), sources with a name already given get
+        #their index appended, so no result is written over another
+        return batch.process_many(cls, sources, out_dir, effects=effects, workers=workers, seed=seed, format=format, name=name, max_in_flight=max_in_flight)
 
 
 
@@ -23,26 +270,13 @@ class VHS(Filter):
         if isinstance(id, int) == False:
             raise TypeError("Parameter 'id' must be an integer.")
 
-        is_id_validated, id_path = utils.is_in_folder(CONFIGS.PATHS["images"]["noise_lines"], str(id), format="png")
-        if is_id_validated == True:
-            noise_lines_img = Image.open(id_path).convert("L")
-            return noise_lines_img
-        else:
-            raise ValueError("Invalid ID '{}' for noise lines images.".format(id))
+        return Image.fromarray(assets.NOISE_LINES.get(id), "L")
 
 
 
     @staticmethod
-    def generate_noise_lines(size=CONFIGS.SIZE, intensity=CONFIGS.DEFAULTS["noise_lines"]["intensity"], blur=CONFIGS.DEFAULTS["noise_lines"]["blur"], bright=CONFIGS.DEFAULTS["noise_lines"]["bright"]):
-        if isinstance(size, tuple) == False:
-            raise TypeError("Parameter 'size' must be a tuple.")
-        if isinstance(intensity, (int, float)) == False:
-            raise TypeError("Parameter 'intensity' must be a float.")
-        if isinstance(blur, (int, float)) == False:
-            raise TypeError("Parameter 'blur' must be a float.")
-        if isinstance(bright, (int, float)) == False:
-            raise TypeError("Parameter 'bright' must be a float.")
-
+    def get_noise_lines_params(intensity, blur, bright):
+        #returns the probability threshold, iterations, blur radius and brightness factor used to generate noise lines
         intensity = utils.clamp(intensity, CONFIGS.MINS["noise_lines"]["intensity"], 1)
         blur = utils.clamp(blur, 0, 1)
         bright = utils.clamp(bright, 0, 1)
@@ -52,32 +286,38 @@ class VHS(Filter):
         iterations = int(utils.pctg_to_value(intensity, CONFIGS.MAXS["noise_lines"]["iter"]))
         blur = utils.pctg_to_value(blur, CONFIGS.MAXS["noise_lines"]["blur"])
         bright = utils.pctg_to_value(bright, CONFIGS.MAXS["noise_lines"]["bright"])
+        return p_threshold, iterations, blur, bright
+
 
-        size = (size[1], size[0])
+
+    @staticmethod
+    def generate_noise_lines(size=CONFIGS.SIZE, intensity=CONFIGS.DEFAULTS["noise_lines"]["intensity"], blur=CONFIGS.DEFAULTS["noise_lines"]["blur"], bright=CONFIGS.DEFAULTS["noise_lines"]["bright"], seed=None, rng=None):
         if isinstance(size, tuple) == False:
             raise TypeError("Parameter 'size' must be a tuple.")
+        if isinstance(intensity, (int, float)) == False:
+            raise TypeError("Parameter 'intensity' must be a float.")
+        if isinstance(blur, (int, float)) == False:
+            raise TypeError("Parameter 'blur' must be a float.")
+        if isinstance(bright, (int, float)) == False:
+            raise TypeError("Parameter 'bright' must be a float.")
+        if isinstance(seed, (int, np.random.SeedSequence)) == False and seed != None:
+            raise TypeError("Parameter 'seed' must be an integer or a numpy SeedSequence.")
+        if isinstance(rng, np.random.Generator) == False and rng != None:
+            raise TypeError("Parameter 'rng' must be a numpy Generator.")
 
-        noise_arr = np.zeros(size, dtype=np.uint8)
-
-        n_rows = noise_arr.shape[0]
-        n_cols = noise_arr.shape[1]
+        if seed != None and rng != None:
+            raise ValueError("Parameters 'seed' and 'rng' can not be passed together.")
+        if rng == None:
+            rng = utils.get_rng(seed)
 
-        for i in range(iterations):
-            for row in range(n_rows):
-                p = random.uniform(0,1) #probability of row become a noise line
-                if row < n_rows/10 or n_rows - row < n_rows/10: #increases probability for top and bottom rows
-                    p += p * 0.1
-                elif row < n_rows/30 or n_rows - row < n_rows/30:
-                    p += p * 0.1
+        return VHS.__draw_noise_lines(size, *VHS.get_noise_lines_params(intensity, blur, bright), rng)
 
-                if p > p_threshold: #row becomes a noise line
-                    hsize = np.random.choice(np.arange(1,3), p=[0.95, 0.05]) #line horizontal size
-                    vstart = random.randint(0, n_cols-1) #line vertical start pixel
-                    vend = random.randint(0, int(n_cols / np.random.choice(np.array([5, 10, 15, 20]), p=[0.1, 0.2, 0.3, 0.4]))) #line vertical end pixel based on array size. Smaller lines have more chance to occur
 
-                    noise_arr[row : row + hsize, vstart % n_cols : (vstart + vend) % n_cols] = 1
 
-                    np.random.shuffle(noise_arr[row, vstart : vstart + vend + int(n_cols/15)]) #creates noise for each line
+    @staticmethod
+    def __draw_noise_lines(size, p_threshold, iterations, blur, bright, rng):
+        noise_arr = np.zeros((size[1], size[0]), dtype=np.uint8)
+        kernels.draw_noise_lines(noise_arr, iterations, p_threshold, rng)
 
         noise_lines_img = Image.fromarray(noise_arr*255, "L")
         noise_lines_img = noise_lines_img.filter(ImageFilter.GaussianBlur(blur)) #applying gaussian blur
@@ -88,25 +328,21 @@ class VHS(Filter):
 
 
 
+    @profiled
     def apply_noise_lines(self, intensity=CONFIGS.DEFAULTS["noise_lines"]["intensity"], blur=CONFIGS.DEFAULTS["noise_lines"]["blur"], bright=CONFIGS.DEFAULTS["noise_lines"]["bright"], img_id=None, inplace=True):
-        if isinstance(intensity, (int, float)) == False:
-            raise TypeError("Parameter 'intensity' must be a float.")
-        if isinstance(blur, (int, float)) == False:
-            raise TypeError("Parameter 'blur' must be a float.")
-        if isinstance(bright, (int, float)) == False:
-            raise TypeError("Parameter 'bright' must be a float.")
-        if isinstance(img_id, int) == False and img_id != None:
-            raise TypeError("Parameter 'img_id' must be an integer.")
+        get_params("noise_lines", {"intensity": intensity, "blur": blur, "bright": bright, "img_id": img_id})
         if isinstance(inplace, bool) == False:
             raise TypeError("Parameter 'inplace' must be a boolean.")
 
+        if self.__record("noise_lines", inplace, intensity=intensity, blur=blur, bright=bright, img_id=img_id) == True:
+            return
+
         if img_id != None:
-            noise_lines_mask = VHS.get_noise_lines_by_id(img_id)
-            noise_lines_mask = noise_lines_mask.resize(self.modified_img.size)
+            noise_lines_mask = Image.fromarray(assets.NOISE_LINES.resized(img_id, self.size), "L")
         else:
-            noise_lines_mask = VHS.generate_noise_lines(size=self.modified_img.size, intensity=intensity, blur=blur, bright=bright)
+            noise_lines_mask = VHS.generate_noise_lines(size=self.size, intensity=intensity, blur=blur, bright=bright, rng=self.rng)
 
-        white_img = Image.new("RGB", self.modified_img.size, (255,255,255))
+        white_img = Image.new("RGB", self.size, (255,255,255))
 
         resulted_img = Image.composite(white_img, self.modified_img, noise_lines_mask)
 
@@ -117,114 +353,241 @@ class VHS(Filter):
 
 
 
-    def __get_single_channel_rgb_img(self, channel):
-        if self.modified_img.mode not in ["RGB", "RGBA"]:
-            raise ValueError("Invalid image mode '{}'. Image must have 3 channels or more.".format(self.modified_img.mode))
-        r,g,b = self.modified_img.split()[:3]
-        channel = channel.strip().lower()
-        if channel == "r":
-            g = g.point(lambda x: x-x)
-            b = b.point(lambda x: x-x)
-        elif channel == "g":
-            r = r.point(lambda x: x-x)
-            b = b.point(lambda x: x-x)
-        elif channel == "b":
-            r = r.point(lambda x: x-x)
-            g = g.point(lambda x: x-x)
-        else:
-            raise ValueError("Invalid channel '{}' for RGB image.".format(channel))
-
-        return Image.merge("RGB", (r,g,b))
+    @staticmethod
+    def get_color_glitch_offset(h, intensity):
+        intensity = utils.clamp(intensity, 0, 1)
+        intensity = utils.translate_ranges(intensity, 0, 1, CONFIGS.MINS["color_glitch"]["intensity"], CONFIGS.MAXS["color_glitch"]["intensity"])
+        offset = int(utils.pctg_to_value(intensity, h/CONFIGS.DEFAULTS["color_glitch"]["height_divider"]))
+        offset = utils.clamp(offset, CONFIGS.MINS["color_glitch"]["offset"], CONFIGS.MAXS["color_glitch"]["offset"])
+        return offset
 
 
 
+    @profiled
     def apply_color_glitch(self, intensity=CONFIGS.DEFAULTS["color_glitch"]["intensity"], crop=True, inplace=True):
-        if isinstance(intensity, (int, float)) == False:
-            raise TypeError("Parameter 'intensity' must be a float.")
-        if isinstance(crop, bool) == False:
-            raise TypeError("Parameter 'crop' must be a boolean.")
+        get_params("color_glitch", {"intensity": intensity, "crop": crop})
         if isinstance(inplace, bool) == False:
             raise TypeError("Parameter 'inplace' must be a boolean.")
 
-        h = self.modified_img.size[1]
-
-        intensity = utils.clamp(intensity, 0, 1)
-        intensity = utils.translate_ranges(intensity, 0, 1, CONFIGS.MINS["color_glitch"]["intensity"], CONFIGS.MAXS["color_glitch"]["intensity"])
-        offset = int(utils.pctg_to_value(intensity, h/CONFIGS.DEFAULTS["color_glitch"]["height_divider"]))
-        offset = utils.clamp(offset, CONFIGS.MINS["color_glitch"]["offset"], CONFIGS.MAXS["color_glitch"]["offset"])
-
-        red_img = self.__get_single_channel_rgb_img("r").convert("RGBA")
-        red_img = ImageChops.offset(red_img, offset, -offset)
+        if self.__record("color_glitch", inplace, intensity=intensity, crop=crop) == True:
+            return
 
-        green_img = self.__get_single_channel_rgb_img("g").convert("RGBA")
+        img_arr = self.array
+        mode = loader.get_array_mode(img_arr)
+        if mode not in ["RGB", "RGBA"]:
+            raise ValueError("Invalid image mode '{}'. Image must have 3 channels or more.".format(mode))
 
-        blue_img = self.__get_single_channel_rgb_img("b").convert("RGBA")
-        blue_img = ImageChops.offset(blue_img, -offset, offset)
-
-        resulted_img = ImageChops.add(green_img, red_img, 1)
-        resulted_img = ImageChops.add(resulted_img, blue_img, 1)
+        offset = VHS.get_color_glitch_offset(img_arr.shape[0], intensity)
 
+        #red and blue planes are copied shifted from views of the image straight into the (already cropped) output,
+        #which keeps the opaque RGBA result of the channels sum
+        h, w = img_arr.shape[:2]
         if crop == True:
-            resulted_img = ImageOps.crop(resulted_img, offset)
+            h, w = h - 2*offset, w - 2*offset
+        resulted_arr = np.empty((h, w, 4), dtype=np.uint8)
+        resulted_arr[:, :, 3] = 255
+        kernels.channel_offset(img_arr[:, :, :3], offset, crop, out=resulted_arr[:, :, :3])
 
         if inplace == False:
-            return resulted_img
+            return Image.fromarray(resulted_arr, "RGBA")
         else:
-            self.modified_img = resulted_img
+            self.array = resulted_arr
+
 
 
+    @staticmethod
+    def get_film_grain_intensity(intensity):
+        intensity = utils.clamp(intensity, 0, 1)
+        return utils.translate_ranges(intensity, 0, 1, CONFIGS.MINS["film_grain"]["intensity"], 1)
+
 
-    def apply_film_grain(self, intensity=CONFIGS.DEFAULTS["film_grain"]["intensity"], blur=CONFIGS.DEFAULTS["film_grain"]["blur"], inplace=True):
+
+    @staticmethod
+    def generate_film_grain(size=CONFIGS.SIZE, intensity=CONFIGS.DEFAULTS["film_grain"]["intensity"], blur=CONFIGS.DEFAULTS["film_grain"]["blur"], seed=None, rng=None):
+        if isinstance(size, tuple) == False:
+            raise TypeError("Parameter 'size' must be a tuple.")
         if isinstance(intensity, (int, float)) == False:
             raise TypeError("Parameter 'intensity' must be a float.")
         if isinstance(blur, (int, float)) == False:
             raise TypeError("Parameter 'blur' must be a float.")
-        if isinstance(inplace, bool) == False:
-            raise TypeError("Parameter 'inplace' must be a boolean.")
+        if isinstance(seed, (int, np.random.SeedSequence)) == False and seed != None:
+            raise TypeError("Parameter 'seed' must be an integer or a numpy SeedSequence.")
+        if isinstance(rng, np.random.Generator) == False and rng != None:
+            raise TypeError("Parameter 'rng' must be a numpy Generator.")
+
+        if seed != None and rng != None:
+            raise ValueError("Parameters 'seed' and 'rng' can not be passed together.")
+        if rng == None:
+            rng = utils.get_rng(seed)
+
+        intensity, blur = VHS.__get_film_grain_params(intensity, blur)
+        noise_img = VHS.__get_film_grain_noise(size, intensity, rng)
+        noise_img = noise_img.filter(ImageFilter.GaussianBlur(blur))
+        return noise_img
 
-        w, h = self.modified_img.size
 
-        intensity = utils.clamp(intensity, 0, 1)
-        intensity = utils.translate_ranges(intensity, 0, 1, CONFIGS.MINS["film_grain"]["intensity"], 1)
+
+    @staticmethod
+    def __get_film_grain_params(intensity, blur):
+        intensity = VHS.get_film_grain_intensity(intensity)
         blur = utils.clamp(blur, 0, 1)
         blur = utils.pctg_to_value(blur, CONFIGS.MAXS["film_grain"]["blur"])
+        return intensity, blur
 
-        middle_gray = Image.new("RGB", self.modified_img.size, (119, 119, 119)).convert("RGBA")
+    @staticmethod
+    def __get_film_grain_noise(size, intensity, rng):
+        #gaussian noise blended with middle gray, before the blur
+        w, h = size
+        middle_gray = Image.fromarray(MASK_CACHE.get(("middle_gray", size), lambda: Image.new("L", size, 119)), "L")
 
-        noise_arr = np.random.normal(0, CONFIGS.DEFAULTS["film_grain"]["gaussian_std"], w*h)
+        noise_arr = rng.normal(0, CONFIGS.DEFAULTS["film_grain"]["gaussian_std"], w*h)
         noise_arr = np.uint8(noise_arr.reshape(h, w))
-        noise_img = Image.fromarray(noise_arr).convert("RGBA")
+        noise_img = Image.fromarray(noise_arr)
 
-        noise_img = Image.blend(middle_gray, noise_img, intensity)
+        return Image.blend(middle_gray, noise_img, intensity)
+
+
+
+    @staticmethod
+    def generate_film_grain_tile(tile_size, intensity=CONFIGS.DEFAULTS["film_grain"]["intensity"], blur=CONFIGS.DEFAULTS["film_grain"]["blur"], rng=None):
+        #same grain as generate_film_grain, blurred with wrapped borders so the tile repeats without seams
+        if isinstance(tile_size, int) == False:
+            raise TypeError("Parameter 'tile_size' must be an integer.")
+        if isinstance(rng, np.random.Generator) == False and rng != None:
+            raise TypeError("Parameter 'rng' must be a numpy Generator.")
+
+        rng = utils.get_rng(rng)
+        intensity, blur = VHS.__get_film_grain_params(intensity, blur)
+        noise_arr = np.asarray(VHS.__get_film_grain_noise((tile_size, tile_size), intensity, rng))
+
+        halo = int(blur*3) + 2
+        noise_img = Image.fromarray(np.pad(noise_arr, halo, mode="wrap"))
         noise_img = noise_img.filter(ImageFilter.GaussianBlur(blur))
+        return np.asarray(noise_img)[halo:halo + tile_size, halo:halo + tile_size]
+
+
+
+    @staticmethod
+    def get_film_grain_layer(size, intensity=CONFIGS.DEFAULTS["film_grain"]["intensity"], blur=CONFIGS.DEFAULTS["film_grain"]["blur"], rng=None):
+        #returns a (height, width) uint8 grain layer tiled from the process wide grain pool, with a random tile and offset
+        if isinstance(size, tuple) == False:
+            raise TypeError("Parameter 'size' must be a tuple.")
+        if isinstance(intensity, (int, float)) == False:
+            raise TypeError("Parameter 'intensity' must be a float.")
+        if isinstance(blur, (int, float)) == False:
+            raise TypeError("Parameter 'blur' must be a float.")
+        if isinstance(rng, np.random.Generator) == False and rng != None:
+            raise TypeError("Parameter 'rng' must be a numpy Generator.")
+
+        rng = utils.get_rng(rng)
+        return assets.GRAIN_POOL.layer(size, VHS.__get_film_grain_tiles(intensity, blur), rng)
+
+
+
+    @staticmethod
+    def __get_film_grain_tiles(intensity, blur, level=None):
+        if level == None:
+            level = VHS.__get_film_grain_params(intensity, blur)
+        return assets.GRAIN_POOL.get(level, lambda tile_size, tile_rng: VHS.generate_film_grain_tile(tile_size, intensity, blur, tile_rng))
+
+
+
+    @staticmethod
+    def __import_blend_modes():
+        try:
+            import blend_modes
+        except ImportError as e:
+            raise ImportError("Blend 'blend_modes' needs the blend_modes package. Install it with 'pip install blend_modes'.") from e
+        return blend_modes
+
+
+
+    def __blend_layer(self, kernel, layer, opacity):
+        #blends a single channel layer on the RGB channels as float32, keeping the alpha channel of RGBA images
+        img_arr = self.array
+        mode = loader.get_array_mode(img_arr)
+        buf = kernels.to_buffer(img_arr)
+
+        if mode == "RGBA":
+            #same alpha composition as blend_modes, for an opaque layer
+            alpha = img_arr[:, :, 3] / 255
+            if alpha.min() < 1:
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    opacity = np.nan_to_num(alpha*opacity / (alpha + (1 - alpha)*alpha*opacity))
+
+        if self.__threads == 1:
+            kernel(buf, layer, opacity)
+        else:
+            def blend_band(a, b):
+                kernel(buf[a:b], layer[a:b], opacity[a:b] if np.ndim(opacity) > 0 else opacity)
+            bands = VHS.get_strips(buf.shape[0], -(-buf.shape[0] // (self.__threads * CONFIGS.DEFAULTS["strips"]["bands_per_thread"])))
+            with ThreadPoolExecutor(max_workers=self.__threads) as executor:
+                VHS.__map_bands(blend_band, bands, executor, len(bands))
+
+        if mode != "RGBA":
+            return kernels.to_image(buf)
+
+        resulted_arr = np.empty(img_arr.shape, dtype=np.uint8)
+        resulted_arr[:, :, :3] = buf
+        resulted_arr[:, :, 3] = img_arr[:, :, 3]
+        return Image.fromarray(resulted_arr, "RGBA")
+
 
+
+    def __blend_layer_rgba(self, blend_function, layer, opacity):
+        #legacy blend of float64 RGBA arrays with blend_modes, always returns an RGBA image
         resulted_img = self.modified_img
         if resulted_img.mode != "RGBA":
             resulted_img = resulted_img.convert("RGBA")
-
-        noise_arr = np.array(noise_img).astype(float)
         resulted_arr = np.array(resulted_img).astype(float)
 
-        resulted_arr = blend_modes.overlay(resulted_arr, noise_arr, intensity/2)
-        resulted_img = Image.fromarray(resulted_arr.astype(np.uint8))
+        layer_arr = np.empty(layer.shape + (4,))
+        layer_arr[:, :, :3] = layer[:, :, None]
+        layer_arr[:, :, 3] = 255
+        layer_arr = np.broadcast_to(layer_arr, resulted_arr.shape)
 
-        if inplace == False:
-            return resulted_img
-        else:
-            self.modified_img = resulted_img
+        resulted_arr = blend_function(resulted_arr, layer_arr, opacity)
+        return Image.fromarray(resulted_arr.astype(np.uint8))
 
 
 
-    def apply_horizontal_lines(self, intensity=CONFIGS.DEFAULTS["horizontal_lines"]["intensity"], blur=CONFIGS.DEFAULTS["horizontal_lines"]["blur"], inplace=True):
-        if isinstance(intensity, (int, float)) == False:
-            raise TypeError("Parameter 'intensity' must be a float.")
-        if isinstance(blur, (int, float)) == False:
-            raise TypeError("Parameter 'blur' must be a float.")
+    def __get_film_grain_mask(self, size, intensity, blur, pooled):
+        if pooled == True:
+            return VHS.get_film_grain_layer(size, intensity, blur, rng=self.rng)
+        return np.asarray(VHS.generate_film_grain(size, intensity, blur, rng=self.rng))
+
+
+
+    @profiled
+    def apply_film_grain(self, intensity=CONFIGS.DEFAULTS["film_grain"]["intensity"], blur=CONFIGS.DEFAULTS["film_grain"]["blur"], pooled=CONFIGS.DEFAULTS["film_grain"]["pooled"], blend=CONFIGS.DEFAULTS["blend"]["engine"], inplace=True):
+        get_params("film_grain", {"intensity": intensity, "blur": blur, "pooled": pooled})
         if isinstance(inplace, bool) == False:
             raise TypeError("Parameter 'inplace' must be a boolean.")
 
-        w, h = self.modified_img.size
+        if blend not in CONFIGS.BLENDS:
+            raise ValueError("Invalid blend '{}'. Blend must be one of {}.".format(blend, CONFIGS.BLENDS))
 
+        #the graph only blends natively, legacy blends run right away
+        if self.__record("film_grain", inplace and blend == "native", intensity=intensity, blur=blur, pooled=pooled) == True:
+            return
+
+        noise_arr = self.__get_film_grain_mask(self.size, intensity, blur, pooled)
+        intensity = VHS.get_film_grain_intensity(intensity)
+
+        if blend == "native":
+            resulted_img = self.__blend_layer(kernels.overlay, noise_arr, intensity/2)
+        else:
+            resulted_img = self.__blend_layer_rgba(VHS.__import_blend_modes().overlay, noise_arr, intensity/2)
+
+        if inplace == False:
+            return resulted_img
+        else:
+            self.modified_img = resulted_img
+
+
+
+    @staticmethod
+    def __get_horizontal_lines_params(h, intensity, blur):
         intensity = utils.clamp(intensity, CONFIGS.MINS["horizontal_lines"]["intensity"], CONFIGS.MAXS["horizontal_lines"]["intensity"])
 
         height_divided = h/CONFIGS.DEFAULTS["horizontal_lines"]["height_divider"]
@@ -234,124 +597,201 @@ class VHS(Filter):
         blur = utils.clamp(blur, 0, 1)
         blur = utils.pctg_to_value(blur, CONFIGS.MAXS["horizontal_lines"]["blur"])
 
-        resulted_img = self.modified_img
-        if resulted_img.mode != "RGBA":
-            resulted_img = resulted_img.convert("RGBA")
+        pixels_between = int(h/n_lines)
+        return pixels_between, blur
 
-        resulted_arr = np.array(resulted_img).astype(float)
 
-        lines_arr = np.zeros((h,w), dtype=np.uint8)
-        lines_rows = lines_arr.shape[0]
-        lines_cols = lines_arr.shape[1]
 
-        pixels_between = int(h/n_lines)
-        for row in range(lines_rows):
-            if row % pixels_between == 0:
-                lines_arr[row,:] = 1
+    @staticmethod
+    def generate_horizontal_lines_profile(h, intensity=CONFIGS.DEFAULTS["horizontal_lines"]["intensity"], blur=CONFIGS.DEFAULTS["horizontal_lines"]["blur"]):
+        #lines are constant along rows, so the mask is a blurred (height,) column broadcasted along the width.
+        #returns the read only uint8 column, cached per height and parameters
+        if isinstance(h, int) == False:
+            raise TypeError("Parameter 'h' must be an integer.")
+        if isinstance(intensity, (int, float)) == False:
+            raise TypeError("Parameter 'intensity' must be a float.")
+        if isinstance(blur, (int, float)) == False:
+            raise TypeError("Parameter 'blur' must be a float.")
 
-        lines_img = Image.fromarray(lines_arr*255).convert("RGBA")
-        lines_img = lines_img.filter(ImageFilter.GaussianBlur(blur))
-        lines_arr = np.array(lines_img).astype(float)
+        pixels_between, blur = VHS.__get_horizontal_lines_params(h, intensity, blur)
 
-        resulted_arr = blend_modes.soft_light(resulted_arr, lines_arr, CONFIGS.DEFAULTS["horizontal_lines"]["bright"])
-        resulted_img = Image.fromarray(resulted_arr.astype(np.uint8))
+        def build_lines_profile():
+            lines_arr = np.zeros((h, 1), dtype=np.uint8)
+            lines_arr[::pixels_between] = 255
+            lines_img = Image.fromarray(lines_arr).filter(ImageFilter.GaussianBlur(blur))
+            return np.asarray(lines_img)[:, 0]
 
-        if inplace == False:
-            return resulted_img
-        else:
-            self.modified_img = resulted_img
+        return MASK_CACHE.get(("horizontal_lines", h, pixels_between, blur), build_lines_profile)
 
 
 
-    def apply_wave_warp(self, intensity=CONFIGS.DEFAULTS["wave_warp"]["intensity"], row=None, inplace=True):
-        if isinstance(intensity, (float, int)) == False:
-            raise TypeError("Parameter 'intensity' must be a float.")
-        if isinstance(row, int) == False and row != None:
-            raise TypeError("Parameter 'row' must be an integer.")
+    @staticmethod
+    def generate_horizontal_lines(size=CONFIGS.SIZE, intensity=CONFIGS.DEFAULTS["horizontal_lines"]["intensity"], blur=CONFIGS.DEFAULTS["horizontal_lines"]["blur"]):
+        if isinstance(size, tuple) == False:
+            raise TypeError("Parameter 'size' must be a tuple.")
+
+        w, h = size
+        lines_profile = VHS.generate_horizontal_lines_profile(h, intensity, blur)
+        return Image.fromarray(np.repeat(lines_profile[:, None], w, axis=1), "L")
+
+
+
+    @profiled
+    def apply_horizontal_lines(self, intensity=CONFIGS.DEFAULTS["horizontal_lines"]["intensity"], blur=CONFIGS.DEFAULTS["horizontal_lines"]["blur"], blend=CONFIGS.DEFAULTS["blend"]["engine"], inplace=True):
+        get_params("horizontal_lines", {"intensity": intensity, "blur": blur})
         if isinstance(inplace, bool) == False:
             raise TypeError("Parameter 'inplace' must be a boolean.")
 
-        w, h = self.modified_img.size
+        if blend not in CONFIGS.BLENDS:
+            raise ValueError("Invalid blend '{}'. Blend must be one of {}.".format(blend, CONFIGS.BLENDS))
 
-        if row != None:
-            if row < 0 or row >= h:
-                raise ValueError("Parameter 'row' must be lesser than image's height.")
+        #the graph only blends natively, legacy blends run right away
+        if self.__record("horizontal_lines", inplace and blend == "native", intensity=intensity, blur=blur) == True:
+            return
+
+        lines_profile = VHS.generate_horizontal_lines_profile(self.size[1], intensity, blur)
+
+        if blend == "native":
+            resulted_img = self.__blend_layer(kernels.soft_light, lines_profile[:, None], CONFIGS.DEFAULTS["horizontal_lines"]["bright"])
         else:
-            row = random.randint(0, h)
+            resulted_img = self.__blend_layer_rgba(VHS.__import_blend_modes().soft_light, lines_profile[:, None], CONFIGS.DEFAULTS["horizontal_lines"]["bright"])
+
+        if inplace == False:
+            return resulted_img
+        else:
+            self.modified_img = resulted_img
+
 
+
+    @staticmethod
+    def get_wave_warp_size(h, intensity):
         intensity = utils.clamp(intensity, CONFIGS.MINS["wave_warp"]["intensity"], CONFIGS.MAXS["wave_warp"]["intensity"])
 
         height_divided = h/CONFIGS.DEFAULTS["wave_warp"]["height_divider"]
         max_number_of_warps = utils.pctg_to_value(intensity, height_divided)
         max_number_of_warps = utils.translate_ranges(max_number_of_warps, 0, height_divided, height_divided, 0)
+        return int(h/max_number_of_warps)
 
-        img_arr = np.asarray(self.modified_img)
-        img_arr.flags.writeable = True
-
-        size = int(h/max_number_of_warps)
 
-        if row - size*2 >= 0:
-            img_arr[row - size:row,:] = img_arr[row - size*2:row - size,:]
 
-        resulted_img = Image.fromarray(img_arr)
-        if inplace == False:
-            return resulted_img
-        else:
-            self.modified_img = resulted_img
+    @staticmethod
+    def get_wave_warp_amplitude(w, intensity):
+        #largest sideways offset, in pixels, of 'sine' and 'bands' warps
+        intensity = utils.clamp(intensity, CONFIGS.MINS["wave_warp"]["intensity"], CONFIGS.MAXS["wave_warp"]["intensity"])
+        return int(utils.pctg_to_value(intensity, w/CONFIGS.DEFAULTS["wave_warp"]["width_divider"]))
 
 
 
-    def apply_play_text(self, intensity=CONFIGS.DEFAULTS["play_text"]["intensity"], datetime=None, hour=None, inplace=True):
-        if isinstance(intensity, (int, float)) == False:
-            raise TypeError("Parameter 'intensity' must be a float.")
-        if isinstance(datetime, dt.datetime) == False and datetime != None:
-            raise TypeError("Parameter 'datetime' must be a datetime.datetime object.")
-        if isinstance(hour, int) == False and hour != None:
-            raise TypeError("Parameter 'hour' must be an integer.")
+    @staticmethod
+    def get_wave_warp_map(size, rows, warp_size, amplitude, mode=CONFIGS.DEFAULTS["wave_warp"]["mode"], rng=None):
+        #row displacement map (see kernels.warp_rows) of warps of 'warp_size' rows ending on each of 'rows': the source
+        #row and the sideways offset of every row of an image of 'size'. only 'bands' mode draws from 'rng'
+        w, h = size
+        row_map = np.arange(h)
+        offsets = np.zeros(h, dtype=np.intp)
+        for row in rows:
+            start = max(row - warp_size, 0)
+            if mode == "block":
+                if row - warp_size*2 >= 0:
+                    row_map[row - warp_size:row] = np.arange(row - warp_size*2, row - warp_size)
+            elif mode == "sine":
+                #a smooth bump, widest in the middle of the warp
+                t = (np.arange(start, row) - (row - warp_size) + 0.5) / warp_size
+                offsets[start:row] += np.rint(amplitude * np.sin(np.pi * t)).astype(np.intp)
+            else:
+                rng = utils.get_rng(rng)
+                bands = np.array_split(np.arange(start, row), CONFIGS.DEFAULTS["wave_warp"]["bands"])
+                for band, offset in zip(bands, rng.integers(-amplitude, amplitude + 1, len(bands))):
+                    offsets[band] += offset
+        return row_map, offsets
+
+
+
+    @profiled
+    def apply_wave_warp(self, intensity=CONFIGS.DEFAULTS["wave_warp"]["intensity"], row=None, mode=CONFIGS.DEFAULTS["wave_warp"]["mode"], zones=CONFIGS.DEFAULTS["wave_warp"]["zones"], inplace=True):
+        get_params("wave_warp", {"intensity": intensity, "row": row, "mode": mode, "zones": zones})
         if isinstance(inplace, bool) == False:
             raise TypeError("Parameter 'inplace' must be a boolean.")
 
-        if hour != None and (hour < 0 or hour > 23):
-            raise ValueError("Parameter 'hour' must be an integer between 0 and 23.")
+        if self.__record("wave_warp", inplace, intensity=intensity, row=row, mode=mode, zones=zones) == True:
+            return
 
-        if datetime == None:
-            datetime = utils.get_random_datetime(1980, 1990, hour)
-        elif datetime != None and hour != None:
-            raise ValueError("Parameter 'hour' can only be passed if parameter 'datetime' is None.")
+        w, h = self.size
+
+        if row != None:
+            if row >= h:
+                raise ValueError("Parameter 'row' must be lesser than image's height.")
+            rows = [row]
+        else:
+            rows = [int(self.rng.integers(0, h + 1)) for i in range(zones)]
 
+        #the image array is read only, warped rows are gathered into a new one
+        row_map, offsets = VHS.get_wave_warp_map((w, h), rows, VHS.get_wave_warp_size(h, intensity), VHS.get_wave_warp_amplitude(w, intensity), mode, self.rng)
+        resulted_arr = kernels.warp_rows(self.array, row_map, offsets)
+        if inplace == False:
+            return Image.fromarray(resulted_arr, loader.get_array_mode(resulted_arr))
+        else:
+            self.array = resulted_arr
+
+
+
+    @staticmethod
+    def get_play_text_layout(size, intensity):
+        #returns the font size, the static texts as (position, text, font name) and the datetime text position
         intensity = utils.clamp(intensity, 0, 1)
         intensity = utils.translate_ranges(intensity, 0, 1, CONFIGS.MINS["play_text"]["intensity"], CONFIGS.MAXS["play_text"]["intensity"])
 
-        w, h = self.modified_img.size
+        w, h = size
         x_offset = w * CONFIGS.DEFAULTS["play_text"]["offset_multiplier"]
         y_offset = h * CONFIGS.DEFAULTS["play_text"]["offset_multiplier"]
 
         width_divided = w/CONFIGS.DEFAULTS["play_text"]["width_divider"]
         font_size = int(utils.pctg_to_value(intensity, width_divided))
 
-        resulted_img = copy.deepcopy(self.modified_img)
-
-        draw = ImageDraw.Draw(resulted_img)
+        texts = [
+            ((x_offset, y_offset), "PLAY", "vhs"),
+            ((x_offset + 2.2*font_size, y_offset), ">", "play_icon"),
+            ((w - x_offset - 3*font_size, h - y_offset - font_size), "SP", "vhs"),
+            ((w - x_offset - 3*font_size, y_offset), "--:--", "vhs")
+        ]
+        datetime_xy = (x_offset, h - y_offset - 2*font_size)
+        return font_size, texts, datetime_xy
 
-        vhs_font_path = str(CONFIGS.PATHS["fonts"] / Path("VCR_OSD_MONO_1.001.ttf"))
-        play_icon_path = str(CONFIGS.PATHS["fonts"] / Path("play_icon.ttf"))
-        vhs_font = ImageFont.truetype(vhs_font_path, font_size)
-        play_icon = ImageFont.truetype(play_icon_path, font_size)
 
-        draw.text((x_offset, y_offset), "PLAY", (255,255,255), font=vhs_font)
-        draw.text((x_offset + 2.2*font_size, y_offset), ">", (255,255,255), font=play_icon)
-        draw.text((w - x_offset - 3*font_size, h - y_offset - font_size), "SP", (255,255,255), font=vhs_font)
-        draw.text((w - x_offset - 3*font_size, y_offset), "--:--", (255,255,255), font=vhs_font)
 
+    @staticmethod
+    def get_play_text_datetime(datetime):
         month = datetime.strftime("%h").upper()
         day = datetime.strftime("%0d")
         period = datetime.strftime("%p")
         hour = datetime.strftime("%0I")
         minute = datetime.strftime("%0M")
 
-        datetime_str = "{}:{} {}\n{}. {} {}".format(hour, minute, period, month, day, datetime.year)
+        return "{}:{} {}\n{}. {} {}".format(hour, minute, period, month, day, datetime.year)
+
 
-        draw.text((x_offset, h - y_offset - 2*font_size), datetime_str, (255,255,255), font=vhs_font)
+
+    @profiled
+    def apply_play_text(self, intensity=CONFIGS.DEFAULTS["play_text"]["intensity"], datetime=None, hour=None, inplace=True):
+        get_params("play_text", {"intensity": intensity, "datetime": datetime, "hour": hour})
+        if isinstance(inplace, bool) == False:
+            raise TypeError("Parameter 'inplace' must be a boolean.")
+
+        if self.__record("play_text", inplace, intensity=intensity, datetime=datetime, hour=hour) == True:
+            return
+
+        if datetime == None:
+            datetime = utils.get_random_datetime(1980, 1990, hour, rng=self.rng)
+
+        font_size, texts, datetime_xy = VHS.get_play_text_layout(self.size, intensity)
+
+        #static texts are cached sprites, only the datetime may need a fresh render. every sprite is pasted only on its own box
+        texts = texts + [(datetime_xy, VHS.get_play_text_datetime(datetime), "vhs")]
+
+        resulted_img = self.modified_img.copy()
+        for xy, text, font_name in texts:
+            x, y, sprite = assets.render_text(xy, text, font_name, font_size)
+            resulted_img.paste((255,255,255), (x, y), Image.fromarray(sprite, "L"))
 
         if inplace == False:
             return resulted_img
@@ -360,29 +800,328 @@ class VHS(Filter):
 
 
 
-    def apply_all_effects(self, inplace=True, play_text=False, wave_warp=False):
+    @staticmethod
+    def resolve_graph(graph, size):
+        #returns the effects of 'graph' as nodes with the parameters their runners take on an image of 'size': offsets,
+        #iterations, blur radii, masks profiles and texts layouts are derived here once (a Preset keeps them per size)
+        if isinstance(graph, EffectGraph) == False:
+            raise TypeError("Parameter 'graph' must be an EffectGraph object.")
+        if isinstance(size, tuple) == False:
+            raise TypeError("Parameter 'size' must be a tuple.")
+
+        resolve = {
+            "noise_lines": VHS.__resolve_noise_lines,
+            "color_glitch": VHS.__resolve_color_glitch,
+            "horizontal_lines": VHS.__resolve_horizontal_lines,
+            "film_grain": VHS.__resolve_film_grain,
+            "play_text": VHS.__resolve_play_text,
+            "wave_warp": VHS.__resolve_wave_warp
+        }
+        effects = []
+        for node in graph.nodes:
+            #validated as the apply_* methods do, graphs saved before a parameter was added get its default
+            params = resolve[node.name](size, **get_params(node.name, node.params))
+            effects.append(EffectNode(node.name, params))
+            if node.name == "color_glitch" and params["crop"] == True: #the next effects run on the cropped image
+                size = (size[0] - 2*params["offset"], size[1] - 2*params["offset"])
+        return tuple(effects)
+
+    @staticmethod
+    def __resolve_noise_lines(size, intensity, blur, bright, img_id):
+        p_threshold, iterations, blur, bright = VHS.get_noise_lines_params(intensity, blur, bright)
+        return {"img_id": img_id, "p_threshold": p_threshold, "iterations": iterations, "blur": blur, "bright": bright}
+
+    @staticmethod
+    def __resolve_color_glitch(size, intensity, crop):
+        return {"offset": VHS.get_color_glitch_offset(size[1], intensity), "crop": crop}
+
+    @staticmethod
+    def __resolve_horizontal_lines(size, intensity, blur):
+        return {"lines_profile": VHS.generate_horizontal_lines_profile(size[1], intensity, blur)[:, None]}
+
+    @staticmethod
+    def __resolve_film_grain(size, intensity, blur, pooled):
+        #'level' is the derived (intensity, blur), raw values are kept to build the pool tiles
+        level = VHS.__get_film_grain_params(intensity, blur)
+        return {"intensity": intensity, "blur": blur, "pooled": pooled, "level": level, "opacity": level[0]/2}
+
+    @staticmethod
+    def __resolve_play_text(size, intensity, datetime, hour):
+        font_size, texts, datetime_xy = VHS.get_play_text_layout(size, intensity)
+        return {"datetime": datetime, "hour": hour, "font_size": font_size, "texts": texts, "datetime_xy": datetime_xy}
+
+    @staticmethod
+    def __resolve_wave_warp(size, intensity, row, mode, zones):
+        if row != None and row >= size[1]:
+            raise ValueError("Parameter 'row' must be lesser than image's height.")
+        return {"row": row, "zones": zones, "mode": mode, "size": VHS.get_wave_warp_size(size[1], intensity), "amplitude": VHS.get_wave_warp_amplitude(size[0], intensity)}
+
+
+
+    @profiled
+    def __run_noise_lines(self, buf, img_id, p_threshold, iterations, blur, bright):
+        size = (buf.shape[1], buf.shape[0])
+        if img_id != None:
+            noise_lines_mask = assets.NOISE_LINES.resized(img_id, size)
+        else:
+            noise_lines_mask = np.asarray(VHS.__draw_noise_lines(size, p_threshold, iterations, blur, bright, self.rng))
+        return kernels.composite_white(buf, noise_lines_mask)
+
+    @profiled
+    def __run_color_glitch(self, buf, offset, crop):
+        return kernels.channel_offset(buf, offset, crop)
+
+    @profiled
+    def __run_horizontal_lines(self, buf, lines_profile):
+        return kernels.soft_light(buf, lines_profile, CONFIGS.DEFAULTS["horizontal_lines"]["bright"])
+
+    @profiled
+    def __run_film_grain(self, buf, intensity, blur, pooled, level, opacity):
+        size = (buf.shape[1], buf.shape[0])
+        if pooled == True:
+            grain_mask = assets.GRAIN_POOL.layer(size, VHS.__get_film_grain_tiles(intensity, blur, level), self.rng)
+        else:
+            grain_mask = np.asarray(VHS.__get_film_grain_noise(size, level[0], self.rng).filter(ImageFilter.GaussianBlur(level[1])))
+        return kernels.overlay(buf, grain_mask, opacity)
+
+    @profiled
+    def __run_play_text(self, buf, datetime, hour, font_size, texts, datetime_xy):
+        if datetime == None:
+            datetime = utils.get_random_datetime(1980, 1990, hour, rng=self.rng)
+        for xy, text, font_name in texts + [(datetime_xy, VHS.get_play_text_datetime(datetime), "vhs")]:
+            x, y, sprite = assets.render_text(xy, text, font_name, font_size)
+            kernels.composite_white_at(buf, sprite, x, y)
+        return buf
+
+    @profiled
+    def __run_wave_warp(self, buf, row, zones, mode, size, amplitude):
+        h, w = buf.shape[:2]
+        rows = [row] if row != None else [int(self.rng.integers(0, h + 1)) for i in range(zones)]
+        row_map, offsets = VHS.get_wave_warp_map((w, h), rows, size, amplitude, mode, self.rng)
+        return kernels.warp_rows(buf, row_map, offsets, out=buf)
+
+
+
+    @profiled
+    def __run_graph(self, src, effects):
+        #runs every resolved effect (see resolve_graph), in order, on a single float32 working buffer cast from the 'src'
+        #array. returns the (h, w, 3) uint8 result array
+        run = {
+            "noise_lines": self.__run_noise_lines,
+            "color_glitch": self.__run_color_glitch,
+            "horizontal_lines": self.__run_horizontal_lines,
+            "film_grain": self.__run_film_grain,
+            "play_text": self.__run_play_text,
+            "wave_warp": self.__run_wave_warp
+        }
+        if self.__threads > 1: #same result, on row bands
+            out = np.empty(src.shape[:2] + (3,), dtype=np.uint8)
+            return self.__render_strips(src, effects, out, CONFIGS.DEFAULTS["strips"]["height"], self.__threads)
+
+        buf = kernels.to_buffer(src)
+        for node in effects:
+            buf = run[node.name](buf, **node.params)
+        return kernels.to_array(buf)
+
+
+
+    @profiled
+    def __run_noise_lines_strips(self, view, strip_height, map_bands, img_id, p_threshold, iterations, blur, bright):
+        #only the rows drawn on are kept, each strip blurs them with a halo of rows around it
+        h, w = view.shape[:2]
+        if img_id != None:
+            noise_lines_mask = assets.NOISE_LINES.resized(img_id, (w, h))
+        else:
+            rows, noise_arr = kernels.draw_sparse_noise_lines((h, w), iterations, p_threshold, self.rng)
+
+        def composite_strip(a, b):
+            if img_id != None:
+                mask = noise_lines_mask[a:b]
+            else:
+                mask = kernels.get_sparse_noise_lines_mask(rows, noise_arr, h, a, b, blur, bright)
+            if mask is not None:
+                buf = view[a:b].astype(np.float32)
+                view[a:b] = kernels.composite_white(buf, mask)
+
+        map_bands(composite_strip, VHS.get_strips(h, strip_height))
+        return view
+
+    @profiled
+    def __run_color_glitch_strips(self, view, strip_height, map_bands, offset, crop):
+        #every channel is shifted in place on its own plane, strips are copied in the order that reads rows not written yet
+        h, w = view.shape[:2]
+        if offset <= 0:
+            return view
+
+        if crop == True:
+            resulted_view = view[:h - 2*offset, :w - 2*offset]
+            def shift_channel(channel, dy, dx):
+                #top down, output rows are copied from the same or lower rows
+                for a, b in VHS.get_strips(h - 2*offset, strip_height):
+                    resulted_view[a:b, :, channel] = view[a + dy:b + dy, dx:dx + w - 2*offset, channel]
+            map_bands(shift_channel, [(0, 2*offset, 0), (1, offset, offset), (2, 0, 2*offset)])
+            return resulted_view
+
+        def shift_red():
+            #top down, reading 'offset' rows below. the last strips wrap to the first rows, which are kept before
+            head = view[:offset, :, 0].copy()
+            for a, b in VHS.get_strips(h, strip_height):
+                band = np.concatenate((view[min(a + offset, h):min(b + offset, h), :, 0], head[max(a + offset - h, 0):max(b + offset - h, 0)]))
+                kernels.roll_into(view[a:b, :, 0], band, 0, -offset)
+
+        def shift_blue():
+            #bottom up, reading 'offset' rows above. the first strips wrap to the last rows, which are kept before
+            tail = view[h - offset:, :, 2].copy()
+            for a, b in reversed(VHS.get_strips(h, strip_height)):
+                band = np.concatenate((tail[min(a - offset, 0) + offset:min(b - offset, 0) + offset], view[max(a - offset, 0):max(b - offset, 0), :, 2]))
+                kernels.roll_into(view[a:b, :, 2], band, 0, offset)
+
+        map_bands(lambda shift: shift(), [(shift_red,), (shift_blue,)])
+        return view
+
+    @profiled
+    def __run_horizontal_lines_strips(self, view, strip_height, map_bands, lines_profile):
+        def blend_strip(a, b):
+            buf = view[a:b].astype(np.float32)
+            view[a:b] = kernels.soft_light(buf, lines_profile[a:b], CONFIGS.DEFAULTS["horizontal_lines"]["bright"])
+
+        map_bands(blend_strip, VHS.get_strips(view.shape[0], strip_height))
+        return view
+
+    @profiled
+    def __run_film_grain_strips(self, view, strip_height, map_bands, intensity, blur, pooled, level, opacity):
+        h, w = view.shape[:2]
+        if pooled == True:
+            tile = assets.GRAIN_POOL.sample(VHS.__get_film_grain_tiles(intensity, blur, level), self.rng)
+            def blend_strip(a, b):
+                buf = view[a:b].astype(np.float32)
+                view[a:b] = kernels.overlay(buf, assets.GrainPool.tile(tile, (w, b - a), start_row=a), opacity)
+            map_bands(blend_strip, VHS.get_strips(h, strip_height))
+            return view
+
+        #fresh grain is drawn row by row on this thread, as generate_film_grain draws it, and blurred on strips with a halo of rows
+        intensity, blur = level
+        halo = int(blur*3) + 2
+
+        def draw_strips():
+            noise_arr = np.empty((0, w), dtype=np.uint8)
+            noise_start = 0 #image row of the first row of 'noise_arr'
+            for a, b in VHS.get_strips(h, strip_height):
+                src_start, src_end = max(a - halo, 0), min(b + halo, h)
+                drawn_end = noise_start + len(noise_arr)
+                if src_end > drawn_end:
+                    new_arr = np.uint8(self.rng.normal(0, CONFIGS.DEFAULTS["film_grain"]["gaussian_std"], (src_end - drawn_end)*w).reshape(-1, w))
+                    noise_arr = np.concatenate((noise_arr[src_start - noise_start:], new_arr))
+                    noise_start = src_start
+                yield a, b, src_start, noise_arr[src_start - noise_start:src_end - noise_start]
+
+        def blend_strip(a, b, src_start, noise_arr):
+            noise_img = Image.fromarray(noise_arr)
+            noise_img = Image.blend(Image.new("L", noise_img.size, 119), noise_img, intensity)
+            grain_mask = np.asarray(noise_img.filter(ImageFilter.GaussianBlur(blur)))[a - src_start:b - src_start]
+
+            buf = view[a:b].astype(np.float32)
+            view[a:b] = kernels.overlay(buf, grain_mask, opacity)
+
+        map_bands(blend_strip, draw_strips())
+        return view
+
+    @profiled
+    def __run_play_text_strips(self, view, strip_height, map_bands, datetime, hour, font_size, texts, datetime_xy):
+        #only the rows under every sprite are blended
+        h, w = view.shape[:2]
+        if datetime == None:
+            datetime = utils.get_random_datetime(1980, 1990, hour, rng=self.rng)
+        for xy, text, font_name in texts + [(datetime_xy, VHS.get_play_text_datetime(datetime), "vhs")]:
+            x, y, sprite = assets.render_text(xy, text, font_name, font_size)
+            a, b = max(y, 0), min(y + sprite.shape[0], h)
+            if a < b:
+                buf = view[a:b].astype(np.float32)
+                view[a:b] = kernels.composite_white_at(buf, sprite, x, y - a)
+        return view
+
+    @profiled
+    def __run_wave_warp_strips(self, view, strip_height, map_bands, row, zones, mode, size, amplitude):
+        #only the warped rows are gathered, without a float32 buffer
+        h, w = view.shape[:2]
+        rows = [row] if row != None else [int(self.rng.integers(0, h + 1)) for i in range(zones)]
+        row_map, offsets = VHS.get_wave_warp_map((w, h), rows, size, amplitude, mode, self.rng)
+        return kernels.warp_rows(view, row_map, offsets, out=view)
+
+
+
+    @staticmethod
+    def get_all_effects_graph(play_text=False, wave_warp=False):
+        #returns the graph of effects (with default parameters) run by apply_all_effects
+        graph = EffectGraph()
+        graph.add("noise_lines", {"intensity": CONFIGS.DEFAULTS["noise_lines"]["intensity"], "blur": CONFIGS.DEFAULTS["noise_lines"]["blur"], "bright": CONFIGS.DEFAULTS["noise_lines"]["bright"], "img_id": None})
+        graph.add("color_glitch", {"intensity": CONFIGS.DEFAULTS["color_glitch"]["intensity"], "crop": True})
+        graph.add("horizontal_lines", {"intensity": CONFIGS.DEFAULTS["horizontal_lines"]["intensity"], "blur": CONFIGS.DEFAULTS["horizontal_lines"]["blur"]})
+        graph.add("film_grain", {"intensity": CONFIGS.DEFAULTS["film_grain"]["intensity"], "blur": CONFIGS.DEFAULTS["film_grain"]["blur"], "pooled": CONFIGS.DEFAULTS["film_grain"]["pooled"]})
+        if play_text == True:
+            graph.add("play_text", {"intensity": CONFIGS.DEFAULTS["play_text"]["intensity"], "datetime": None, "hour": None})
+        if wave_warp == True:
+            graph.add("wave_warp", {"intensity": CONFIGS.DEFAULTS["wave_warp"]["intensity"], "row": None, "mode": CONFIGS.DEFAULTS["wave_warp"]["mode"], "zones": CONFIGS.DEFAULTS["wave_warp"]["zones"]})
+        return graph
+
+
+
+    @profiled
+    def apply_all_effects(self, inplace=True, play_text=False, wave_warp=False, engine=CONFIGS.DEFAULTS["all_effects"]["engine"], threads=None):
         if isinstance(inplace, bool) == False:
             raise TypeError("Parameter 'inplace' must be a boolean.")
         if isinstance(play_text, bool) == False:
             raise TypeError("Parameter 'play_text' must be a boolean.")
         if isinstance(wave_warp, bool) == False:
             raise TypeError("Parameter 'wave_warp' must be a boolean.")
-
-        undo_times = 4
-
-        self.apply_noise_lines()
-        self.apply_color_glitch()
-        self.apply_horizontal_lines()
-        self.apply_film_grain()
-
-        if play_text == True:
-            undo_times+=1
-            self.apply_play_text()
-        if wave_warp == True:
-            self.apply_wave_warp()
-            undo_times+=1
+        if isinstance(threads, int) == False and threads != None:
+            raise TypeError("Parameter 'threads' must be an integer.")
+        if engine not in CONFIGS.ENGINES:
+            raise ValueError("Invalid engine '{}'. Engine must be one of {}.".format(engine, CONFIGS.ENGINES))
+        if threads != None and threads < 1:
+            raise ValueError("Parameter 'threads' must be greater than 0.")
+
+        filter_threads, self.__threads = self.__threads, threads or self.__threads #runs with 'threads' instead of the threads of the filter
+        try:
+            return self.__apply_all_effects(inplace, play_text, wave_warp, engine)
+        finally:
+            self.__threads = filter_threads
+
+
+
+    def __apply_all_effects(self, inplace, play_text, wave_warp, engine):
+        graph = VHS.get_all_effects_graph(play_text, wave_warp)
+        if self.__lazy == True and inplace == True:
+            self.__graph.extend(graph)
+            return
+        if engine == "fused":
+            return self.apply_graph(graph, inplace=inplace)
+        if engine == "strips":
+            resulted_arr = self.render_strips(graph=graph)
+            if inplace == False:
+                return Image.fromarray(resulted_arr, "RGB")
+            self.array = resulted_arr
+            return
+
+        previous_img = self.modified_img #renders pending effects of lazy filters
+        lazy, self.__lazy = self.__lazy, False #every step runs right away, to be undone when not inplace
+        try:
+            undo_times = 4
+            self.apply_noise_lines()
+            self.apply_color_glitch()
+            self.apply_horizontal_lines()
+            self.apply_film_grain()
+
+            if play_text == True:
+                undo_times+=1
+                self.apply_play_text()
+            if wave_warp == True:
+                self.apply_wave_warp()
+                undo_times+=1
+        finally:
+            self.__lazy = lazy
 
         if inplace==False:
             resulted_img = self.modified_img
-            self.undo(undo_times)
+            self.restore(previous_img, undo_times) #only the entries of the steps are dropped, edits made before are kept
             return resulted_img
@@ -0,0 +1,323 @@
+import io
+import math
+import sys
+import threading
+from collections import namedtuple, deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from PIL import Image
+from retrofy.configs import Loader_Configs
+import retrofy.utils as utils
+
+CONFIGS = Loader_Configs()
+
+LoadResult = namedtuple("LoadResult", ["src", "img", "error"])
+
+class Loader():
+
+    def __init__(self, timeout=CONFIGS.DEFAULTS["timeout"], retries=CONFIGS.DEFAULTS["retries"], backoff=CONFIGS.DEFAULTS["backoff"], pool_size=CONFIGS.DEFAULTS["pool_size"]):
+        if isinstance(timeout, (int, float, tuple)) == False:
+            raise TypeError("Parameter 'timeout' must be a float or a (connect, read) tuple.")
+        if isinstance(retries, int) == False:
+            raise TypeError("Parameter 'retries' must be an integer.")
+        if isinstance(backoff, (int, float)) == False:
+            raise TypeError("Parameter 'backoff' must be a float.")
+        if isinstance(pool_size, int) == False:
+            raise TypeError("Parameter 'pool_size' must be an integer.")
+
+        if retries < 0 or backoff < 0:
+            raise ValueError("Parameters 'retries' and 'backoff' must not be negative.")
+        if pool_size < 1:
+            raise ValueError("Parameter 'pool_size' must be greater than 0.")
+
+        self.__timeout = timeout
+        self.__retries = retries
+        self.__backoff = backoff
+        self.__pool_size = pool_size
+        self.__lock = threading.Lock()
+        self.__session = None
+
+
+
+    @property
+    def timeout(self):
+        return self.__timeout
+
+    @property
+    def retries(self):
+        return self.__retries
+
+    @property
+    def pool_size(self):
+        return self.__pool_size
+
+
+
+    def __get_session(self):
+        #one session for every download, so connections are kept alive and reused. created on first use
+        session = self.__session
+        if session != None:
+            return session
+
+        with self.__lock:
+            if self.__session == None:
+                #requests takes longer to import than the rest of the package, so it is only imported for URLs
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+                retry = Retry(total=self.__retries, backoff_factor=self.__backoff, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=frozenset(["GET"]))
+                adapter = HTTPAdapter(pool_connections=self.__pool_size, pool_maxsize=self.__pool_size, max_retries=retry)
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self.__session = session
+            return self.__session
+
+
+
+    def fetch(self, url):
+        #returns the downloaded bytes of 'url'
+        if utils.is_url(url) == False:
+            raise ValueError("Invalid URL '{}'.".format(url))
+
+        session = self.__get_session()
+        import requests #already imported by the session
+        try:
+            response = session.get(url, timeout=self.__timeout)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            raise ValueError("Could not download image from URL '{}'.".format(url)) from e
+        return response.content
+
+
+
+    def open_image(self, src, max_size=None):
+        #returns an RGB Pillow Image object from a path, an URL, encoded bytes or a binary file object, fitting in 'max_size' if given
+        if isinstance(src, (str, Path, bytes, bytearray, memoryview)) == False and is_file_object(src) == False:
+            raise TypeError("Parameter 'src' must be a string, a Path object, bytes or a binary file object.")
+        if isinstance(max_size, tuple) == False and max_size != None:
+            raise TypeError("Parameter 'max_size' must be a tuple.")
+
+        if isinstance(src, (bytes, bytearray, memoryview)) == True or is_file_object(src) == True:
+            try:
+                return decode_image(io.BytesIO(src) if is_file_object(src) == False else src, max_size)
+            except (OSError, ValueError) as e:
+                raise ValueError("Could not read image from {}.".format("bytes" if is_file_object(src) == False else "file object")) from e
+
+        if utils.is_url(src) == True:
+            data = io.BytesIO(self.fetch(src))
+            try:
+                return decode_image(data, max_size)
+            except (OSError, ValueError) as e:
+                raise ValueError("Could not read image downloaded from URL '{}'.".format(src)) from e
+
+        try:
+            return decode_image(src, max_size)
+        except (OSError, ValueError) as e:
+            raise ValueError("Could not access image on file '{}'.".format(src)) from e
+
+
+
+    def prefetch(self, sources, workers=CONFIGS.DEFAULTS["prefetch"]["workers"], look_ahead=None, max_size=None):
+        #loads sources (paths, URLs or Pillow Image objects) on a thread pool and yields a LoadResult for each one, in order.
+        #at most 'look_ahead' sources are loaded ahead of the consumer, so downloads go on while earlier images are processed.
+        #with 'max_size', images are also reduced while they are decoded on the pool
+        if isinstance(workers, int) == False:
+            raise TypeError("Parameter 'workers' must be an integer.")
+        if isinstance(look_ahead, int) == False and look_ahead != None:
+            raise TypeError("Parameter 'look_ahead' must be an integer.")
+        if isinstance(max_size, tuple) == False and max_size != None:
+            raise TypeError("Parameter 'max_size' must be a tuple.")
+
+        if workers < 1:
+            raise ValueError("Parameter 'workers' must be greater than 0.")
+        if look_ahead == None:
+            look_ahead = workers * CONFIGS.DEFAULTS["prefetch"]["look_ahead_per_worker"]
+        if look_ahead < 1:
+            raise ValueError("Parameter 'look_ahead' must be greater than 0.")
+
+        return self.__iter_prefetch(iter(sources), workers, look_ahead, max_size)
+
+
+
+    def __load(self, src, max_size):
+        try:
+            if isinstance(src, Image.Image) == True:
+                return LoadResult(src, src if max_size == None else get_thumbnail(src, max_size), None)
+            return LoadResult(src, self.open_image(src, max_size), None)
+        except Exception as e: #any error (as a decompression bomb) only fails its own source, not the whole prefetch
+            return LoadResult(src, None, e)
+
+
+
+    def __iter_prefetch(self, sources, workers, look_ahead, max_size):
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = deque()
+            try:
+                for src in sources:
+                    futures.append(executor.submit(self.__load, src, max_size))
+                    if len(futures) >= look_ahead:
+                        yield futures.popleft().result()
+                while len(futures) > 0:
+                    yield futures.popleft().result()
+            finally:
+                for future in futures: #consumer stopped early
+                    future.cancel()
+
+
+
+    def close(self):
+        with self.__lock:
+            if self.__session != None:
+                self.__session.close()
+                self.__session = None
+
+
+
+LOADER = Loader() #process wide loader, used by every filter
+
+
+
+def is_file_object(obj):
+    return callable(getattr(obj, "read", None))
+
+
+
+def is_array(obj):
+    #numpy is only imported by the effects, an object can only be an array if numpy was already imported
+    numpy = sys.modules.get("numpy")
+    return numpy != None and isinstance(obj, numpy.ndarray)
+
+
+
+def get_array_mode(arr):
+    #Pillow mode of an uint8 (h, w), (h, w, 3) or (h, w, 4) array, the layouts filters keep as arrays
+    if arr.dtype.name != "uint8" or arr.ndim not in [2, 3] or (arr.ndim == 3 and arr.shape[2] not in [3, 4]):
+        raise ValueError("Arrays must be uint8 with (height, width), (height, width, 3) or (height, width, 4) shape.")
+    return {2: "L", 3: "RGB", 4: "RGBA"}[arr.shape[2] if arr.ndim == 3 else 2]
+
+
+
+def array_to_image(arr):
+    #Pillow image of an array. Pillow maps 'L' and 'RGBA' pixels straight from a contiguous buffer, so those images are
+    #read only views sharing the array memory. it keeps RGB pixels padded to 4 bytes, so RGB arrays are copied once
+    mode = get_array_mode(arr)
+    if mode != "RGB" and arr.flags.c_contiguous == True:
+        return Image.frombuffer(mode, (arr.shape[1], arr.shape[0]), arr, "raw", mode, 0, 1)
+    return Image.fromarray(arr, mode)
+
+
+
+def expand_gray(arr):
+    #effects draw in color, so filters use gray (h, w) arrays as read only (h, w, 3) views repeating the gray channel
+    import numpy as np
+
+    return np.broadcast_to(arr[:, :, None], arr.shape + (3,))
+
+
+
+def image_to_array(img):
+    #read only uint8 array of an image, in one of the array layouts ('L', 'RGB' or 'RGBA'). images of other modes are converted
+    import numpy as np
+
+    if img.mode not in ["L", "RGB", "RGBA"]:
+        img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+    arr = np.asarray(img)
+    arr.flags.writeable = False
+    return arr
+
+
+
+def decode_image(fp, max_size=None):
+    #opens an image file (path or file object) as an RGB image fitting in 'max_size'.
+    #the image is thumbnailed before it is decoded, so JPEGs are decoded straight to a reduced scale and other formats
+    #are reduced while resizing. RGB images are not converted again
+    img = Image.open(fp)
+    if img.mode in ["1", "P", "PA"]: #these modes are only resized with nearest neighbour
+        img = img.convert("RGB")
+    if max_size != None:
+        size = get_thumbnail_size(img.size, max_size)
+        if size != None:
+            img.draft("RGB", size) #JPEGs are decoded on the smallest scale (1/2, 1/4 or 1/8) still bigger than 'size'
+            img.thumbnail(max_size)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    else:
+        img.load()
+    return img
+
+
+
+def get_format(format):
+    #encoder name of a format or file suffix, as 'JPG' or '.jpg'. returns None if there is no encoder for it
+    format = format.lower().lstrip(".")
+    format = "jpeg" if format == "jpg" else format
+    return format if format in CONFIGS.ENCODERS else None
+
+
+
+def drop_opaque_alpha(img):
+    #effects keep images opaque, but some return RGBA ones. an opaque alpha is dropped, so any encoder can be used
+    if img.mode == "RGBA" and img.getchannel("A").getextrema() == (255, 255):
+        return img.convert("RGB")
+    return img
+
+
+
+def encode_image(img, fp, format, quality=None, **options):
+    #writes 'img' on 'fp' (path or binary file object) with the encoder of 'format' ('png', 'jpeg' or 'webp') and its
+    #default options, overridden by 'quality' (jpeg and webp only, 1 to 100) and Pillow 'options' (e.g. compress_level or method)
+    if isinstance(img, Image.Image) == False:
+        raise TypeError("Parameter 'img' must be a Pillow Image object.")
+    if isinstance(format, str) == False:
+        raise TypeError("Parameter 'format' must be a string.")
+    if isinstance(quality, int) == False and quality != None:
+        raise TypeError("Parameter 'quality' must be an integer.")
+
+    encoder = get_format(format)
+    if encoder == None:
+        raise ValueError("Invalid format '{}'. Format must be one of {}.".format(format, list(CONFIGS.ENCODERS)))
+    if quality != None and (quality < 1 or quality > 100):
+        raise ValueError("Parameter 'quality' must be between 1 and 100.")
+
+    img = drop_opaque_alpha(img)
+    if img.mode not in ["RGB", "L"] and encoder not in CONFIGS.ALPHA_FORMATS:
+        raise ValueError("Images with transparency must be encoded as one of {}.".format(CONFIGS.ALPHA_FORMATS))
+
+    pillow_format, defaults = CONFIGS.ENCODERS[encoder]
+    options = dict(defaults, **options)
+    if quality != None and encoder != "png":
+        options["quality"] = quality
+    img.save(fp, pillow_format, **options)
+
+
+
+def get_thumbnail_size(size, max_size):
+    #size of an image with 'size' fitted in 'max_size' keeping its aspect ratio, as Image.thumbnail does.
+    #returns None if it already fits
+    w, h = size
+    x, y = math.floor(max_size[0]), math.floor(max_size[1])
+    if x >= w and y >= h:
+        return None
+
+    def round_aspect(number, key):
+        return max(min(math.floor(number), math.ceil(number), key=key), 1)
+
+    aspect = w / h
+    if x / y >= aspect:
+        x = round_aspect(y * aspect, key=lambda n: abs(aspect - n / y))
+    else:
+        y = round_aspect(x / aspect, key=lambda n: 0 if n == 0 else abs(aspect - x / n))
+    return x, y
+
+
+
+def get_thumbnail(img, max_size):
+    #same as Image.thumbnail, but returns a new image instead of changing 'img'
+    if isinstance(img, Image.Image) == False:
+        raise TypeError("Parameter 'img' must be a Pillow Image object.")
+
+    size = get_thumbnail_size(img.size, max_size)
+    if size == None:
+        return img
+    return img.resize(size, Image.BICUBIC, reducing_gap=2.0)
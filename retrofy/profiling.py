@@ -0,0 +1,273 @@
+import functools
+import json
+import threading
+import time
+import tracemalloc
+from collections import namedtuple, deque
+from PIL import Image
+from retrofy.configs import Profiling_Configs
+import retrofy.loader as loader
+
+CONFIGS = Profiling_Configs()
+
+#a profiled call: filter class, wall time, (width, height) of the image before and after it, bytes allocated (kept after
+#the call) and peak bytes allocated during it (both None without allocation tracking), nesting depth and exception name
+ProfileRecord = namedtuple("ProfileRecord", ["name", "filter", "seconds", "input_size", "output_size", "allocated_bytes", "peak_bytes", "depth", "error"])
+
+
+
+class Profiler():
+
+    #per filter profiler, set on Filter.profiler. keeps the records of every profiled call of the filter
+
+    def __init__(self, track_allocations=CONFIGS.DEFAULTS["track_allocations"], max_records=CONFIGS.DEFAULTS["max_records"]):
+        if isinstance(track_allocations, bool) == False:
+            raise TypeError("Parameter 'track_allocations' must be a boolean.")
+        if isinstance(max_records, int) == False:
+            raise TypeError("Parameter 'max_records' must be an integer.")
+
+        if max_records < 1:
+            raise ValueError("Parameter 'max_records' must be greater than 0.")
+
+        self.__track_allocations = track_allocations
+        self.__records = deque(maxlen=max_records)
+        self.__lock = threading.Lock()
+
+
+
+    @property
+    def track_allocations(self):
+        return self.__track_allocations
+
+    @property
+    def records(self):
+        with self.__lock:
+            return tuple(self.__records)
+
+
+
+    def add(self, record):
+        with self.__lock:
+            self.__records.append(record)
+
+
+
+    def report(self):
+        #structured report: every record as a dictionary and a summary per effect
+        records = self.records
+        return {"records": [record._asdict() for record in records], "effects": summarize(records)}
+
+
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.report(), **kwargs)
+
+
+
+    def clear(self):
+        with self.__lock:
+            self.__records.clear()
+
+
+
+class Profiling():
+
+    #process wide profiling: aggregate counters of every profiled call and the hooks called around them.
+    #when disabled, only filters with their own profiler are profiled
+
+    def __init__(self, enabled=CONFIGS.DEFAULTS["enabled"], track_allocations=CONFIGS.DEFAULTS["track_allocations"]):
+        if isinstance(enabled, bool) == False:
+            raise TypeError("Parameter 'enabled' must be a boolean.")
+        if isinstance(track_allocations, bool) == False:
+            raise TypeError("Parameter 'track_allocations' must be a boolean.")
+
+        self.__enabled = enabled
+        self.__track_allocations = track_allocations
+        self.__summary = {}
+        self.__pre_hooks = ()
+        self.__post_hooks = ()
+        self.__lock = threading.Lock()
+
+
+
+    @property
+    def enabled(self):
+        return self.__enabled
+
+    @enabled.setter
+    def enabled(self, enabled):
+        if isinstance(enabled, bool) == False:
+            raise TypeError("Parameter 'enabled' must be a boolean.")
+        self.__enabled = enabled
+
+    @property
+    def track_allocations(self):
+        return self.__track_allocations
+
+    @track_allocations.setter
+    def track_allocations(self, track_allocations):
+        if isinstance(track_allocations, bool) == False:
+            raise TypeError("Parameter 'track_allocations' must be a boolean.")
+        self.__track_allocations = track_allocations
+
+    @property
+    def pre_hooks(self):
+        return self.__pre_hooks
+
+    @property
+    def post_hooks(self):
+        return self.__post_hooks
+
+    @property
+    def stats(self):
+        #aggregate counters per effect, since the process started or the last reset
+        with self.__lock:
+            return {name: dict(counters) for name, counters in self.__summary.items()}
+
+
+
+    def add_hook(self, pre=None, post=None):
+        #'pre' is called as pre(filter, name, args, kwargs) before every profiled call and 'post' as post(filter, record)
+        #after it, also when it raises. hooks run on the thread of the call, so they should be quick (e.g. push to a queue)
+        if callable(pre) == False and pre != None:
+            raise TypeError("Parameter 'pre' must be callable.")
+        if callable(post) == False and post != None:
+            raise TypeError("Parameter 'post' must be callable.")
+
+        with self.__lock: #hooks are swapped as tuples, so calls in progress keep iterating over the old ones
+            if pre != None:
+                self.__pre_hooks = self.__pre_hooks + (pre,)
+            if post != None:
+                self.__post_hooks = self.__post_hooks + (post,)
+
+
+
+    def remove_hook(self, hook):
+        with self.__lock:
+            self.__pre_hooks = tuple(pre for pre in self.__pre_hooks if pre != hook)
+            self.__post_hooks = tuple(post for post in self.__post_hooks if post != hook)
+
+
+
+    def add(self, record):
+        with self.__lock:
+            add_to_summary(self.__summary, record)
+
+
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.stats, **kwargs)
+
+
+
+    def reset(self):
+        with self.__lock:
+            self.__summary = {}
+
+
+
+PROFILING = Profiling() #process wide profiling, aggregates every profiled call
+
+
+
+def add_to_summary(summary, record):
+    counters = summary.setdefault(record.name, {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0, "allocated_bytes": 0, "peak_bytes": 0})
+    counters["calls"] += 1
+    counters["errors"] += record.error != None
+    counters["total_ms"] += record.seconds * 1000
+    counters["max_ms"] = max(counters["max_ms"], record.seconds * 1000)
+    counters["mean_ms"] = counters["total_ms"] / counters["calls"]
+    if record.allocated_bytes != None:
+        counters["allocated_bytes"] += record.allocated_bytes
+        counters["peak_bytes"] = max(counters["peak_bytes"], record.peak_bytes)
+
+
+
+def summarize(records):
+    #calls, errors, total, mean and max time, allocated bytes and largest peak of every effect in 'records'
+    summary = {}
+    for record in records:
+        add_to_summary(summary, record)
+    return summary
+
+
+
+def get_size(obj):
+    if isinstance(obj, Image.Image) == True:
+        return obj.size
+    if loader.is_array(obj) == True and obj.ndim >= 2:
+        return (obj.shape[1], obj.shape[0])
+    return None
+
+
+
+CALLS = threading.local() #profiled calls in progress on each thread, to know their depth and peak allocations
+
+def profiled(method):
+    #profiles every call of a filter method. unprofiled calls only cost an attribute check
+    name = method.__name__.lstrip("_")
+
+    @functools.wraps(method)
+    def profiled_method(self, *args, **kwargs):
+        profiler = self.profiler
+        if profiler is None and PROFILING.enabled == False:
+            return method(self, *args, **kwargs)
+        return run_profiled(self, profiler, name, method, args, kwargs)
+
+    return profiled_method
+
+
+
+def run_profiled(filter_obj, profiler, name, method, args, kwargs):
+    from retrofy.filters.filter import Filter #imported here, filters import this module
+
+    stack = getattr(CALLS, "stack", None)
+    if stack == None:
+        stack = CALLS.stack = []
+    track_allocations = PROFILING.track_allocations or (profiler != None and profiler.track_allocations)
+
+    for pre in PROFILING.pre_hooks:
+        pre(filter_obj, name, args, kwargs)
+    #the working buffer of graph runners, or the last rendered image (pending lazy effects are not rendered, no image is made from arrays)
+    input_size = (get_size(args[0]) if len(args) > 0 else None) or Filter.size.fget(filter_obj)
+
+    started_tracing = False
+    call = {"start": 0, "peak": 0}
+    if track_allocations == True:
+        if tracemalloc.is_tracing() == False:
+            tracemalloc.start()
+            started_tracing = True
+        call["start"], peak = tracemalloc.get_traced_memory()
+        if len(stack) > 0: #the peak is reset for this call, callers keep the peak reached before it
+            stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+        tracemalloc.reset_peak()
+    stack.append(call)
+
+    result = error = None
+    start = time.perf_counter()
+    try:
+        result = method(filter_obj, *args, **kwargs)
+        return result
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        stack.pop()
+        allocated_bytes = peak_bytes = None
+        if track_allocations == True and tracemalloc.is_tracing() == True:
+            current, peak = tracemalloc.get_traced_memory()
+            allocated_bytes = current - call["start"]
+            peak_bytes = max(call["peak"], peak) - call["start"]
+            if len(stack) > 0:
+                stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+            if started_tracing == True:
+                tracemalloc.stop()
+
+        output_size = get_size(result) or Filter.size.fget(filter_obj)
+        record = ProfileRecord(name, type(filter_obj).__name__, seconds, input_size, output_size, allocated_bytes, peak_bytes, len(stack), error)
+        if profiler != None:
+            profiler.add(record)
+        PROFILING.add(record)
+        for post in PROFILING.post_hooks:
+            post(filter_obj, record)
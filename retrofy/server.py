@@ -0,0 +1,320 @@
+import os
+import json
+import signal
+import threading
+import multiprocessing
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from PIL import Image
+from retrofy.configs import Server_Configs, VHS_Configs
+from retrofy.filters.filter import DEFAULT_MAX_SIZE
+from retrofy.filters.vhs.vhs import VHS
+import retrofy.filters.vhs.assets as assets
+import retrofy.filters.vhs.batch as batch
+
+CONFIGS = Server_Configs()
+VHS_CONFIGS = VHS_Configs()
+
+class RenderServer():
+
+    #local HTTP rendering service. requests are rendered on a pool of worker processes started (and warmed up, so fonts,
+    #noise lines assets and masks are loaded once per worker) before the server accepts requests.
+    #at most 'workers + max_queue' requests are accepted at a time, the others are answered right away with 503
+
+    def __init__(self, host=CONFIGS.DEFAULTS["host"], port=CONFIGS.DEFAULTS["port"], workers=None, max_queue=None, max_size=DEFAULT_MAX_SIZE,
+                 timeout=CONFIGS.DEFAULTS["timeout"], warm_up_size=CONFIGS.DEFAULTS["warm_up_size"]):
+        if isinstance(host, str) == False:
+            raise TypeError("Parameter 'host' must be a string.")
+        if isinstance(port, int) == False:
+            raise TypeError("Parameter 'port' must be an integer.")
+        if isinstance(workers, int) == False and workers != None:
+            raise TypeError("Parameter 'workers' must be an integer.")
+        if isinstance(max_queue, int) == False and max_queue != None:
+            raise TypeError("Parameter 'max_queue' must be an integer.")
+        if isinstance(max_size, tuple) == False and max_size != None and max_size != DEFAULT_MAX_SIZE:
+            raise TypeError("Parameter 'max_size' must be a tuple.")
+        if isinstance(timeout, (int, float)) == False:
+            raise TypeError("Parameter 'timeout' must be a float.")
+        if isinstance(warm_up_size, tuple) == False and warm_up_size != None:
+            raise TypeError("Parameter 'warm_up_size' must be a tuple.")
+
+        if workers == None:
+            workers = os.cpu_count() or 1
+        if workers < 1:
+            raise ValueError("Parameter 'workers' must be greater than 0.")
+        if max_queue == None:
+            max_queue = workers * CONFIGS.DEFAULTS["queue_per_worker"]
+        if max_queue < 0:
+            raise ValueError("Parameter 'max_queue' must not be negative.")
+
+        self.__host = host
+        self.__port = port
+        self.__workers = workers
+        self.__max_queue = max_queue
+        self.__max_size = max_size
+        self.__timeout = timeout
+        self.__warm_up_size = warm_up_size
+        self.__slots = threading.BoundedSemaphore(workers + max_queue)
+        self.__lock = threading.Lock()
+        self.__counters = {"accepted": 0, "rejected": 0, "rendered": 0, "failed": 0, "timed_out": 0, "in_flight": 0}
+        self.__pool = None
+        self.__httpd = None
+        self.__serving = threading.Event()
+
+
+
+    @property
+    def address(self):
+        #(host, port) the server is bound to, the port is only known after start() when 'port' is 0
+        if self.__httpd != None:
+            return self.__httpd.server_address[:2]
+        return (self.__host, self.__port)
+
+    @property
+    def workers(self):
+        return self.__workers
+
+    @property
+    def max_queue(self):
+        return self.__max_queue
+
+    @property
+    def stats(self):
+        with self.__lock:
+            stats = dict(self.__counters)
+        stats.update({"workers": self.__workers, "max_queue": self.__max_queue})
+        return stats
+
+
+
+    def start(self):
+        #starts and warms up the workers, then binds the server. requests are only served by serve_forever()
+        if self.__pool != None:
+            return
+
+        context = multiprocessing.get_context()
+        ready = context.Queue()
+        self.__pool = context.Pool(self.__workers, initializer=init_worker, initargs=(ready, self.__warm_up_size))
+        try:
+            for i in range(self.__workers):
+                ready.get(timeout=self.__timeout)
+            self.__httpd = ThreadingHTTPServer((self.__host, self.__port), RenderHandler)
+        except BaseException:
+            self.__close()
+            raise
+        self.__httpd.daemon_threads = True
+        self.__httpd.render_server = self
+
+
+
+    def serve_forever(self):
+        self.start()
+        self.__serving.set()
+        try:
+            self.__httpd.serve_forever()
+        finally:
+            self.__serving.clear()
+            self.__close()
+
+
+
+    def shutdown(self):
+        #stops serve_forever (it must be called from another thread) and the workers
+        httpd = self.__httpd
+        if httpd != None and self.__serving.is_set() == True:
+            httpd.shutdown()
+        self.__close()
+
+
+
+    def __close(self):
+        with self.__lock:
+            httpd, self.__httpd = self.__httpd, None
+            pool, self.__pool = self.__pool, None
+        if httpd != None:
+            httpd.server_close()
+        if pool != None:
+            pool.terminate()
+            pool.join()
+
+
+
+    def __count(self, counter, increment=1):
+        with self.__lock:
+            self.__counters[counter] += increment
+
+
+
+    def render(self, data, params):
+        #renders on the pool. returns None when the queue is full, raises the worker exceptions.
+        #the slot is released when the task is done on the pool, not when the request stops waiting for it, so timed out
+        #tasks still count on the limit while they run and the pool queue never grows past it
+        if self.__slots.acquire(blocking=False) == False:
+            self.__count("rejected")
+            return None
+
+        self.__count("accepted")
+        self.__count("in_flight")
+        params = dict(params, max_size=self.__max_size)
+        try:
+            task = self.__pool.apply_async(render_request, (data, params), callback=self.__release, error_callback=self.__release)
+        except BaseException:
+            self.__release()
+            self.__count("failed")
+            raise
+
+        try:
+            result = task.get(self.__timeout)
+        except multiprocessing.TimeoutError:
+            self.__count("timed_out")
+            raise
+        except BaseException:
+            self.__count("failed")
+            raise
+        self.__count("rendered")
+        return result
+
+
+
+    def __release(self, result=None):
+        #called on the pool result thread when a task is done, with its result or exception
+        self.__count("in_flight", -1)
+        self.__slots.release()
+
+
+
+class RenderHandler(BaseHTTPRequestHandler):
+
+    #POST /render with the image bytes as body. query parameters: 'effects' (JSON of effects names or [name, kwargs] pairs,
+    #as in VHS.process_many), 'seed', 'format' (png, jpeg or webp) and 'quality'. GET /health returns the server stats
+
+    protocol_version = "HTTP/1.1" #keeps connections alive
+
+    def do_GET(self):
+        if urlsplit(self.path).path != "/health":
+            return self.send_error(404, "Not found.")
+        self.__send(200, "application/json", json.dumps(self.server.render_server.stats).encode())
+
+
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != "/render":
+            return self.send_error(404, "Not found.")
+
+        size = self.headers.get("Content-Length")
+        if size == None or size.isdigit() == False:
+            self.close_connection = True
+            return self.__send_message(411, "Content-Length is required.")
+        if int(size) > CONFIGS.DEFAULTS["max_body_bytes"]:
+            self.close_connection = True #the body is never read
+            return self.__send_message(413, "Image must have at most {} bytes.".format(CONFIGS.DEFAULTS["max_body_bytes"]))
+        data = self.rfile.read(int(size))
+
+        try:
+            params = get_params(parse_qs(url.query))
+        except (TypeError, ValueError) as e:
+            return self.__send_message(400, str(e))
+
+        try:
+            result = self.server.render_server.render(data, params)
+        except (TypeError, ValueError) as e:
+            return self.__send_message(400, str(e))
+        except multiprocessing.TimeoutError:
+            return self.__send_message(504, "Render timed out.")
+        except Exception as e:
+            return self.__send_message(500, "Could not render image: {}.".format(type(e).__name__))
+
+        if result == None:
+            return self.__send_message(503, "Server busy, retry later.", {"Retry-After": "1"})
+        self.__send(200, CONFIGS.FORMATS[params["format"]], result)
+
+
+
+    def __send_message(self, code, message, headers=None):
+        self.__send(code, "application/json", json.dumps({"error": message}).encode(), headers)
+
+
+
+    def __send(self, code, content_type, body, headers=None):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+
+    def log_message(self, format, *args):
+        pass #requests are counted on the server stats instead
+
+
+
+def get_params(query):
+    #validates the query parameters of a render request (in the server, so bad requests never reach the queue)
+    def get(key, default=None):
+        return query[key][-1] if key in query else default
+
+    effects = get("effects")
+    if effects != None:
+        try:
+            effects = json.loads(effects)
+        except ValueError as e:
+            raise ValueError("Could not parse 'effects' JSON.") from e
+        if isinstance(effects, list) == True: #JSON has no tuples
+            effects = [tuple(effect) if isinstance(effect, list) == True else effect for effect in effects]
+
+    seed = get("seed")
+    if seed != None:
+        if seed.isdigit() == False:
+            raise ValueError("Parameter 'seed' must be a non negative integer.")
+        seed = int(seed)
+
+    format = get("format", CONFIGS.DEFAULTS["format"]).lower().replace("jpg", "jpeg")
+    if format not in CONFIGS.FORMATS:
+        raise ValueError("Invalid format '{}'. Format must be one of {}.".format(format, list(CONFIGS.FORMATS)))
+
+    quality = get("quality", str(CONFIGS.DEFAULTS["quality"]))
+    if quality.isdigit() == False or int(quality) < 1 or int(quality) > 100:
+        raise ValueError("Parameter 'quality' must be an integer between 1 and 100.")
+
+    effects = batch.get_effects(VHS, effects)
+    for method_name, kwargs in effects:
+        if "threads" in kwargs: #requests run in parallel on the workers, a thread pool per request would oversubscribe them
+            raise ValueError("Parameter 'threads' can not be set on render requests.")
+        if "engine" in kwargs and kwargs["engine"] not in VHS_CONFIGS.ENGINES:
+            raise ValueError("Invalid engine '{}'. Engine must be one of {}.".format(kwargs["engine"], VHS_CONFIGS.ENGINES))
+
+    return {"effects": effects, "seed": seed, "format": format, "quality": int(quality)}
+
+
+
+def init_worker(ready, warm_up_size):
+    signal.signal(signal.SIGINT, signal.SIG_IGN) #the server process handles interruptions
+    if warm_up_size != None:
+        assets.NOISE_LINES.ids #loads the noise lines assets
+        warm_up = VHS(Image.new("RGB", warm_up_size, (127, 127, 127)), seed=0, history=False)
+        warm_up.apply_all_effects(play_text=True) #loads fonts, grain tiles and masks of the warm up size
+    ready.put(os.getpid())
+
+
+
+def render_request(data, params):
+    #decoded and encoded in memory, a bad image raises ValueError (400)
+    retrofier = VHS.from_bytes(data, seed=params["seed"], history=False, max_size=params["max_size"])
+    for method_name, kwargs in params["effects"]:
+        getattr(retrofier, method_name)(**kwargs)
+    return retrofier.to_bytes(params["format"], params["quality"])
+
+
+
+def serve(host=CONFIGS.DEFAULTS["host"], port=CONFIGS.DEFAULTS["port"], workers=None, max_queue=None, max_size=DEFAULT_MAX_SIZE, timeout=CONFIGS.DEFAULTS["timeout"]):
+    server = RenderServer(host, port, workers, max_queue, max_size, timeout)
+    server.start()
+    print("retrofy serving on http://{}:{} with {} workers".format(*server.address, server.workers), flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
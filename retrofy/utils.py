@@ -103,20 +103,32 @@ def translate_ranges(value, from_min, from_max, to_min, to_max):
     return to_min + (value_scaled * to_range)
 
 
-def get_random_datetime(start_year, end_year, hour=None):
+def get_rng(seed=None):
+    #returns a numpy Generator from a seed (int, SeedSequence or None) or the Generator itself
+    import numpy as np #utils are also used by the loader, which does not need numpy
+    if isinstance(seed, np.random.Generator) == True:
+        return seed
+    return np.random.default_rng(seed)
+
+
+def get_random_datetime(start_year, end_year, hour=None, rng=None):
     start_date = dt.date(int(start_year), 1, 1)
     end_date = dt.date(int(end_year), 12, 31)
 
     time_between_dates = end_date - start_date
     days_between_dates = time_between_dates.days
-    random_number_of_days = random.randrange(days_between_dates)
+    if rng == None:
+        random_number_of_days = random.randrange(days_between_dates)
+    else:
+        random_number_of_days = int(rng.integers(0, days_between_dates))
 
     random_date = start_date + dt.timedelta(days=random_number_of_days)
 
     if hour == None:
         time = datetime.now().time()
     else:
-        time = dt.time(hour, random.randint(0, 59))
+        minute = random.randint(0, 59) if rng == None else int(rng.integers(0, 60))
+        time = dt.time(hour, minute)
 
     random_datetime = datetime.combine(random_date, time)
 
@@ -8,5 +8,8 @@ setup(
     version = "0.1.0",
     packages=find_packages(),
     include_package_data=True,
-    install_requires=["numpy==1.15.4", "requests", "Pillow", "blend_modes"]
+    python_requires=">=3.9", #tracemalloc.reset_peak, used by the profiler
+    install_requires=["numpy>=1.17", "requests", "Pillow>=7.0"], #numpy Generator and SeedSequence, Pillow reducing_gap
+    extras_require={"blend_modes": ["blend_modes"]}, #only needed for blend="blend_modes"
+    entry_points={"console_scripts": ["retrofy=retrofy.cli:main"]}
 )
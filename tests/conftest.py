@@ -0,0 +1,12 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+
+@pytest.fixture
+def synthetic_img():
+    #random RGB noise, so every pixel of an effect is checked
+    def make(size=(200, 100), seed=0):
+        rng = np.random.default_rng(seed)
+        return Image.fromarray(rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8), "RGB")
+    return make
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from retrofy import VHS
+from retrofy.filters.vhs.assets import GrainPool
+
+LEVELS = [(0.35, 1.0), (0.5, 0.75)]
+
+
+def build_tiles(pool):
+    for intensity, blur in LEVELS:
+        pool.get((intensity, blur), lambda tile_size, rng: VHS.generate_film_grain_tile(tile_size, intensity, blur, rng))
+    return pool
+
+
+def test_saved_pool_loads_the_same_tiles(tmp_path):
+    pool = build_tiles(GrainPool(n_tiles=3, tile_size=32, seed=5))
+    pool.save(tmp_path / "grain.npz")
+
+    loaded = GrainPool(tmp_path / "grain.npz", n_tiles=3, tile_size=32, seed=5)
+    assert loaded.levels == pool.levels == sorted(LEVELS)
+    for level in LEVELS:
+        tiles = loaded.get(level, None) #loaded levels are never built again
+        assert tiles.shape == (3, 32, 32) and tiles.dtype == np.uint8 and tiles.flags.writeable == False
+        assert np.array_equal(tiles, pool.get(level, None))
+
+    with pytest.raises(ValueError):
+        GrainPool(tmp_path / "grain.npz", tile_size=16)
+    with pytest.raises(ValueError):
+        GrainPool(tmp_path / "missing.npz")
+
+
+def test_same_seed_picks_the_same_tiles():
+    pool = build_tiles(GrainPool(n_tiles=3, tile_size=32, seed=5))
+    for level in LEVELS: #tiles only depend on the pool seed and the level
+        assert np.array_equal(pool.get(level, None), build_tiles(GrainPool(n_tiles=3, tile_size=32, seed=5)).get(level, None))
+    assert np.array_equal(build_tiles(GrainPool(n_tiles=3, tile_size=32, seed=6)).get(LEVELS[0], None), pool.get(LEVELS[0], None)) == False
+
+    tiles = pool.get(LEVELS[0], None)
+    layers = [pool.layer((100, 50), tiles, np.random.default_rng(seed)) for seed in [1, 1, 2]]
+    assert layers[0].shape == (50, 100)
+    assert np.array_equal(layers[0], layers[1])
+    assert np.array_equal(layers[0], layers[2]) == False
@@ -0,0 +1,23 @@
+import os
+import pytest
+from PIL import Image
+from retrofy import VHS
+
+
+def test_same_stems_get_different_paths(tmp_path):
+    Image.new("RGB", (40, 30), (10, 20, 30)).save(tmp_path / "a.jpg")
+    Image.new("RGB", (40, 30), (200, 20, 30)).save(tmp_path / "a.png")
+    out_dir = tmp_path / "out"
+
+    results = list(VHS.process_many(tmp_path, out_dir, effects=["noise_lines"], workers=1, seed=0))
+
+    assert [result.error for result in results] == [None, None]
+    paths = sorted(result.path for result in results)
+    assert len(set(paths)) == 2
+    assert sorted(os.listdir(out_dir)) == ["a.png", "a_1.png"]
+
+
+@pytest.mark.parametrize("name", ["{foo}", "{stem", "{0}", ""])
+def test_invalid_name_fails_before_processing(tmp_path, name):
+    with pytest.raises(ValueError):
+        VHS.process_many([Image.new("RGB", (40, 30))], tmp_path / "out", name=name)
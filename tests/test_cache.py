@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+from retrofy.cache import MaskCache
+
+
+def builder(value, nbytes=100):
+    calls = []
+    def build():
+        calls.append(value)
+        return np.full(nbytes, value, dtype=np.uint8)
+    build.calls = calls
+    return build
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = MaskCache(max_bytes=300) #room for 3 entries of 100 bytes
+    for key in "abc":
+        cache.get(key, builder(ord(key)))
+    cache.get("a", builder(0)) #'b' is now the least recently used entry
+
+    cache.get("d", builder(ord("d")))
+    stats = cache.stats
+    assert stats["entries"] == 3 and stats["bytes"] == 300 and stats["evictions"] == 1
+
+    rebuild = builder(ord("b"))
+    cache.get("b", rebuild) #'b' was evicted, 'c' is evicted for it
+    assert rebuild.calls == [ord("b")]
+    keep = builder(0)
+    for key in "adb":
+        cache.get(key, keep)
+    assert keep.calls == []
+    assert cache.stats["evictions"] == 2
+
+
+def test_bytes_bound():
+    cache = MaskCache(max_bytes=250)
+    big = cache.get("big", builder(1, nbytes=300)) #bigger than the cache, returned but never kept
+    assert big.nbytes == 300 and cache.stats["entries"] == 0
+
+    cache.get("a", builder(1))
+    cache.get("b", builder(2))
+    cache.get("c", builder(3))
+    assert cache.stats["entries"] == 2 and cache.stats["bytes"] == 200
+
+    cache.max_bytes = 100 #shrinking the bound evicts right away
+    assert cache.stats["entries"] == 1 and cache.stats["bytes"] == 100
+    keep = builder(0)
+    assert cache.get("c", keep)[0] == 3 and keep.calls == []
+
+
+def test_hits_and_misses_are_counted():
+    cache = MaskCache(max_bytes=300)
+    build = builder(7)
+    first = cache.get("a", build)
+    assert cache.get("a", build) is first
+    cache.get("b", builder(8))
+    assert build.calls == [7]
+    assert first.flags.writeable == False
+    with pytest.raises(ValueError):
+        first[0] = 0 #cached arrays are shared
+
+    stats = cache.stats
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+    cache.reset_stats()
+    assert (cache.stats["hits"], cache.stats["misses"], cache.stats["evictions"]) == (0, 0, 0)
+    assert cache.stats["entries"] == 2
+
+
+def test_disabled_cache_builds_every_time():
+    cache = MaskCache(max_bytes=300)
+    cache.get("a", builder(1))
+    cache.enabled = False
+    assert cache.stats["entries"] == 0
+
+    build = builder(2)
+    cache.get("a", build)
+    cache.get("a", build)
+    assert build.calls == [2, 2] and cache.stats["entries"] == 0
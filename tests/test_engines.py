@@ -0,0 +1,56 @@
+import datetime as dt
+import numpy as np
+import pytest
+from retrofy import VHS, Preset
+
+
+def rgb(img):
+    #the steps engine keeps the opaque RGBA result of the color glitch
+    return np.asarray(img)[:, :, :3]
+
+
+@pytest.mark.parametrize("play_text", [False, True])
+@pytest.mark.parametrize("threads", [1, 3])
+def test_engines_give_the_same_image(synthetic_img, play_text, threads):
+    img = synthetic_img((517, 333), seed=3)
+    results = {}
+    for engine in ["steps", "fused", "strips"]:
+        retrofier = VHS(img, seed=5, threads=threads)
+        results[engine] = rgb(retrofier.apply_all_effects(inplace=False, engine=engine, play_text=play_text, wave_warp=True))
+
+    assert results["fused"].shape == (327, 511, 3)
+    assert np.array_equal(results["steps"], results["fused"])
+    assert np.array_equal(results["strips"], results["fused"])
+
+
+def test_threads_give_the_same_image(synthetic_img):
+    img = synthetic_img((517, 333), seed=3)
+    results = [rgb(VHS(img, seed=5, threads=threads).apply_all_effects(inplace=False, engine="fused", wave_warp=True)) for threads in [1, 2, 3, 8]]
+    for result in results[1:]:
+        assert np.array_equal(result, results[0])
+
+
+def test_lazy_and_strips_render_give_the_same_image(synthetic_img):
+    img = synthetic_img((517, 333), seed=3)
+    expected = rgb(VHS(img, seed=5).apply_all_effects(inplace=False, engine="fused", wave_warp=True))
+
+    lazy = VHS(img, seed=5, lazy=True)
+    lazy.apply_all_effects(wave_warp=True)
+    assert np.array_equal(rgb(lazy.render()), expected)
+
+    strips = VHS(img, seed=5, lazy=True)
+    strips.apply_all_effects(wave_warp=True)
+    assert np.array_equal(strips.render_strips(strip_height=7), expected)
+
+
+@pytest.mark.parametrize("engine", ["fused", "strips"])
+def test_presets_and_arrays_give_the_same_image(synthetic_img, engine):
+    img = synthetic_img((517, 333), seed=3)
+    preset = Preset(["noise_lines", "color_glitch", "horizontal_lines", "film_grain", ("play_text", {"datetime": dt.datetime(2020, 1, 2, 3, 4)}),
+                     ("wave_warp", {"mode": "bands", "zones": 2})])
+    expected = VHS(img, seed=7).apply_graph(preset.graph, inplace=False)
+
+    assert np.array_equal(rgb(VHS(img, seed=7).apply_preset(preset, inplace=False, engine=engine)), rgb(expected))
+    from_array = VHS(np.asarray(img), seed=7)
+    from_array.apply_preset(preset, engine=engine)
+    assert np.array_equal(from_array.array, rgb(expected))
@@ -0,0 +1,78 @@
+import io
+import numpy as np
+import pytest
+from PIL import Image
+from retrofy import VHS
+from retrofy.filters.filter import Filter
+
+
+def test_max_size_default_is_read_on_load(synthetic_img, monkeypatch):
+    img = synthetic_img((400, 200))
+    assert VHS(img).size == (400, 200)
+
+    monkeypatch.setattr(Filter, "MAX_SIZE", (100, 100))
+    assert VHS(img).size == (100, 50)
+    assert VHS(img).max_size == (100, 100)
+    assert VHS(img, max_size=None).size == (400, 200)
+
+
+def test_max_size_is_overridden_by_subclasses(synthetic_img):
+    class SmallVHS(VHS):
+        MAX_SIZE = (50, 50)
+
+    assert SmallVHS(synthetic_img((400, 200))).size == (50, 25)
+    assert SmallVHS(np.zeros((200, 400, 3), dtype=np.uint8)).size == (50, 25)
+
+
+def test_invalid_max_size(synthetic_img):
+    with pytest.raises(TypeError):
+        VHS(synthetic_img(), max_size=[100, 100])
+
+
+@pytest.mark.parametrize("engine", ["steps", "fused", "strips"])
+def test_all_effects_on_gray_arrays(engine):
+    gray = np.random.default_rng(0).integers(0, 256, (100, 200), dtype=np.uint8)
+    retrofier = VHS(gray, seed=0)
+    assert np.shares_memory(retrofier.array, gray) and retrofier.array.shape == (100, 200, 3)
+
+    retrofier.apply_all_effects(engine=engine, play_text=True, wave_warp=True)
+    expected = VHS(np.repeat(gray[:, :, None], 3, axis=2), seed=0).apply_all_effects(inplace=False, engine=engine, play_text=True, wave_warp=True)
+    assert np.array_equal(retrofier.array[:, :, :3], np.asarray(expected)[:, :, :3])
+
+    retrofier.array = gray
+    retrofier.apply_all_effects()
+    assert retrofier.size == (194, 94)
+
+
+def test_png_and_jpeg_round_trip_in_memory(synthetic_img):
+    img = synthetic_img((64, 32))
+    png = VHS(img).to_bytes("png")
+    assert png.startswith(b"\x89PNG")
+    assert np.array_equal(VHS.from_bytes(png).array, np.asarray(img)) #png is lossless
+
+    gradient = np.zeros((32, 64, 3), dtype=np.uint8)
+    gradient[:, :, 0] = np.arange(64) * 4
+    gradient[:, :, 1] = np.arange(32)[:, None] * 8
+    jpeg = VHS(gradient).to_bytes("jpeg", quality=95)
+    assert jpeg.startswith(b"\xff\xd8")
+    decoded = VHS.from_bytes(jpeg)
+    assert decoded.size == (64, 32) and decoded.render().mode == "RGB"
+    assert np.abs(decoded.array.astype(int) - gradient).max() < 8
+
+    with pytest.raises(TypeError):
+        VHS.from_bytes("not bytes")
+    with pytest.raises(ValueError):
+        VHS.from_bytes(b"not an image")
+
+
+def test_jpeg_drops_opaque_alpha_and_rejects_transparency():
+    rgba = np.random.default_rng(0).integers(0, 256, (32, 64, 4), dtype=np.uint8)
+    rgba[:, :, 3] = 255
+    decoded = Image.open(io.BytesIO(VHS(rgba).to_bytes("jpeg")))
+    assert decoded.format == "JPEG" and decoded.mode == "RGB" and decoded.size == (64, 32)
+
+    rgba[0, 0, 3] = 254
+    with pytest.raises(ValueError):
+        VHS(rgba).to_bytes("jpeg")
+    png = Image.open(io.BytesIO(VHS(rgba).to_bytes("png"))) #png keeps the transparency
+    assert png.mode == "RGBA" and np.array_equal(np.asarray(png), rgba)
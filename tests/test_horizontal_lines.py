@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from PIL import Image, ImageFilter
+from retrofy import VHS
+from retrofy.configs import VHS_Configs
+import retrofy.utils as utils
+
+CONFIGS = VHS_Configs()
+
+SIZES = [(64, 48), (705, 405), (517, 333), (1920, 1080)]
+INTENSITIES = [0, 0.25, 0.5, 0.75, 1]
+BLURS = [0, 0.3, 0.7, 1]
+
+
+def full_lines_mask(size, intensity, blur):
+    #the full (h, w) mask built row by row before the 1-D profile, kept as the reference
+    w, h = size
+    intensity = utils.clamp(intensity, CONFIGS.MINS["horizontal_lines"]["intensity"], CONFIGS.MAXS["horizontal_lines"]["intensity"])
+    height_divided = h/CONFIGS.DEFAULTS["horizontal_lines"]["height_divider"]
+    n_lines = utils.pctg_to_value(intensity, height_divided)
+    n_lines = utils.translate_ranges(n_lines, 0, height_divided, height_divided, 0)
+    blur = utils.pctg_to_value(utils.clamp(blur, 0, 1), CONFIGS.MAXS["horizontal_lines"]["blur"])
+    pixels_between = int(h/n_lines)
+
+    lines_arr = np.zeros((h, w), dtype=np.uint8)
+    for row in range(h):
+        if row % pixels_between == 0:
+            lines_arr[row, :] = 1
+    return Image.fromarray(lines_arr*255).filter(ImageFilter.GaussianBlur(blur))
+
+
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize("intensity", INTENSITIES)
+@pytest.mark.parametrize("blur", BLURS)
+def test_profile_matches_full_mask(size, intensity, blur):
+    expected = np.asarray(full_lines_mask(size, intensity, blur))
+    profile = VHS.generate_horizontal_lines_profile(size[1], intensity, blur)
+
+    assert np.array_equal(np.broadcast_to(profile[:, None], expected.shape), expected)
+    assert np.array_equal(np.asarray(VHS.generate_horizontal_lines(size, intensity, blur)), expected)
+
+
+@pytest.mark.parametrize("size", [(705, 405), (1920, 1080)])
+@pytest.mark.parametrize("intensity", [0.2, 0.5, 1])
+def test_apply_matches_full_mask_blend(synthetic_img, size, intensity):
+    blend_modes = pytest.importorskip("blend_modes")
+    img = synthetic_img(size)
+    #the blend of the full mask, as apply_horizontal_lines did it before the profile
+    img_arr = np.array(img.convert("RGBA")).astype(float)
+    lines_arr = np.array(full_lines_mask(size, intensity, 0.5).convert("RGBA")).astype(float)
+    expected = blend_modes.soft_light(img_arr, lines_arr, CONFIGS.DEFAULTS["horizontal_lines"]["bright"]).astype(np.uint8)[:, :, :3]
+
+    legacy = np.asarray(VHS(img).apply_horizontal_lines(intensity, 0.5, blend="blend_modes", inplace=False))[:, :, :3]
+    assert np.array_equal(legacy, expected)
+    #the native float32 kernels may round a value the other way
+    native = np.asarray(VHS(img).apply_horizontal_lines(intensity, 0.5, blend="native", inplace=False)).astype(int)
+    assert np.abs(native - expected).max() <= 1
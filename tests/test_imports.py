@@ -0,0 +1,10 @@
+import subprocess
+import sys
+import pytest
+
+
+@pytest.mark.parametrize("statement", ["import retrofy", "import retrofy.loader", "from retrofy.filters.filter import Filter", "import retrofy.profiling"])
+def test_light_imports_do_not_import_numpy(statement):
+    code = "import sys; {}; print('numpy' in sys.modules)".format(statement)
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "False"
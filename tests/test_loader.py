@@ -0,0 +1,105 @@
+import io
+import time
+import threading
+import pytest
+from PIL import Image
+from retrofy.loader import Loader
+
+
+def encode(img, format="PNG"):
+    data = io.BytesIO()
+    img.save(data, format)
+    return data.getvalue()
+
+
+class StubResponse():
+
+    def __init__(self, content):
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+
+class StubSession():
+
+    #serves 'files' by URL, the first URLs the slowest, so they finish after the later ones on the pool
+    def __init__(self, files):
+        self.files = files
+        self.urls = []
+        self.lock = threading.Lock()
+
+    def get(self, url, timeout=None):
+        with self.lock:
+            self.urls.append(url)
+        time.sleep(0.02 * (len(self.files) - list(self.files).index(url)))
+        return StubResponse(self.files[url])
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def stub_loader():
+    def make(files):
+        loader = Loader()
+        loader._Loader__session = StubSession(files)
+        return loader
+    return make
+
+
+def test_session_is_pooled_with_retries():
+    loader = Loader(retries=2, backoff=0.1, pool_size=3)
+    session = loader._Loader__get_session()
+    assert loader._Loader__get_session() is session
+
+    adapter = session.get_adapter("https://example.com")
+    assert adapter is session.get_adapter("http://example.com")
+    assert adapter.max_retries.total == 2 and adapter.max_retries.backoff_factor == 0.1
+    assert 503 in adapter.max_retries.status_forcelist
+    assert adapter._pool_maxsize == 3
+
+    loader.close()
+    assert loader._Loader__get_session() is not session
+    loader.close()
+
+
+def test_prefetch_keeps_the_order(stub_loader, synthetic_img):
+    files = {"https://example.com/{}.png".format(i): encode(synthetic_img((20 + i, 10), seed=i)) for i in range(6)}
+    loader = stub_loader(files)
+
+    results = list(loader.prefetch(files, workers=3, look_ahead=4))
+    assert [result.src for result in results] == list(files)
+    assert [result.img.size for result in results] == [(20 + i, 10) for i in range(6)]
+    assert all(result.error == None for result in results)
+    assert sorted(loader._Loader__session.urls) == sorted(files) #one download per source
+
+
+def test_prefetch_errors_stay_per_source(stub_loader, synthetic_img, monkeypatch):
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1000) #images of more than twice as many pixels are rejected as decompression bombs
+    files = {
+        "https://example.com/small.png": encode(synthetic_img((20, 10))),
+        "https://example.com/bomb.png": encode(synthetic_img((100, 100))),
+        "https://example.com/corrupt.jpg": encode(synthetic_img((20, 10)), "JPEG")[:100],
+        "https://example.com/last.png": encode(synthetic_img((30, 10)))
+    }
+    loader = stub_loader(files)
+
+    results = list(loader.prefetch(files, workers=2))
+    assert [result.src for result in results] == list(files)
+    assert results[0].img.size == (20, 10) and results[3].img.size == (30, 10)
+    assert isinstance(results[1].error, Image.DecompressionBombError) and results[1].img == None
+    assert isinstance(results[2].error, ValueError) and results[2].img == None
+
+
+def test_prefetch_loads_local_files(tmp_path, synthetic_img):
+    paths = []
+    for i in range(3):
+        paths.append(tmp_path / "{}.jpg".format(i))
+        synthetic_img((400, 200), seed=i).save(paths[-1])
+    paths.append(tmp_path / "missing.jpg")
+
+    results = list(Loader().prefetch(paths, workers=2, max_size=(100, 100)))
+    assert [result.src for result in results] == paths
+    assert [result.img.size for result in results[:3]] == [(100, 50)] * 3
+    assert isinstance(results[3].error, ValueError)
@@ -0,0 +1,64 @@
+import tracemalloc
+import numpy as np
+import pytest
+import retrofy.loader as loader
+from retrofy import VHS
+from retrofy.profiling import Profiler, PROFILING
+
+
+def test_profiler_makes_no_image_from_arrays(monkeypatch):
+    calls = []
+    array_to_image = loader.array_to_image
+    monkeypatch.setattr(loader, "array_to_image", lambda arr: calls.append(arr.shape) or array_to_image(arr))
+    retrofier = VHS(np.zeros((100, 200, 3), dtype=np.uint8), seed=0)
+    retrofier.profiler = Profiler()
+
+    retrofier.apply_all_effects(engine="fused")
+
+    assert calls == []
+    record = retrofier.profiler.records[-1]
+    assert (record.input_size, record.output_size) == ((200, 100), (194, 94))
+
+
+EFFECTS = ["noise_lines", "color_glitch", "horizontal_lines", "film_grain", "play_text", "wave_warp"]
+EFFECT_NAMES = {
+    "steps": ["apply_" + effect for effect in EFFECTS],
+    "fused": ["run_" + effect for effect in EFFECTS],
+    "strips": ["run_" + effect + "_strips" for effect in EFFECTS]
+}
+
+
+@pytest.mark.parametrize("engine", ["steps", "fused", "strips"])
+def test_hooks_fire_once_per_effect(synthetic_img, engine):
+    pre_names, post_records = [], []
+    pre = lambda filter_obj, name, args, kwargs: pre_names.append(name)
+    post = lambda filter_obj, record: post_records.append(record)
+    PROFILING.add_hook(pre=pre, post=post)
+    try:
+        retrofier = VHS(synthetic_img(), seed=0)
+        retrofier.profiler = Profiler(track_allocations=True)
+        retrofier.apply_all_effects(engine=engine, play_text=True, wave_warp=True)
+    finally:
+        PROFILING.remove_hook(pre)
+        PROFILING.remove_hook(post)
+
+    effect_names = EFFECT_NAMES[engine]
+    assert [name for name in pre_names if name in effect_names] == effect_names
+    effect_records = [record for record in post_records if record.name in effect_names]
+    assert [record.name for record in effect_records] == effect_names
+    assert effect_records[1].input_size == (200, 100) and effect_records[1].output_size == (194, 94) #color glitch crops
+    assert post_records[-1].name == "apply_all_effects" and post_records[-1].depth == 0
+    assert all(record.error == None and record.peak_bytes >= 0 for record in post_records)
+
+    assert tracemalloc.is_tracing() == False #tracing started by the profiler is stopped after the outer call
+    summary = retrofier.profiler.report()["effects"]
+    assert all(summary[name]["calls"] == 1 for name in effect_names)
+
+
+def test_allocations_are_not_tracked_when_disabled(synthetic_img):
+    retrofier = VHS(synthetic_img(), seed=0)
+    retrofier.profiler = Profiler(track_allocations=False)
+    retrofier.apply_all_effects(engine="fused")
+
+    assert tracemalloc.is_tracing() == False
+    assert all(record.allocated_bytes == None and record.peak_bytes == None for record in retrofier.profiler.records)
@@ -0,0 +1,73 @@
+import io
+import multiprocessing
+import time
+import threading
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError
+import numpy as np
+import pytest
+from PIL import Image
+import retrofy.cli as cli
+import retrofy.server as server_module
+from retrofy import VHS
+from retrofy.filters.filter import DEFAULT_MAX_SIZE
+from retrofy.server import RenderServer, render_request
+
+
+def synthetic_png(size):
+    rng = np.random.default_rng(0)
+    data = io.BytesIO()
+    Image.fromarray(rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8), "RGB").save(data, "PNG", compress_level=1)
+    return data.getvalue()
+
+
+@pytest.fixture
+def server():
+    server = RenderServer(port=0, workers=1, max_queue=0, timeout=0.01, warm_up_size=None)
+    server.start()
+    yield server
+    server.shutdown()
+
+
+def test_timed_out_render_keeps_its_slot(server):
+    params = {"effects": [("apply_all_effects", {"engine": "steps", "play_text": True})], "seed": 0, "format": "png", "quality": 90}
+    with pytest.raises(multiprocessing.TimeoutError):
+        server.render(synthetic_png((1920, 1080)), params)
+
+    assert server.render(b"", params) == None #the timed out task is still running on the only worker
+    assert server.stats["timed_out"] == 1 and server.stats["rejected"] == 1
+
+    deadline = time.monotonic() + 30
+    while server.stats["in_flight"] > 0 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert server.stats["in_flight"] == 0
+
+
+@pytest.mark.parametrize("effects", ['[["all_effects", {"threads": 100000}]]', '[["all_effects", {"engine": ["fused"]}]]'])
+def test_render_rejects_effects_threads_and_engines(server, effects):
+    serving = threading.Thread(target=server.serve_forever, daemon=True)
+    serving.start()
+    try:
+        url = "http://{}:{}/render?{}".format(*server.address, urlencode({"effects": effects}))
+        with pytest.raises(HTTPError) as e:
+            urlopen(Request(url, data=synthetic_png((64, 32))), timeout=10)
+        assert e.value.code == 400
+        assert server.stats["in_flight"] == 0
+    finally:
+        server.shutdown()
+        serving.join(10)
+
+
+@pytest.mark.parametrize("value, max_size", [(None, DEFAULT_MAX_SIZE), ("default", DEFAULT_MAX_SIZE), ("none", None), ("640x480", (640, 480))])
+def test_serve_command_max_size(monkeypatch, value, max_size):
+    calls = []
+    monkeypatch.setattr(server_module, "serve", lambda *args: calls.append(args))
+    cli.main(["serve"] + (["--max-size", value] if value != None else []))
+    assert calls[0][4] == max_size
+
+
+def test_server_resolves_the_default_max_size(monkeypatch):
+    monkeypatch.setattr(VHS, "MAX_SIZE", (100, 100)) #read when images are loaded, as VHS(img) does
+    params = {"effects": [], "seed": 0, "format": "png", "quality": 90, "max_size": DEFAULT_MAX_SIZE}
+    assert Image.open(io.BytesIO(render_request(synthetic_png((400, 200)), params))).size == (100, 50)
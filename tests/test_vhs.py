@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from retrofy import VHS
+from retrofy.filters.history import History
+
+
+@pytest.mark.parametrize("history", [True, False, History(max_entries=3), History(max_entries=1)])
+def test_all_effects_not_inplace_keeps_previous_edits(synthetic_img, history):
+    retrofier = VHS(synthetic_img(), seed=0, history=history)
+    retrofier.apply_color_glitch()
+    previous = np.asarray(retrofier.modified_img)
+    entries = len(retrofier.history)
+
+    resulted_img = retrofier.apply_all_effects(inplace=False, engine="steps", play_text=True, wave_warp=True)
+
+    assert previous.shape[:2] == (94, 194)
+    assert np.array_equal(np.asarray(retrofier.modified_img), previous)
+    assert len(retrofier.history) <= entries #a bounded history may have dropped entries older than the steps
+    assert resulted_img.size == (188, 88)
+
+
+def test_all_effects_not_inplace_keeps_undo(synthetic_img):
+    retrofier = VHS(synthetic_img(), seed=0)
+    retrofier.apply_color_glitch()
+    retrofier.apply_film_grain()
+    retrofier.apply_all_effects(inplace=False, engine="steps")
+
+    assert len(retrofier.history) == 2
+    retrofier.undo()
+    assert retrofier.modified_img.size == (194, 94)
+
+
+@pytest.mark.parametrize("name, params, error", [
+    ("wave_warp", {"mode": "zigzag"}, ValueError),
+    ("wave_warp", {"zones": 0}, ValueError),
+    ("wave_warp", {"row": 3, "zones": 2}, ValueError),
+    ("wave_warp", {"intensity": "high"}, TypeError),
+    ("play_text", {"hour": 24}, ValueError),
+    ("film_grain", {"pooled": 1}, TypeError),
+    ("color_glitch", {"crop": None}, TypeError),
+    ("noise_lines", {"img_id": 1.5}, TypeError)
+])
+def test_effects_and_presets_reject_the_same_params(synthetic_img, name, params, error):
+    from retrofy import Preset
+
+    with pytest.raises(error):
+        getattr(VHS(synthetic_img()), "apply_" + name)(**params)
+    with pytest.raises(error):
+        Preset([(name, params)])
+
+
+@pytest.mark.parametrize("mode", ["block", "sine", "bands"])
+def test_wave_warp_map(mode):
+    size, rows, warp_size, amplitude = (200, 100), [10, 60, 100], 8, 5
+    row_map, offsets = VHS.get_wave_warp_map(size, rows, warp_size, amplitude, mode, np.random.default_rng(0))
+    assert row_map.shape == offsets.shape == (100,)
+    assert row_map.dtype == offsets.dtype == np.intp
+    assert row_map.min() >= 0 and row_map.max() < 100
+
+    warped = set(range(2, 10)) | set(range(52, 60)) | set(range(92, 100))
+    untouched = [row for row in range(100) if row not in warped]
+    assert np.array_equal(row_map[untouched], untouched) and np.all(offsets[untouched] == 0)
+    if mode == "block": #rows are copied from the warp above, never moved sideways
+        assert np.all(offsets == 0)
+        assert np.array_equal(row_map[2:10], range(2, 10)) #no room for a warp above
+        assert np.array_equal(row_map[52:60], range(44, 52))
+    else:
+        assert np.array_equal(row_map, range(100))
+        assert np.abs(offsets).max() <= amplitude and np.any(offsets != 0)
+
+
+@pytest.mark.parametrize("mode", ["block", "sine", "bands"])
+def test_wave_warp_is_seeded(synthetic_img, mode):
+    results = []
+    for seed in [3, 3, 4]:
+        retrofier = VHS(synthetic_img(), seed=seed)
+        retrofier.apply_wave_warp(intensity=0.8, mode=mode, zones=3)
+        assert retrofier.array.shape == (100, 200, 3) and retrofier.array.dtype == np.uint8
+        results.append(retrofier.array)
+    assert np.array_equal(results[0], results[1])
+    assert np.array_equal(results[0], results[2]) == False